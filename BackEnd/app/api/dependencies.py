@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Optional
+from fastapi import Depends, HTTPException, Request, status
+from app.services.artifact_store import ArtifactStore
+from app.services.course_index import CourseSimilarityIndex
+from app.services.registry import ServiceRegistry
+
+if TYPE_CHECKING:
+    from app.services.ai_service import AIService
+    from app.services.ai_service_v2 import AIServiceV2
+    from app.services.job_queue import JobQueue
+
+def get_registry(request: Request) -> ServiceRegistry:
+    """The application's shared service registry, created in the lifespan hook"""
+    return request.app.state.services
+
+def get_ai_service_v2(services: ServiceRegistry = Depends(get_registry)) -> "AIServiceV2":
+    try:
+        return services.ai_service_v2
+    except ValueError as e:
+        # Services are built on first use, so a missing API key surfaces here rather than at startup
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+def get_store(services: ServiceRegistry = Depends(get_registry)) -> ArtifactStore:
+    return services.artifact_store
+
+def get_index(services: ServiceRegistry = Depends(get_registry)) -> Optional[CourseSimilarityIndex]:
+    """The course reuse index, or None when COURSE_REUSE_ENABLED is off"""
+    return services.course_index
+
+def get_render_pool(services: ServiceRegistry = Depends(get_registry)) -> ProcessPoolExecutor:
+    return services.render_pool
+
+def get_job_queue(services: ServiceRegistry = Depends(get_registry)) -> "JobQueue":
+    return services.job_queue
+
+def get_ai_service(services: ServiceRegistry = Depends(get_registry)) -> "AIService":
+    try:
+        ai_service = services.ai_service
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if ai_service is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The v1 agent is not available in this deployment"
+        )
+    return ai_service
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from app.models.course import CourseRequest, CourseResponse, ModuleInfo
 from app.services.ai_service import AIService
+from app.api.dependencies import get_ai_service
 from app.utils.id_generator import generate_id
 
 router = APIRouter(tags=["courses"])
-ai_service = AIService()
 
 @router.post("/plan-course", response_model=CourseResponse)
-async def plan_course(request: CourseRequest):
+async def plan_course(request: CourseRequest, ai_service: AIService = Depends(get_ai_service)):
     objectives_text = "\n".join([f"- {obj}" for obj in request.learning_objectives]) if request.learning_objectives else "No specific objectives provided."
     
     prompt = f"""
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from app.models.lesson import LessonRequest, LessonResponse, QuizResponse
 from app.services.ai_service import AIService
+from app.api.dependencies import get_ai_service
 
 router = APIRouter(tags=["lessons"])
-ai_service = AIService()
 
 @router.post("/create-lesson-content", response_model=LessonResponse)
-async def create_lesson_content(request: LessonRequest):
+async def create_lesson_content(request: LessonRequest, ai_service: AIService = Depends(get_ai_service)):
     # Prepare the prompt for lesson content creation
     prompt = f"""
     Create a detailed lesson based on the following information and search from web (findIt_google) and web Scrap (findIt_scrap) for additional resources:
@@ -45,7 +45,7 @@ async def create_lesson_content(request: LessonRequest):
         raise HTTPException(status_code=500, detail=f"Error generating lesson content: {str(e)}")
 
 @router.post("/create-quiz", response_model=QuizResponse)
-async def create_quiz(request: LessonRequest):
+async def create_quiz(request: LessonRequest, ai_service: AIService = Depends(get_ai_service)):
     # Prepare the prompt for quiz creation
     prompt = f"""
     Create a quiz based on the following lesson information and search from web (findIt_google) and web Scrap (findIt_scrap) for additional resources:
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
 from app.models.module import ModuleRequest, ModuleResponse, LessonInfo
 from app.services.ai_service import AIService
+from app.api.dependencies import get_ai_service
 from app.utils.id_generator import generate_id
 
 router = APIRouter(tags=["modules"])
-ai_service = AIService()
 
 @router.post("/plan-module", response_model=ModuleResponse)
-async def plan_module(request: ModuleRequest):
+async def plan_module(request: ModuleRequest, ai_service: AIService = Depends(get_ai_service)):
     # Prepare the prompt for module planning
     prompt = f"""
     Create a detailed module plan based on the following information and search from web (findIt_google) and web Scrap (findIt_scrap) for additional resources:
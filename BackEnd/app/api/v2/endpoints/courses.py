@@ -1,20 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Query
-from app.models.v2.course import CourseRequest, CourseResponse, ResourceItem, ModuleInfo
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from fastapi.responses import Response, StreamingResponse
+from app.models.v2.course import CourseRequest, CourseResponse
 from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import Priority
+from app.services.artifact_store import ArtifactStore
+from app.services.course_index import CourseSimilarityIndex
+from app.services.course_export import CourseExporter, ExportFormat, MEDIA_TYPES, unsupported_pdf_characters
+from app.api.dependencies import get_ai_service_v2, get_index, get_render_pool, get_store
 from app.utils.id_generator import generate_id
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import json
-import re
+from typing import Optional
 import logging
 
 # Configure logging
 logger = logging.getLogger("course_generation_api")
 
 router = APIRouter(tags=["courses"])
-ai_service = AIServiceV2()
-
-# In-memory storage for course data
-course_store = {}
 
 @router.get("/")
 async def v2_root():
@@ -33,96 +36,65 @@ async def v2_root():
         ]
     }
 
+async def _find_similar_course(request: CourseRequest, artifact_store: ArtifactStore,
+                               course_index: CourseSimilarityIndex) -> Optional[CourseResponse]:
+    """The stored course of a near-duplicate earlier request, marked as reused, if there is one"""
+    match = course_index.find(request)
+    if match is None:
+        return None
+    course_id, similarity = match
+    record = await artifact_store.get("course", course_id)
+    if record is None:
+        # Indexed but no longer stored (e.g. a different or reset artifact store)
+        await course_index.remove(course_id)
+        return None
+    
+    logger.info("Reusing course %s for: %s (similarity %.2f)", course_id, request.title, similarity,
+                extra={"course_id": course_id})
+    course = CourseResponse(**record["artifact"])
+    course.metadata = {**(course.metadata or {}), "reused": True, "similarity": round(similarity, 3)}
+    return course
+
 @router.post("/plan-course", response_model=CourseResponse, status_code=status.HTTP_201_CREATED)
-async def plan_course(request: CourseRequest):
+async def plan_course(
+    request: CourseRequest,
+    priority: Priority = Query(Priority.INTERACTIVE, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    reuse: bool = Query(True, description="Return a stored course planned for a near-identical request"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store),
+    course_index: Optional[CourseSimilarityIndex] = Depends(get_index)
+):
+    # Requests that differ only in wording details get the course already planned for them.
+    # Bypassing or refreshing the cache asks for a new generation, so it skips reuse as well.
+    if reuse and cache == CacheMode.USE and course_index is not None:
+        reused = await _find_similar_course(request, artifact_store, course_index)
+        if reused is not None:
+            return reused
+    
     # Prepare the prompt for course planning
     prompt = ai_service.create_course_planning_prompt(request)
     
     try:
-        # Generate course plan
-        logger.info(f"Generating course plan for: {request.title}")
-        course_data = await ai_service.generate_ai_content(prompt, temperature=0.7)
-        
-        # Clean and parse the response
-        if "```" in course_data:
-            # Extract JSON from code blocks if present
-            json_match = re.search(r'```(?:json)?(.*?)```', course_data, re.DOTALL)
-            if json_match:
-                course_data = json_match.group(1).strip()
-        
-        # Parse the JSON with explicit error handling
-        try:
-            course_json = json.loads(course_data)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
-            logger.debug(f"Raw response: {course_data}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to parse AI response. Please try again."
-            )
-        
-        # Validate required fields are present
-        required_fields = ["course_title", "course_description", "course_introduction", 
-                          "learning_outcomes", "prerequisites", "target_audience_description", 
-                          "estimated_total_duration", "modules"]
-        
-        for field in required_fields:
-            if field not in course_json:
-                logger.error(f"Missing required field in response: {field}")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"AI response missing required field: {field}"
-                )
-        
-        # Check that modules have required fields
-        modules_with_ids = []
-        for i, module in enumerate(course_json["modules"]):
-            # Ensure module has required fields
-            module_required_fields = ["module_title", "module_summary", "estimated_duration", "key_concepts"]
-            for field in module_required_fields:
-                if field not in module:
-                    logger.error(f"Module {i} missing required field: {field}")
-                    # Add default values for missing fields
-                    if field == "module_title":
-                        module["module_title"] = f"Module {i+1}"
-                    elif field == "module_summary":
-                        module["module_summary"] = "Module details not provided."
-                    elif field == "estimated_duration":
-                        module["estimated_duration"] = "1-2 hours"
-                    elif field == "key_concepts":
-                        module["key_concepts"] = ["Concept 1", "Concept 2"]
-            
-            module_with_id = {
-                "module_id": generate_id("mod"),
-                "module_title": module["module_title"],
-                "module_summary": module["module_summary"],
-                "estimated_duration": module["estimated_duration"],
-                "key_concepts": module["key_concepts"]
-            }
-            modules_with_ids.append(ModuleInfo(**module_with_id))
+        # Generate course plan, constrained to the CourseResponse schema and validated in one pass
+        logger.info("Generating course plan for: %s", request.title)
+        generated = await ai_service.generate_validated(
+            prompt, CourseResponse, temperature=0.7, cache_mode=cache, priority=priority
+        )
+        course_json = generated.model_dump()
         
-        # Prepare recommended resources if available
-        recommended_resources = None
-        if "recommended_resources" in course_json and request.include_resources:
-            try:
-                recommended_resources = [ResourceItem(**resource) for resource in course_json["recommended_resources"]]
-            except Exception as e:
-                logger.warning(f"Error parsing recommended resources: {str(e)}")
-                # Continue without resources if there's an error
+        # Assign server-side IDs
+        course_json["modules"] = [
+            {"module_id": generate_id("mod"), **module} for module in course_json["modules"]
+        ]
+        if not request.include_resources:
+            course_json["recommended_resources"] = None
         
         # Create the response object
         course_id = generate_id("course")
         course_response = CourseResponse(
             course_id=course_id,
-            course_title=course_json["course_title"],
-            course_description=course_json["course_description"],
-            course_introduction=course_json["course_introduction"],
-            learning_outcomes=course_json["learning_outcomes"],
-            prerequisites=course_json["prerequisites"],
-            target_audience_description=course_json["target_audience_description"],
-            estimated_total_duration=course_json["estimated_total_duration"],
-            modules=modules_with_ids,
-            recommended_resources=recommended_resources,
+            **course_json,
             metadata={
                 "created_at": datetime.now().isoformat(),
                 "difficulty_level": request.difficulty_level.value,
@@ -131,13 +103,15 @@ async def plan_course(request: CourseRequest):
             }
         )
         
-        # Store course data in memory
+        # Store the course and its context for module generation
         course_context_data = {
             "course_title": course_json["course_title"],
             "course_description": course_json["course_description"],
             "target_audience_description": course_json["target_audience_description"]
         }
-        course_store[course_id] = course_context_data
+        await artifact_store.put("course", course_id, course_context_data, artifact=course_response.model_dump(mode="json"))
+        if course_index is not None:
+            await course_index.add(course_id, request)
         
         return course_response
     
@@ -145,7 +119,7 @@ async def plan_course(request: CourseRequest):
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error generating course: {str(e)}")
+        logger.error("Error generating course: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail=f"Error generating course: {str(e)}"
@@ -154,33 +128,60 @@ async def plan_course(request: CourseRequest):
 @router.get("/export-course/{course_id}", status_code=status.HTTP_200_OK)
 async def export_course(
     course_id: str,
-    format: str = Query("md", description="Export format: md, html, pdf")
+    format: ExportFormat = Query(ExportFormat.MARKDOWN, description="Export format: md, html, pdf"),
+    if_none_match: Optional[str] = Header(None),
+    artifact_store: ArtifactStore = Depends(get_store),
+    render_pool: ProcessPoolExecutor = Depends(get_render_pool)
 ):
     """
-    Export an entire course in various formats
+    Export an entire course with its modules, lessons and quizzes as Markdown, HTML or PDF.
+
+    The file is streamed as it is rendered. It is identified by a hash of the
+    course's stored content, returned as the ETag, so unchanged courses are
+    served from the export cache or answered with 304 Not Modified. PDF export
+    uses the standard PDF fonts, so a course with text outside Latin-1 is
+    rejected with 422 rather than rendered with missing characters.
     """
     try:
-        # Check if course exists
-        if course_id not in course_store:
+        exporter = CourseExporter(artifact_store, render_pool)
+        snapshot = await exporter.load(course_id)
+        if snapshot is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Course with ID {course_id} not found"
             )
         
-        # In a real implementation, we would fetch all modules, lessons, etc.
-        # and generate the appropriate format
+        if format == ExportFormat.PDF:
+            unsupported = unsupported_pdf_characters(snapshot)
+            if unsupported:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"The course contains characters the PDF export cannot show "
+                           f"({''.join(unsupported[:10])}). Export it as md or html instead."
+                )
         
-        # For now, return a simple confirmation
-        return {
-            "status": "success", 
-            "message": f"Course export in {format} format will be available shortly",
-            "course_id": course_id
-        }
+        digest = exporter.content_hash(snapshot, format)
+        etag = f'"{digest}"'
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        
+        cached = exporter.is_cached(digest, format)
+        logger.info("Exporting course %s as %s (%s)", course_id, format.value, "cached" if cached else "rendering",
+                    extra={"course_id": course_id})
+        return StreamingResponse(
+            exporter.export(snapshot, format, digest),
+            media_type=MEDIA_TYPES[format],
+            headers={
+                "Content-Disposition": f'attachment; filename="{course_id}.{format.value}"',
+                "ETag": etag,
+                "X-Export-Cache": "hit" if cached else "miss",
+            }
+        )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error exporting course: {str(e)}")
+        logger.error("Error exporting course: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error exporting course: {str(e)}"
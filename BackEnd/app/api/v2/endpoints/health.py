@@ -1,24 +1,79 @@
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 import os
 import json
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.course_index import CourseSimilarityIndex
+from app.api.dependencies import get_ai_service_v2, get_index
+from typing import Optional
 
 router = APIRouter(tags=["health"])
 
 MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash-exp")
 
 @router.get("/health", status_code=status.HTTP_200_OK)
-async def health_check():
+async def health_check(ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+                       course_index: Optional[CourseSimilarityIndex] = Depends(get_index)):
     """
     Endpoint for monitoring system health
     """
+    resilience = ai_service.resilience.stats()
+    
     return {
-        "status": "healthy",
+        # Degraded while the circuit breaker is failing model calls fast
+        "status": "healthy" if resilience["circuit_breaker"]["state"] == "closed" else "degraded",
         "api_version": "2.0.0",
         "model": MODEL_NAME,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now().isoformat(),
+        "cache": ai_service.cache.stats() if ai_service.cache is not None else None,
+        "coalescing": ai_service.single_flight.stats() if ai_service.single_flight is not None else None,
+        "scheduler": ai_service.scheduler.stats(),
+        "resilience": resilience,
+        "hedging": ai_service.hedging.stats() if ai_service.hedging is not None else None,
+        "structured_output": {
+            "enabled": ai_service.structured_output,
+            "parse": ai_service.parse_stats.stats()
+        },
+        "continuations": ai_service.continuation_stats.stats(),
+        "context_cache": ai_service.context_cache.stats() if ai_service.context_cache is not None else None,
+        "course_reuse": course_index.stats() if course_index is not None else None
     }
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(ai_service: AIServiceV2 = Depends(get_ai_service_v2)):
+    """
+    Request, stage, token, retry, parse, cache and in-flight metrics in Prometheus text format
+    """
+    return PlainTextResponse(
+        ai_service.metrics.render(ai_service),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@router.get("/scheduler/stats", status_code=status.HTTP_200_OK)
+async def scheduler_stats(ai_service: AIServiceV2 = Depends(get_ai_service_v2)):
+    """
+    Queue depth, wait times and rate-limit headroom of the LLM scheduler
+    """
+    return ai_service.scheduler.stats()
+
+@router.get("/resilience/stats", status_code=status.HTTP_200_OK)
+async def resilience_stats(ai_service: AIServiceV2 = Depends(get_ai_service_v2)):
+    """
+    Circuit breaker state and transitions, retry budget and error classification counters
+    """
+    return ai_service.resilience.stats()
+
+@router.get("/cache/stats", status_code=status.HTTP_200_OK)
+async def cache_stats(ai_service: AIServiceV2 = Depends(get_ai_service_v2)):
+    """
+    Hit/miss counters for the generation cache
+    """
+    if ai_service.cache is None:
+        return {"enabled": False}
+    
+    return {"enabled": True, **ai_service.cache.stats()}
+
 @router.post("/feedback", status_code=status.HTTP_201_CREATED)
 async def submit_feedback(feedback: dict):
     """
@@ -53,14 +108,11 @@ async def generate_learning_path(request: dict):
         return {"status": "error", "message": str(e)}
 
 @router.post("/debug", status_code=status.HTTP_200_OK)
-async def debug_ai(request: dict):
+async def debug_ai(request: dict, ai_service: AIServiceV2 = Depends(get_ai_service_v2)):
     """
     Debug endpoint for testing AI responses
     """
-    from app.services.ai_service_v2 import AIServiceV2
-    
     try:
-        ai_service = AIServiceV2()
         prompt = request.get("prompt", "Create a JSON response with the following structure: {\"test\": \"This is a test\"}")
         
         # Generate content
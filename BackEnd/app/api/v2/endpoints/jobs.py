@@ -0,0 +1,200 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from app.models.v2.course import CourseRequest
+from app.models.v2.lesson import LessonRequest, QuizRequest
+from app.models.v2.batch import LessonBatchRequest, QuizBatchRequest, BatchItemResult, BatchItemError
+from app.models.v2.jobs import JobInfo
+from app.services.generation_cache import CacheMode
+from app.services.job_queue import JobContext, JobQueue, JobStatus, job_handler
+from app.services.llm_scheduler import Priority
+from app.api.v2.endpoints.lessons import create_lesson_content, create_quiz
+from app.api.v2.endpoints.pipeline import build_course
+from app.api.dependencies import get_job_queue
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+
+# Configure logging
+logger = logging.getLogger("course_generation_api")
+
+router = APIRouter(tags=["jobs"])
+
+# Background jobs are never what a user is waiting on directly
+JOB_PRIORITY = Priority.BATCH
+
+def _check_webhook_url(webhook_url: Optional[str]) -> None:
+    """Reject webhook URLs that httpx could not POST to, before the job is queued"""
+    if webhook_url is None:
+        return
+    import httpx
+
+    try:
+        url = httpx.URL(webhook_url)
+        valid = url.scheme in ("http", "https") and bool(url.host) and (url.port is None or 0 < url.port < 65536)
+    except (httpx.InvalidURL, ValueError, TypeError):
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="webhook_url must be an absolute http(s) URL"
+        )
+
+async def _submit(job_queue: JobQueue, job_type: str, payload: Dict[str, Any],
+                  webhook_url: Optional[str], response: Response) -> JobInfo:
+    _check_webhook_url(webhook_url)
+    job = await job_queue.submit(job_type, payload, webhook_url)
+    response.headers["Location"] = f"/api/v2/jobs/{job['id']}"
+    return JobInfo.from_job(job)
+
+async def _run_batch(job: JobContext, kind: str, items: List[Callable[[], Awaitable[Any]]]) -> Dict[str, Any]:
+    """Run batch items concurrently, publishing each item's BatchItemResult as soon as it completes"""
+    await job.add_total(len(items))
+    counts = {"succeeded": 0, "failed": 0}
+
+    async def run(index: int, item: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            result = await item()
+            outcome = BatchItemResult(index=index, status="succeeded", data=result.model_dump(mode="json"))
+        except HTTPException as e:
+            logger.error("Batch job %s %s item %d failed: %s", job.id, kind, index, e.detail)
+            outcome = BatchItemResult(
+                index=index, status="failed",
+                error=BatchItemError(status_code=e.status_code, detail=e.detail)
+            )
+        counts[outcome.status] += 1
+        await job.add_result(kind, outcome.model_dump(mode="json", exclude_none=True))
+
+    await asyncio.gather(*[run(i, item) for i, item in enumerate(items)])
+    return counts
+
+@job_handler("generate-course")
+async def run_generate_course(job: JobContext) -> Dict[str, Any]:
+    payload = job.payload
+    course = await build_course(
+        CourseRequest(**payload["request"]), payload["include_quizzes"], payload["num_questions"],
+        priority=JOB_PRIORITY, cache=CacheMode(payload["cache"]),
+        ai_service=job.services.ai_service_v2, artifact_store=job.services.artifact_store,
+        course_index=job.services.course_index, progress=job
+    )
+    return course.model_dump(mode="json")
+
+@job_handler("lesson-batch")
+async def run_lesson_batch(job: JobContext) -> Dict[str, Any]:
+    stage_args = {
+        "priority": JOB_PRIORITY, "cache": CacheMode(job.payload["cache"]),
+        "ai_service": job.services.ai_service_v2, "artifact_store": job.services.artifact_store
+    }
+    requests = [LessonRequest(**item) for item in job.payload["requests"]]
+    return await _run_batch(job, "lesson", [
+        lambda request=request: create_lesson_content(request, **stage_args) for request in requests
+    ])
+
+@job_handler("quiz-batch")
+async def run_quiz_batch(job: JobContext) -> Dict[str, Any]:
+    stage_args = {
+        "priority": JOB_PRIORITY, "cache": CacheMode(job.payload["cache"]),
+        "ai_service": job.services.ai_service_v2, "artifact_store": job.services.artifact_store
+    }
+    requests = [QuizRequest(**item) for item in job.payload["requests"]]
+    return await _run_batch(job, "quiz", [
+        lambda request=request: create_quiz(request, **stage_args) for request in requests
+    ])
+
+@router.post("/jobs/generate-course", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+async def submit_generate_course(
+    request: CourseRequest,
+    response: Response,
+    include_quizzes: bool = Query(True, description="Generate a quiz for every lesson"),
+    num_questions: int = Query(5, ge=3, le=10, description="Questions per quiz"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    webhook_url: Optional[str] = Query(None, description="POSTed the final job state when the job finishes"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue a full course generation (as /generate-course) and return its job ID immediately.
+
+    Poll GET /jobs/{job_id} for progress and partial results (the course plan,
+    then each module, lesson and quiz as it completes); the final result is the
+    FullCourseResponse.
+    """
+    payload = {
+        "request": request.model_dump(mode="json"),
+        "include_quizzes": include_quizzes,
+        "num_questions": num_questions,
+        "cache": cache.value,
+    }
+    return await _submit(job_queue, "generate-course", payload, webhook_url, response)
+
+@router.post("/jobs/create-lesson-content/batch", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+async def submit_lesson_batch(
+    batch: LessonBatchRequest,
+    response: Response,
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    webhook_url: Optional[str] = Query(None, description="POSTed the final job state when the job finishes"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue a lesson batch; each lesson's result line (as in /create-lesson-content/batch) becomes a partial result
+    """
+    payload = {"requests": [item.model_dump(mode="json") for item in batch.requests], "cache": cache.value}
+    return await _submit(job_queue, "lesson-batch", payload, webhook_url, response)
+
+@router.post("/jobs/create-quiz/batch", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+async def submit_quiz_batch(
+    batch: QuizBatchRequest,
+    response: Response,
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    webhook_url: Optional[str] = Query(None, description="POSTed the final job state when the job finishes"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Queue a quiz batch; each quiz's result line (as in /create-quiz/batch) becomes a partial result
+    """
+    payload = {"requests": [item.model_dump(mode="json") for item in batch.requests], "cache": cache.value}
+    return await _submit(job_queue, "quiz-batch", payload, webhook_url, response)
+
+@router.get("/jobs", response_model=List[JobInfo])
+async def list_jobs(
+    status_filter: Optional[JobStatus] = Query(None, alias="status", description="Only jobs in this state"),
+    limit: int = Query(50, ge=1, le=500),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Most recently submitted jobs first, without results
+    """
+    jobs = await job_queue.store.list(status_filter, limit)
+    return [JobInfo.from_job({**job, "result": None}) for job in jobs]
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(
+    job_id: str,
+    results_after: int = Query(0, ge=0, description="Only partial results with a higher seq"),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """
+    Status, progress, partial results and, once finished, the result or error of a job
+    """
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID {job_id} not found"
+        )
+    return JobInfo.from_job(job, await job_queue.store.results(job_id, results_after))
+
+@router.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    """
+    Cancel a queued or running job; artifacts it already generated are kept
+    """
+    if not await job_queue.cancel(job_id):
+        job = await job_queue.store.get(job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job with ID {job_id} not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} already {job['status'].value}"
+        )
+    return JobInfo.from_job(await job_queue.store.get(job_id))
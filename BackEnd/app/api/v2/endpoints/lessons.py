@@ -1,206 +1,455 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from app.models.v2.lesson import (
     LessonRequest, LessonResponse, ContentSection, 
-    QuizRequest, QuizResponse, QuizQuestion
+    QuizRequest, QuizResponse, QuizQuestion,
+    LessonWithQuizRequest, LessonWithQuizResponse
 )
-from app.models.v2.course import ResourceItem
+from app.models.v2.course import DifficultyLevel, ResourceItem
+from app.models.v2.batch import LessonBatchRequest, QuizBatchRequest, BatchItemResult, BatchItemError
 from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import Priority
+from app.services.artifact_store import ArtifactStore
+from app.api.dependencies import get_ai_service_v2, get_store
 from app.utils.id_generator import generate_id
+from app.utils.json_stream import IncrementalJSONParser
+from functools import partial
+from pydantic import BaseModel
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import asyncio
 import json
-import re
 import logging
 
 # Configure logging
 logger = logging.getLogger("course_generation_api")
 
 router = APIRouter(tags=["lessons"])
-ai_service = AIServiceV2()
 
-# In-memory storage for lesson data
-lesson_store = {}
-
-# Reference to module store from modules.py
-from app.api.v2.endpoints.modules import module_store
-
-@router.post("/create-lesson-content", response_model=LessonResponse)
-async def create_lesson_content(request: LessonRequest):
-    # Get module information if available
-    module_context = {}
-    
-    if request.module_id in module_store:
-        module_context = module_store[request.module_id]
-    else:
-        # Use minimal context if module data is not available
+async def _get_module_context(artifact_store: ArtifactStore, module_id: str) -> Dict[str, Any]:
+    """Get module information if available, falling back to minimal context"""
+    module_context = await artifact_store.get_context("module", module_id)
+    if module_context is None:
         module_context = {
             "module_title": "Module",
             "module_summary": "Module summary not available",
         }
+    return module_context
+
+async def _get_course_context(artifact_store: ArtifactStore, course_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Get course information for the shared prompt prefix, if the course is known"""
+    if not course_id:
+        return None
+    return await artifact_store.get_context("course", course_id)
+
+def _lesson_defaults(request: LessonRequest) -> Dict[str, Any]:
+    """Default values for top-level lesson fields the model left out"""
+    return {
+        "lesson_title": request.lesson_title,
+        "introduction": f"Introduction to {request.lesson_title}.",
+        "sections": [{"heading": "Main Content", "content": "Content not available.", "importance": 1}],
+        "summary": "Summary of key points covered in this lesson.",
+        "reflection_questions": ["What did you learn from this lesson?"],
+        "next_steps": "Continue to the next lesson."
+    }
+
+def _process_section(i: int, section: Any) -> ContentSection:
+    """Fill missing or empty section fields with defaults"""
+    if not isinstance(section, dict):
+        section = {}
     
-    # Prepare the prompt for lesson content creation
-    prompt = ai_service.create_lesson_content_prompt(request, module_context)
+    section_defaults = {
+        "heading": f"Section {i+1}",
+        "content": "Content not available.",
+        "importance": 1
+    }
     
-    try:
-        # Generate lesson content
-        logger.info(f"Generating lesson content for: {request.lesson_title}")
-        lesson_data = await ai_service.generate_ai_content(prompt, temperature=0.7)
-        
-        # Debug: Log a sample of the raw response
-        logger.debug(f"Raw AI response (first 500 chars): {lesson_data[:500]}")
+    # Create a new section dict with defaults for missing fields
+    processed_section = {}
+    for field, default_value in section_defaults.items():
+        processed_section[field] = section.get(field, default_value)
         
-        # Clean and parse the response
-        if "```" in lesson_data:
-            json_match = re.search(r'```(?:json)?(.*?)```', lesson_data, re.DOTALL)
-            if json_match:
-                lesson_data = json_match.group(1).strip()
-                logger.debug(f"Extracted JSON from code block: {lesson_data[:200]}...")
-        
-        # Parse the JSON with explicit error handling
-        try:
-            lesson_json = json.loads(lesson_data)
-            logger.debug(f"Successfully parsed JSON: {json.dumps(lesson_json)[:200]}...")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
-            logger.debug(f"Raw response: {lesson_data}")
-            
-            # Create a default JSON structure since parsing failed
-            lesson_json = {
-                "lesson_title": request.lesson_title,
-                "introduction": f"Introduction to {request.lesson_title}.",
-                "sections": [
-                    {
-                        "heading": "Main Concepts",
-                        "content": "The AI model failed to generate proper content. Please try again.",
-                        "importance": 1
-                    }
-                ],
-                "summary": f"Summary of {request.lesson_title}.",
-                "reflection_questions": ["What did you learn from this topic?"],
-                "next_steps": "Continue to the next lesson."
-            }
-            logger.info("Using default lesson JSON structure due to parsing error")
-        
-        # Create default content for all required fields if missing
-        lesson_defaults = {
-            "lesson_title": request.lesson_title,
-            "introduction": f"Introduction to {request.lesson_title}.",
-            "sections": [{"heading": "Main Content", "content": "Content not available.", "importance": 1}],
-            "summary": "Summary of key points covered in this lesson.",
-            "reflection_questions": ["What did you learn from this lesson?"],
-            "next_steps": "Continue to the next lesson."
-        }
-        
-        # Fill in any missing fields with defaults
-        for field, default_value in lesson_defaults.items():
-            if field not in lesson_json or not lesson_json[field]:
-                logger.warning(f"Missing or empty field in lesson response: {field}")
-                lesson_json[field] = default_value
-        
-        # Validate sections structure
-        if not isinstance(lesson_json["sections"], list) or len(lesson_json["sections"]) == 0:
-            logger.error("Sections field is not a valid list or is empty")
-            lesson_json["sections"] = [{"heading": "Main Content", "content": "Content not available.", "importance": 1}]
-        
-        # Process sections to ensure required fields
-        processed_sections = []
-        for i, section in enumerate(lesson_json["sections"]):
-            section_defaults = {
-                "heading": f"Section {i+1}",
-                "content": "Content not available.",
-                "importance": 1
+        # If the field exists but is empty, use the default
+        if field in section and not section[field]:
+            processed_section[field] = default_value
+    
+    return ContentSection(**processed_section)
+
+def _process_reflection_questions(questions: Any) -> List[str]:
+    """Coerce reflection questions into a non-empty list"""
+    if not isinstance(questions, list):
+        logger.warning("reflection_questions is not a list, converting")
+        if isinstance(questions, str):
+            questions = [questions]
+        else:
+            questions = ["What did you learn from this lesson?"]
+    
+    # Make sure reflection_questions is not empty
+    if len(questions) == 0:
+        questions = ["What did you learn from this lesson?"]
+    
+    return questions
+
+def _process_resources(resources: Any) -> Optional[List[ResourceItem]]:
+    """Fill missing resource fields with defaults, dropping resources entirely on error"""
+    if not isinstance(resources, list):
+        return None
+    
+    try:
+        processed = []
+        for i, resource in enumerate(resources):
+            resource_defaults = {
+                "title": f"Resource {i+1}",
+                "description": "Additional learning resource",
+                "type": "reference",
+                "url": None
             }
             
-            # Create a new section dict with defaults for missing fields
-            processed_section = {}
-            for field, default_value in section_defaults.items():
-                processed_section[field] = section.get(field, default_value)
+            # Create a new resource dict with defaults for missing fields
+            processed_resource = {}
+            for field, default_value in resource_defaults.items():
+                processed_resource[field] = resource.get(field, default_value)
                 
                 # If the field exists but is empty, use the default
-                if field in section and not section[field]:
-                    processed_section[field] = default_value
+                if field in resource and not resource[field] and field != "url":
+                    processed_resource[field] = default_value
             
-            processed_sections.append(ContentSection(**processed_section))
+            processed.append(ResourceItem(**processed_resource))
+        return processed
+    except Exception as e:
+        logger.warning("Error processing lesson resources: %s", e)
+        return None
+
+def _event_line(event: str, data: Any, **extra) -> str:
+    """A single NDJSON event line"""
+    return json.dumps({"event": event, **extra, "data": data}) + "\n"
+
+async def _batch_events(kind: str, jobs: List[Callable[[], Awaitable[BaseModel]]]) -> AsyncIterator[str]:
+    """
+    Run every job concurrently and yield one NDJSON result line per job as it completes.
+    
+    Jobs are admitted by the LLM scheduler like any other generation, so the
+    global concurrency cap and rate limits apply. A failed job is reported with
+    its status code and does not affect the others. A final "done" event
+    carries the success and failure counts.
+    """
+    async def run(index: int, job: Callable[[], Awaitable[BaseModel]]) -> BatchItemResult:
+        try:
+            result = await job()
+            return BatchItemResult(index=index, status="succeeded", data=result.model_dump(mode="json"))
+        except HTTPException as e:
+            logger.error("Batch %s item %d failed: %s", kind, index, e.detail)
+            return BatchItemResult(
+                index=index, status="failed",
+                error=BatchItemError(status_code=e.status_code, detail=e.detail)
+            )
+    
+    tasks = [asyncio.ensure_future(run(i, job)) for i, job in enumerate(jobs)]
+    counts = {"succeeded": 0, "failed": 0}
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            item = await next_result
+            counts[item.status] += 1
+            yield item.model_dump_json(exclude_none=True) + "\n"
+        yield _event_line("done", counts)
+    finally:
+        # The client went away: stop generating results nobody will read
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def _store_lesson(artifact_store: ArtifactStore, lesson_response: LessonResponse, request: LessonRequest,
+                        course_id: Optional[str]) -> None:
+    """Store the lesson and its context for quiz generation"""
+    lesson_context_data = {
+        "course_id": course_id,
+        "lesson_title": request.lesson_title,
+        "lesson_objective": request.lesson_objective,
+        "difficulty_level": request.difficulty_level.value if request.difficulty_level else None,
+        "content_style": request.content_style.value if request.content_style else None
+    }
+    await artifact_store.put(
+        "lesson", lesson_response.lesson_id, lesson_context_data,
+        artifact=lesson_response.model_dump(mode="json"),
+        parent_id=request.module_id
+    )
+
+def _finish_lesson(ai_service: AIServiceV2, lesson_json: Dict[str, Any], request: LessonRequest) -> LessonResponse:
+    """Fill empty lists in a generated lesson and assign its ID"""
+    # The schema guarantees types, but lists can still come back empty
+    if len(lesson_json["sections"]) == 0:
+        logger.warning("Lesson response contained no sections")
+        ai_service.metrics.fallbacks.inc("lesson_sections")
+        lesson_json["sections"] = _lesson_defaults(request)["sections"]
+    lesson_json["reflection_questions"] = _process_reflection_questions(lesson_json["reflection_questions"])
+    
+    return LessonResponse(lesson_id=generate_id("les"), **lesson_json)
+
+def _finish_quiz(ai_service: AIServiceV2, quiz_json: Dict[str, Any], lesson_id: str) -> QuizResponse:
+    """Check a generated quiz, repair its options and assign its IDs"""
+    if len(quiz_json["questions"]) == 0:
+        logger.error("Quiz response contained no questions")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI response contained no quiz questions"
+        )
+    
+    # Assign question IDs and make sure every answer is one of its options
+    questions_with_ids = []
+    for question in quiz_json["questions"]:
+        if len(question["options"]) < 2:
+            ai_service.metrics.fallbacks.inc("quiz_options")
+            question["options"] = ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"]
+        if question["correct_answer"] not in question["options"]:
+            ai_service.metrics.fallbacks.inc("quiz_correct_answer")
+            question["correct_answer"] = question["options"][0]
+        questions_with_ids.append(QuizQuestion(question_id=generate_id("q"), **question))
+    quiz_json["questions"] = questions_with_ids
+    
+    return QuizResponse(quiz_id=generate_id("quiz"), lesson_id=lesson_id, **quiz_json)
+
+def _quiz_context(request: QuizRequest) -> Dict[str, Any]:
+    """The settings a quiz was generated with, used to find it again for an identical request"""
+    return {
+        "lesson_id": request.lesson_id,
+        "difficulty_level": request.difficulty_level.value if request.difficulty_level else None,
+        "num_questions": request.num_questions,
+        "include_explanations": request.include_explanations
+    }
+
+async def _store_quiz(artifact_store: ArtifactStore, quiz_response: QuizResponse, context: Dict[str, Any]) -> None:
+    """Store the quiz alongside its lesson"""
+    await artifact_store.put(
+        "quiz", quiz_response.quiz_id, context,
+        artifact=quiz_response.model_dump(mode="json"),
+        parent_id=quiz_response.lesson_id
+    )
+
+async def _find_stored_quiz(artifact_store: ArtifactStore, request: QuizRequest) -> Optional[QuizResponse]:
+    """The newest stored quiz for the lesson generated with the same settings as `request`"""
+    wanted = _quiz_context(request)
+    for record in reversed(await artifact_store.list_children("quiz", request.lesson_id)):
+        context = record["context"]
+        if record["artifact"] and all(context.get(key) == value for key, value in wanted.items()):
+            return QuizResponse(**record["artifact"])
+    return None
+
+@router.post("/create-lesson-content", response_model=LessonResponse)
+async def create_lesson_content(
+    request: LessonRequest,
+    priority: Priority = Query(Priority.INTERACTIVE, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    # Get module information if available
+    module_context = await _get_module_context(artifact_store, request.module_id)
+    
+    # Prepare the prompt for lesson content creation
+    course_context = await _get_course_context(artifact_store, module_context.get("course_id"))
+    prompt = ai_service.create_lesson_content_prompt(request, module_context, course_context)
+    
+    try:
+        # Generate lesson content, constrained to the LessonResponse schema and validated in one pass
+        logger.info("Generating lesson content for: %s", request.lesson_title, extra={"module_id": request.module_id})
+        generated = await ai_service.generate_validated(
+            prompt, LessonResponse, temperature=0.7, cache_mode=cache, priority=priority
+        )
+        lesson_response = _finish_lesson(ai_service, generated.model_dump(), request)
         
-        # Validate reflection_questions is a list
-        if not isinstance(lesson_json["reflection_questions"], list):
-            logger.warning("reflection_questions is not a list, converting")
-            if isinstance(lesson_json["reflection_questions"], str):
-                lesson_json["reflection_questions"] = [lesson_json["reflection_questions"]]
-            else:
-                lesson_json["reflection_questions"] = ["What did you learn from this lesson?"]
+        # Store lesson for quiz generation
+        await _store_lesson(artifact_store, lesson_response, request, module_context.get("course_id"))
         
-        # Make sure reflection_questions is not empty
-        if len(lesson_json["reflection_questions"]) == 0:
-            lesson_json["reflection_questions"] = ["What did you learn from this lesson?"]
+        return lesson_response
+    
+    except HTTPException:
+        # Re-raise HTTP exceptions
+        raise
+    except Exception as e:
+        logger.error("Error generating lesson content: %s", e, extra={"module_id": request.module_id})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating lesson content: {str(e)}"
+        )
+
+@router.post("/create-lesson-content/stream")
+async def stream_lesson_content(
+    request: LessonRequest,
+    priority: Priority = Query(Priority.INTERACTIVE, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    """
+    Stream lesson content as NDJSON while it is being generated.
+    
+    Each line is a JSON object with an "event" field: lesson_title, introduction,
+    section (one per content section, as soon as it is complete), summary,
+    reflection_questions, next_steps and resources, followed by a final "done"
+    event carrying the lesson_id. Fields the model leaves out are filled with
+    the same defaults as /create-lesson-content before "done" is sent.
+    """
+    module_context = await _get_module_context(artifact_store, request.module_id)
+    course_context = await _get_course_context(artifact_store, module_context.get("course_id"))
+    prompt = ai_service.create_lesson_content_prompt(request, module_context, course_context)
+    lesson_defaults = _lesson_defaults(request)
+    
+    def process_field(field: str, value: Any) -> Any:
+        """Apply the /create-lesson-content default-filling rules to one field"""
+        if field == "reflection_questions":
+            return _process_reflection_questions(value or lesson_defaults[field])
+        if field == "resources":
+            resources = _process_resources(value)
+            return [resource.model_dump() for resource in resources] if resources else None
+        if not value:
+            return lesson_defaults[field]
+        return value
+    
+    async def generate_events():
+        logger.info("Streaming lesson content for: %s", request.lesson_title, extra={"module_id": request.module_id})
+        parser = IncrementalJSONParser(stream_arrays={"sections"})
+        fields: Dict[str, Any] = {}
+        sections: List[ContentSection] = []
         
-        # Process resources if available
-        resources = None
-        if "resources" in lesson_json and isinstance(lesson_json["resources"], list):
-            try:
-                resources = []
-                for i, resource in enumerate(lesson_json["resources"]):
-                    resource_defaults = {
-                        "title": f"Resource {i+1}",
-                        "description": "Additional learning resource",
-                        "type": "reference",
-                        "url": None
-                    }
-                    
-                    # Create a new resource dict with defaults for missing fields
-                    processed_resource = {}
-                    for field, default_value in resource_defaults.items():
-                        processed_resource[field] = resource.get(field, default_value)
-                        
-                        # If the field exists but is empty, use the default
-                        if field in resource and not resource[field] and field != "url":
-                            processed_resource[field] = default_value
-                    
-                    resources.append(ResourceItem(**processed_resource))
-            except Exception as e:
-                logger.warning(f"Error processing lesson resources: {str(e)}")
-                resources = None
+        try:
+            async for chunk in ai_service.stream_ai_content(
+                prompt, temperature=0.7, cache_mode=cache, priority=priority, response_model=LessonResponse
+            ):
+                for field, index, value in parser.feed(chunk):
+                    if field == "sections" and index is not None:
+                        section = _process_section(len(sections), value)
+                        yield _event_line("section", section.model_dump(), index=len(sections))
+                        sections.append(section)
+                    elif field in lesson_defaults or field == "resources":
+                        fields[field] = process_field(field, value)
+                        yield _event_line(field, fields[field])
+        except HTTPException as e:
+            yield _event_line("error", e.detail)
+            return
+        
+        if not parser.done:
+            logger.warning("Lesson stream ended before the JSON document was complete")
+        
+        # Fill in anything the model did not produce
+        if not sections:
+            ai_service.metrics.fallbacks.inc("lesson_sections")
+            for i, section in enumerate(lesson_defaults["sections"]):
+                sections.append(_process_section(i, section))
+                yield _event_line("section", sections[-1].model_dump(), index=i)
+        for field in lesson_defaults:
+            if field != "sections" and field not in fields:
+                logger.warning("Missing or empty field in lesson response: %s", field)
+                ai_service.metrics.fallbacks.inc(f"lesson_{field}")
+                fields[field] = process_field(field, None)
+                yield _event_line(field, fields[field])
         
-        # Create the response object with a unique ID
-        lesson_id = generate_id("les")
         lesson_response = LessonResponse(
-            lesson_id=lesson_id,
-            lesson_title=lesson_json["lesson_title"],
-            introduction=lesson_json["introduction"],
-            sections=processed_sections,
-            summary=lesson_json["summary"],
-            reflection_questions=lesson_json["reflection_questions"],
-            next_steps=lesson_json["next_steps"],
-            resources=resources
+            lesson_id=generate_id("les"),
+            lesson_title=fields["lesson_title"],
+            introduction=fields["introduction"],
+            sections=sections,
+            summary=fields["summary"],
+            reflection_questions=fields["reflection_questions"],
+            next_steps=fields["next_steps"],
+            resources=fields.get("resources")
         )
+        await _store_lesson(artifact_store, lesson_response, request, module_context.get("course_id"))
+        yield _event_line("done", {"lesson_id": lesson_response.lesson_id})
+    
+    return StreamingResponse(generate_events(), media_type="application/x-ndjson")
+
+@router.post("/create-lesson-content/batch")
+async def create_lesson_content_batch(
+    batch: LessonBatchRequest,
+    priority: Priority = Query(Priority.BATCH, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    """
+    Generate several lessons (e.g. every lesson of a module) concurrently.
+    
+    Returns NDJSON: one "result" line per lesson in completion order, with the
+    request's `index`, a `status` of "succeeded" (with the LessonResponse in
+    `data`) or "failed" (with `error`), then a final "done" line with counts.
+    """
+    logger.info("Generating batch of %d lessons", len(batch.requests))
+    jobs = [
+        partial(create_lesson_content, item, priority=priority, cache=cache, ai_service=ai_service, artifact_store=artifact_store)
+        for item in batch.requests
+    ]
+    return StreamingResponse(_batch_events("lesson", jobs), media_type="application/x-ndjson")
+
+@router.post("/create-lesson-with-quiz", response_model=LessonWithQuizResponse)
+async def create_lesson_with_quiz(
+    request: LessonWithQuizRequest,
+    priority: Priority = Query(Priority.INTERACTIVE, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    """
+    Generate a lesson and its quiz in a single model call.
+    
+    The quiz is written from the generated lesson content rather than from the
+    lesson title and objective alone. Both are stored as if created by
+    /create-lesson-content and /create-quiz, so a later /create-quiz for the
+    returned lesson_id with the same difficulty_level, num_questions and
+    include_explanations returns this quiz without calling the model.
+    """
+    module_context = await _get_module_context(artifact_store, request.module_id)
+    course_context = await _get_course_context(artifact_store, module_context.get("course_id"))
+    prompt = ai_service.create_lesson_with_quiz_prompt(request, module_context, course_context)
+    
+    try:
+        logger.info("Generating lesson content and quiz for: %s", request.lesson_title, extra={"module_id": request.module_id})
+        generated = await ai_service.generate_validated(
+            prompt, LessonWithQuizResponse, temperature=0.7, cache_mode=cache, priority=priority
+        )
+        lesson_response = _finish_lesson(ai_service, generated.lesson.model_dump(), request)
+        quiz_response = _finish_quiz(ai_service, generated.quiz.model_dump(), lesson_response.lesson_id)
         
-        # Store lesson context for quiz generation
-        lesson_context_data = {
-            "lesson_title": request.lesson_title,
-            "lesson_objective": request.lesson_objective,
-            "difficulty_level": request.difficulty_level.value if request.difficulty_level else None,
-            "content_style": request.content_style.value if request.content_style else None
-        }
-        lesson_store[lesson_id] = lesson_context_data
+        # The quiz is stored with the settings a matching /create-quiz request would carry
+        quiz_request = QuizRequest(
+            lesson_id=lesson_response.lesson_id,
+            difficulty_level=request.difficulty_level or DifficultyLevel.INTERMEDIATE,
+            num_questions=request.num_questions,
+            include_explanations=request.include_explanations
+        )
+        await _store_lesson(artifact_store, lesson_response, request, module_context.get("course_id"))
+        await _store_quiz(artifact_store, quiz_response, _quiz_context(quiz_request))
         
-        return lesson_response
+        return LessonWithQuizResponse(lesson=lesson_response, quiz=quiz_response)
     
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error generating lesson content: {str(e)}")
+        logger.error("Error generating lesson content and quiz: %s", e, extra={"module_id": request.module_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating lesson content: {str(e)}"
+            detail=f"Error generating lesson content and quiz: {str(e)}"
         )
 
 @router.post("/create-quiz", response_model=QuizResponse)
-async def create_quiz(request: QuizRequest):
+async def create_quiz(
+    request: QuizRequest,
+    priority: Priority = Query(Priority.INTERACTIVE, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    # A quiz already generated with the same settings (e.g. together with its lesson) is served from storage
+    if cache == CacheMode.USE:
+        stored_quiz = await _find_stored_quiz(artifact_store, request)
+        if stored_quiz is not None:
+            logger.info("Serving stored quiz %s", stored_quiz.quiz_id, extra={"lesson_id": request.lesson_id})
+            return stored_quiz
+    
     # Get lesson information if available
-    lesson_context = {}
+    lesson_context = await artifact_store.get_context("lesson", request.lesson_id)
     
-    if request.lesson_id in lesson_store:
-        lesson_context = lesson_store[request.lesson_id]
-    else:
+    if lesson_context is None:
         # Use minimal context if lesson data is not available
         lesson_context = {
             "lesson_title": "Lesson",
@@ -208,118 +457,19 @@ async def create_quiz(request: QuizRequest):
         }
     
     # Prepare the prompt for quiz creation
-    prompt = ai_service.create_quiz_prompt(request, lesson_context)
+    course_context = await _get_course_context(artifact_store, lesson_context.get("course_id"))
+    prompt = ai_service.create_quiz_prompt(request, lesson_context, course_context)
     
     try:
-        # Generate quiz
-        logger.info(f"Generating quiz for lesson: {request.lesson_id}")
-        quiz_data = await ai_service.generate_ai_content(prompt, temperature=0.7)
-        
-        # Debug: Log a sample of the raw response
-        logger.debug(f"Raw AI response (first 500 chars): {quiz_data[:500]}")
-        
-        # Clean and parse the response
-        if "```" in quiz_data:
-            json_match = re.search(r'```(?:json)?(.*?)```', quiz_data, re.DOTALL)
-            if json_match:
-                quiz_data = json_match.group(1).strip()
-                logger.debug(f"Extracted JSON from code block: {quiz_data[:200]}...")
-        
-        # Parse the JSON with explicit error handling
-        try:
-            quiz_json = json.loads(quiz_data)
-            logger.debug(f"Successfully parsed JSON: {json.dumps(quiz_json)[:200]}...")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
-            logger.debug(f"Raw response: {quiz_data}")
-            
-            # Create a default JSON structure since parsing failed
-            quiz_json = {
-                "quiz_introduction": f"Test your knowledge of {lesson_context.get('lesson_title', 'the lesson')}.",
-                "questions": [
-                    {
-                        "question": "Default question since content generation failed?",
-                        "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"],
-                        "correct_answer": "A. Option 1",
-                        "explanation": "This is a default question because the AI failed to generate proper content.",
-                        "difficulty": "medium"
-                    }
-                ],
-                "passing_score": 80,
-                "difficulty_level": request.difficulty_level.value if hasattr(request, 'difficulty_level') else "intermediate"
-            }
-            logger.info("Using default quiz JSON structure due to parsing error")
-        
-        # Create default content for all required fields if missing
-        quiz_defaults = {
-            "quiz_introduction": f"Test your knowledge of {lesson_context.get('lesson_title', 'the lesson')}.",
-            "questions": [
-                {
-                    "question": "Default question since content generation failed?",
-                    "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"],
-                    "correct_answer": "A. Option 1",
-                    "explanation": "This is a default question because the AI failed to generate proper content.",
-                    "difficulty": "medium"
-                }
-            ],
-            "passing_score": 80,
-            "difficulty_level": request.difficulty_level.value if hasattr(request, 'difficulty_level') else "intermediate"
-        }
-        
-        # Fill in any missing fields with defaults
-        for field, default_value in quiz_defaults.items():
-            if field not in quiz_json or not quiz_json[field]:
-                logger.warning(f"Missing or empty field in quiz response: {field}")
-                quiz_json[field] = default_value
-        
-        # Validate questions structure
-        if "questions" not in quiz_json or not isinstance(quiz_json["questions"], list) or len(quiz_json["questions"]) == 0:
-            logger.error("Questions field is not a valid list or is empty")
-            quiz_json["questions"] = quiz_defaults["questions"]
-        
-        # Process questions to ensure required fields
-        questions_with_ids = []
-        for i, question in enumerate(quiz_json["questions"]):
-            question_defaults = {
-                "question": f"Question {i+1}?",
-                "options": ["A. Option 1", "B. Option 2", "C. Option 3", "D. Option 4"],
-                "correct_answer": "A. Option 1",
-                "explanation": "Explanation not provided.",
-                "difficulty": "medium"
-            }
-            
-            # Create a new question dict with defaults for missing fields
-            processed_question = {}
-            for field, default_value in question_defaults.items():
-                processed_question[field] = question.get(field, default_value)
-                
-                # If the field exists but is empty, use the default
-                if field in question and not question[field]:
-                    processed_question[field] = default_value
-            
-            # Add question_id
-            processed_question["question_id"] = generate_id("q")
-            
-            # Make sure options is a list
-            if not isinstance(processed_question["options"], list) or len(processed_question["options"]) < 2:
-                processed_question["options"] = question_defaults["options"]
-            
-            # Verify correct_answer is in options
-            if processed_question["correct_answer"] not in processed_question["options"]:
-                processed_question["correct_answer"] = processed_question["options"][0]
-            
-            questions_with_ids.append(QuizQuestion(**processed_question))
-        
-        # Create the response object with a unique ID
-        quiz_id = generate_id("quiz")
-        quiz_response = QuizResponse(
-            quiz_id=quiz_id,
-            lesson_id=request.lesson_id,
-            quiz_introduction=quiz_json["quiz_introduction"],
-            questions=questions_with_ids,
-            passing_score=quiz_json.get("passing_score", 80),
-            difficulty_level=quiz_json.get("difficulty_level", request.difficulty_level.value if hasattr(request, 'difficulty_level') else "intermediate")
+        # Generate quiz, constrained to the QuizResponse schema and validated in one pass
+        logger.info("Generating quiz for lesson: %s", request.lesson_id, extra={"lesson_id": request.lesson_id})
+        generated = await ai_service.generate_validated(
+            prompt, QuizResponse, temperature=0.7, cache_mode=cache, priority=priority
         )
+        quiz_response = _finish_quiz(ai_service, generated.model_dump(), request.lesson_id)
+        
+        # Store the quiz alongside its lesson
+        await _store_quiz(artifact_store, quiz_response, _quiz_context(request))
         
         return quiz_response
     
@@ -327,8 +477,29 @@ async def create_quiz(request: QuizRequest):
         # Re-raise HTTP exceptions
         raise
     except Exception as e:
-        logger.error(f"Error generating quiz: {str(e)}")
+        logger.error("Error generating quiz: %s", e, extra={"lesson_id": request.lesson_id})
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating quiz: {str(e)}"
         )
+
+@router.post("/create-quiz/batch")
+async def create_quiz_batch(
+    batch: QuizBatchRequest,
+    priority: Priority = Query(Priority.BATCH, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store)
+):
+    """
+    Generate quizzes for several lessons concurrently.
+    
+    Returns NDJSON in the same format as /create-lesson-content/batch, with a
+    QuizResponse in `data` for each succeeded item.
+    """
+    logger.info("Generating batch of %d quizzes", len(batch.requests))
+    jobs = [
+        partial(create_quiz, item, priority=priority, cache=cache, ai_service=ai_service, artifact_store=artifact_store)
+        for item in batch.requests
+    ]
+    return StreamingResponse(_batch_events("quiz", jobs), media_type="application/x-ndjson")
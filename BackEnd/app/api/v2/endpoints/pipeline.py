@@ -0,0 +1,184 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from app.config import get_settings
+from app.models.v2.course import CourseRequest, ModuleInfo
+from app.models.v2.module import ModuleRequest, LessonInfo
+from app.models.v2.lesson import LessonRequest, LessonWithQuizRequest
+from app.models.v2.pipeline import FullCourseResponse, ModuleBundle, LessonBundle
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import ArtifactStore
+from app.services.context_cache import track_prompt_usage
+from app.services.course_index import CourseSimilarityIndex
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import Priority
+from app.api.v2.endpoints.courses import plan_course
+from app.api.v2.endpoints.modules import plan_module
+from app.api.v2.endpoints.lessons import create_lesson_content, create_lesson_with_quiz
+from app.api.dependencies import get_ai_service_v2, get_index, get_store
+from typing import Any, Optional
+import asyncio
+import logging
+import time
+
+# Configure logging
+logger = logging.getLogger("course_generation_api")
+
+router = APIRouter(tags=["pipeline"])
+
+@router.post("/generate-course", response_model=FullCourseResponse, status_code=status.HTTP_201_CREATED)
+async def generate_course(
+    request: CourseRequest,
+    include_quizzes: bool = Query(True, description="Generate a quiz for every lesson"),
+    num_questions: int = Query(5, ge=3, le=10, description="Questions per quiz"),
+    priority: Priority = Query(Priority.BATCH, description="Scheduling lane: interactive or batch"),
+    cache: CacheMode = Query(CacheMode.USE, description="Generation cache behaviour: use, bypass or refresh"),
+    ai_service: AIServiceV2 = Depends(get_ai_service_v2),
+    artifact_store: ArtifactStore = Depends(get_store),
+    course_index: Optional[CourseSimilarityIndex] = Depends(get_index)
+):
+    """
+    Generate a complete course (plan, modules, lessons and quizzes) in one call.
+    
+    The course tree is generated as a dependency graph: every module plan starts
+    as soon as the course plan is available, and every lesson starts as soon as
+    its module plan is available, so end-to-end latency follows the depth of the
+    tree rather than the total number of generations. Each lesson and its quiz
+    come from a single generation (as /create-lesson-with-quiz).
+    
+    `metadata.prompt_usage` reports the estimated input tokens of the build and
+    how many of them were served from a cached prompt prefix.
+    
+    For large courses, POST /jobs/generate-course runs the same build in the
+    background and reports progress and partial results while it runs.
+    """
+    return await build_course(
+        request, include_quizzes, num_questions,
+        priority=priority, cache=cache, ai_service=ai_service, artifact_store=artifact_store,
+        course_index=course_index
+    )
+
+async def build_course(
+    request: CourseRequest,
+    include_quizzes: bool,
+    num_questions: int,
+    priority: Priority,
+    cache: CacheMode,
+    ai_service: AIServiceV2,
+    artifact_store: ArtifactStore,
+    course_index: Optional[CourseSimilarityIndex] = None,
+    progress=None
+) -> FullCourseResponse:
+    """
+    Build a course tree; see generate_course.
+    
+    The course plan is added to `course_index`, if given, for later /plan-course reuse.
+    `progress`, if given, is told about every generation as it is planned
+    (add_total) and finishes (add_result), e.g. the JobContext of a background job.
+    """
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(get_settings().pipeline_max_concurrency)
+    counters = {"generations": 0, "failures": 0}
+    # Stage endpoints are called directly, so their query parameters and dependencies are passed explicitly
+    stage_args = {"priority": priority, "cache": cache, "ai_service": ai_service, "artifact_store": artifact_store}
+    
+    async def run_stage(coro):
+        try:
+            async with slots:
+                counters["generations"] += 1
+                return await coro
+        finally:
+            # Cancelled while waiting for a slot (e.g. the job was cancelled): discard the unstarted stage
+            coro.close()
+    
+    async def report(kind: str, data: Any):
+        if progress is not None:
+            await progress.add_result(kind, data)
+    
+    async def build_lesson(lesson_info: LessonInfo, module_id: str) -> LessonBundle:
+        bundle = LessonBundle(lesson_info=lesson_info)
+        try:
+            lesson_fields = {
+                "module_id": module_id,
+                "lesson_title": lesson_info.lesson_title,
+                "lesson_objective": lesson_info.lesson_objective,
+                "difficulty_level": request.difficulty_level,
+                "content_style": request.content_style,
+                "focus_areas": lesson_info.key_points
+            }
+            if include_quizzes:
+                # One generation writes the lesson and a quiz on its actual content
+                lesson_request = LessonWithQuizRequest(**lesson_fields, num_questions=num_questions)
+                fused = await run_stage(create_lesson_with_quiz(lesson_request, **stage_args))
+                bundle.lesson, bundle.quiz = fused.lesson, fused.quiz
+                await report("lesson", bundle.lesson.model_dump(mode="json"))
+                await report("quiz", bundle.quiz.model_dump(mode="json"))
+            else:
+                bundle.lesson = await run_stage(create_lesson_content(LessonRequest(**lesson_fields), **stage_args))
+                await report("lesson", bundle.lesson.model_dump(mode="json"))
+        except HTTPException as e:
+            logger.error("Lesson generation failed for %s: %s", lesson_info.lesson_title, e.detail)
+            counters["failures"] += 1
+            bundle.error = str(e.detail)
+            await report("error", {"lesson_title": lesson_info.lesson_title, "detail": bundle.error})
+            if progress is not None and include_quizzes and bundle.lesson is None:
+                # The quiz of a failed lesson is never generated
+                await progress.add_total(-1)
+        return bundle
+    
+    async def build_module(module_info: ModuleInfo, course_id: str) -> ModuleBundle:
+        bundle = ModuleBundle(module_info=module_info)
+        try:
+            module_request = ModuleRequest(
+                course_id=course_id,
+                module_title=module_info.module_title,
+                module_summary=module_info.module_summary,
+                key_concepts=module_info.key_concepts,
+                difficulty_level=request.difficulty_level,
+                content_style=request.content_style
+            )
+            bundle.module = await run_stage(plan_module(module_request, **stage_args))
+        except HTTPException as e:
+            logger.error("Module generation failed for %s: %s", module_info.module_title, e.detail)
+            counters["failures"] += 1
+            bundle.error = str(e.detail)
+            await report("error", {"module_title": module_info.module_title, "detail": bundle.error})
+            return bundle
+        
+        if progress is not None:
+            await progress.add_total(len(bundle.module.lessons) * (2 if include_quizzes else 1))
+        await report("module", {"module_title": module_info.module_title, **bundle.module.model_dump(mode="json")})
+        
+        # Fan out every lesson of this module as soon as its plan is available
+        bundle.lessons = await asyncio.gather(*[
+            build_lesson(lesson_info, bundle.module.module_id)
+            for lesson_info in bundle.module.lessons
+        ])
+        return bundle
+    
+    # Input tokens of every model call below, and how many were served from a cached prompt prefix
+    with track_prompt_usage() as usage:
+        # The course plan is the root of the graph; failures here fail the request
+        logger.info("Generating full course for: %s", request.title)
+        if progress is not None:
+            await progress.add_total(1)
+        # A reused course already has modules under it, so the full build always plans a new one
+        course = await run_stage(plan_course(request, reuse=False, course_index=course_index, **stage_args))
+        if progress is not None:
+            await progress.add_total(len(course.modules))
+        await report("course", course.model_dump(mode="json"))
+        
+        # Fan out every module plan concurrently
+        module_bundles = await asyncio.gather(*[
+            build_module(module_info, course.course_id)
+            for module_info in course.modules
+        ])
+    
+    return FullCourseResponse(
+        course=course,
+        modules=module_bundles,
+        metadata={
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "generations": counters["generations"],
+            "failures": counters["failures"],
+            "prompt_usage": usage.stats(),
+        }
+    )
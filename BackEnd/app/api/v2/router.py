@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v2.endpoints import courses, modules, lessons, health
+from app.api.v2.endpoints import courses, modules, lessons, pipeline, jobs, health
 
 # Create the v2 router
 router = APIRouter(prefix="/api/v2", tags=["v2"])
@@ -8,4 +8,6 @@ router = APIRouter(prefix="/api/v2", tags=["v2"])
 router.include_router(courses.router)
 router.include_router(modules.router)
 router.include_router(lessons.router)
+router.include_router(pipeline.router)
+router.include_router(jobs.router)
 router.include_router(health.router)
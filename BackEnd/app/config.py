@@ -10,6 +10,116 @@ class Settings(BaseSettings):
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
     model_name: str = "gemini-2.0-flash-exp"
     
+    # API versions to serve; a disabled version's dependencies are never imported
+    api_v1_enabled: bool = True
+    api_v2_enabled: bool = True
+    
+    # Maximum number of Gemini calls allowed in flight at once (per process)
+    max_concurrent_generations: int = 8
+    
+    # Gemini rate limits enforced by the scheduler (0 disables a limit)
+    llm_requests_per_minute: int = 2000
+    llm_tokens_per_minute: int = 4000000
+    llm_expected_output_tokens: int = 2048
+    
+    # Scheduler queues: calls beyond these limits are rejected with 429/503 and Retry-After
+    llm_interactive_queue_size: int = 100
+    llm_batch_queue_size: int = 500
+    llm_max_queue_wait: float = 30.0
+    
+    # Retries of transient Gemini errors (capped at a fraction of recent traffic) and the circuit breaker
+    llm_max_attempts: int = 3
+    llm_retry_budget_ratio: float = 0.2
+    llm_retry_budget_min_per_second: float = 1.0
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_reset_timeout: float = 30.0
+    
+    # Opt-in request hedging: a second identical call is fired when the first is slower than
+    # hedge_percentile of recent calls; hedges are capped at hedge_budget_ratio of requests
+    hedging_enabled: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_samples: int = 20
+    hedge_min_delay: float = 1.0
+    hedge_budget_ratio: float = 0.1
+    
+    # Replies cut off at max_output_tokens are resumed with up to this many continuation calls (0 disables)
+    llm_max_continuations: int = 2
+    
+    # Constrain model output to JSON schemas derived from the v2 response models
+    structured_output_enabled: bool = True
+    
+    # Maximum number of concurrent generations started by a single /generate-course build
+    pipeline_max_concurrency: int = 8
+    
+    # Share one model call between identical concurrent generations
+    coalescing_enabled: bool = True
+    
+    # Generation cache (set cache_dir to enable the on-disk tier, swept to stay within the disk bounds)
+    cache_enabled: bool = True
+    cache_max_entries: int = 512
+    cache_ttl_seconds: int = 3600
+    cache_dir: str = ""
+    cache_disk_max_bytes: int = 256 * 1024 * 1024
+    cache_disk_max_files: int = 10000
+    cache_disk_sweep_interval: float = 300.0
+    
+    # Explicit context caching: the shared prompt prefix (static instructions and course context)
+    # is uploaded once and reused by every module, lesson and quiz call of the course.
+    # Off by default: the shared prefix (~2k tokens) is below the default model's minimum cache size,
+    # so enable it together with a model that caches prefixes this small (e.g. 2.5 Flash, 1024 tokens)
+    context_cache_enabled: bool = False
+    context_cache_ttl_seconds: int = 3600
+    # Smallest prefix the provider caches: 4096 tokens for Gemini 2.0 models, 1024 for 2.5 Flash
+    context_cache_min_prefix_tokens: int = 4096
+    context_cache_max_entries: int = 256
+    
+    # Storage for generated courses, modules, lessons and quizzes ("sqlite" or "memory")
+    artifact_store_backend: str = "sqlite"
+    artifact_store_path: str = "data/artifacts.sqlite3"
+    artifact_cache_max_entries: int = 1024
+    
+    # Near-duplicate course requests: /plan-course returns a stored course planned for a request
+    # at least this similar (MinHash/LSH over the normalized request, computed locally)
+    course_reuse_enabled: bool = True
+    course_reuse_threshold: float = 0.8
+    course_index_path: str = "data/course_index.sqlite3"
+    
+    # Course exports: finished files cached by content hash (empty dir disables), PDF layout in a process pool
+    export_cache_dir: str = "data/exports"
+    export_cache_max_files: int = 200
+    export_render_workers: int = 2
+    
+    # Logging: level and line format ("json" or "text"); records are written from a background thread
+    log_level: str = "INFO"
+    log_format: str = "json"
+    
+    # Raw model outputs kept in a rotating on-disk ring buffer for post-mortems (empty path disables):
+    # outputs that failed to parse or needed repair always, successful ones at raw_output_sample_rate
+    raw_output_path: str = "data/raw_outputs.jsonl"
+    raw_output_sample_rate: float = 0.0
+    raw_output_max_bytes: int = 10_000_000
+    raw_output_backups: int = 4
+    
+    # Distributed tracing: W3C traceparent propagation with spans exported to a sink ("jsonl" or "memory")
+    tracing_enabled: bool = False
+    trace_sink: str = "jsonl"
+    trace_path: str = "data/traces.jsonl"
+    
+    # Background jobs: SQLite job table shared by all worker processes, and the in-process worker pool.
+    # A running job's lease is renewed while it runs; jobs whose lease expired (crashed process) are resumed
+    job_store_path: str = "data/jobs.sqlite3"
+    job_workers: int = 2
+    job_lease_seconds: float = 30.0
+    job_max_attempts: int = 3
+    job_webhook_timeout: float = 10.0
+    job_webhook_attempts: int = 3
+    
+    # Persistent MCP server pool used by the v1 agent
+    mcp_max_concurrency_per_server: int = 4
+    mcp_health_check_interval: float = 30.0
+    mcp_startup_timeout: float = 60.0
+    mcp_tool_timeout: float = 120.0
+    
     class Config:
         env_file = ".env"
 
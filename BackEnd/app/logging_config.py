@@ -0,0 +1,120 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from typing import Any, Dict, Optional
+from app.config import get_settings
+from app.services.tracing import current_span
+
+# Logger for raw model outputs; its records go only to the on-disk ring buffer
+RAW_OUTPUT_LOGGER = "raw_output"
+
+# Attributes every LogRecord has; anything else was passed through `extra` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats every record in the calling thread. Here the
+    request path only captures the trace context and enqueues the record; the
+    %-style message, JSON encoding and I/O happen in the background. Log
+    arguments must therefore be values that are not mutated after the call
+    (strings, numbers, IDs), which is how the hot path logs.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Tracebacks reference live frames; render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, "trace_id"):
+            span = current_span()
+            if span is not None:
+                record.trace_id = span.trace_id
+        return record
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class RawOutputFormatter(logging.Formatter):
+    """A raw model output as one JSON line: the output itself plus the fields passed in `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": record.created, "reason": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+def configure_logging() -> None:
+    """
+    Route application logging through a background thread; safe to call more than once.
+
+    Records are put on an unbounded queue, so logging never blocks the event
+    loop, and a QueueListener formats and writes them. If the host (e.g. a
+    test runner) already configured root handlers, those are left alone.
+    Raw model outputs go to a size-bounded, rotating file (a ring buffer of
+    raw_output_backups + 1 files) when RAW_OUTPUT_PATH is set.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    settings = get_settings()
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handlers = []
+
+    root = logging.getLogger()
+    if not root.handlers:
+        console = logging.StreamHandler()
+        if settings.log_format == "json":
+            console.setFormatter(StructuredFormatter())
+        else:
+            console.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+        # Raw model outputs go to the ring buffer only, never to the console
+        console.addFilter(lambda record: record.name != RAW_OUTPUT_LOGGER)
+        handlers.append(console)
+        root.addHandler(DeferredQueueHandler(log_queue))
+        root.setLevel(settings.log_level.upper())
+
+    raw_logger = logging.getLogger(RAW_OUTPUT_LOGGER)
+    raw_logger.propagate = False
+    if settings.raw_output_path:
+        os.makedirs(os.path.dirname(os.path.abspath(settings.raw_output_path)), exist_ok=True)
+        ring = logging.handlers.RotatingFileHandler(
+            settings.raw_output_path, maxBytes=settings.raw_output_max_bytes,
+            backupCount=settings.raw_output_backups, encoding="utf-8", delay=True
+        )
+        ring.setFormatter(RawOutputFormatter())
+        # Only records from the raw output logger reach the ring buffer
+        ring.addFilter(logging.Filter(RAW_OUTPUT_LOGGER))
+        handlers.append(ring)
+        raw_logger.addHandler(DeferredQueueHandler(log_queue))
+        raw_logger.setLevel(logging.INFO)
+    else:
+        raw_logger.disabled = True
+
+    if not handlers:
+        return
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
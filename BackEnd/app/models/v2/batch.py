@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from app.models.v2.lesson import LessonRequest, QuizRequest
+
+class LessonBatchRequest(BaseModel):
+    requests: List[LessonRequest] = Field(..., min_length=1, max_length=50)
+
+class QuizBatchRequest(BaseModel):
+    requests: List[QuizRequest] = Field(..., min_length=1, max_length=50)
+
+class BatchItemError(BaseModel):
+    status_code: int
+    detail: Any
+
+class BatchItemResult(BaseModel):
+    """One NDJSON line of a batch response; `index` refers to the position in the request list"""
+    event: str = "result"
+    index: int
+    status: str  # "succeeded" or "failed"
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[BatchItemError] = None
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.services.job_queue import JobStatus
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+class JobProgress(BaseModel):
+    completed: int
+    total: int
+
+class JobResultItem(BaseModel):
+    """A partial result; `seq` increases by one per result, so polling can resume after the last one seen"""
+    seq: int
+    kind: str
+    data: Any
+
+class JobInfo(BaseModel):
+    job_id: str
+    type: str
+    status: JobStatus
+    progress: JobProgress
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    webhook_url: Optional[str] = None
+    webhook_status: Optional[str] = None
+    partial_results: List[JobResultItem] = []
+
+    @classmethod
+    def from_job(cls, job: Dict[str, Any], results: Optional[List[Dict[str, Any]]] = None) -> "JobInfo":
+        return cls(
+            job_id=job["id"],
+            type=job["type"],
+            status=job["status"],
+            progress=JobProgress(completed=job["completed"], total=job["total"]),
+            attempts=job["attempts"],
+            created_at=_timestamp(job["created_at"]),
+            started_at=_timestamp(job["started_at"]),
+            finished_at=_timestamp(job["finished_at"]),
+            result=job["result"],
+            error=job["error"],
+            webhook_url=job["webhook_url"],
+            webhook_status=job["webhook_status"],
+            partial_results=results or [],
+        )
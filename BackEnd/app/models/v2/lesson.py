@@ -46,3 +46,12 @@ class QuizResponse(BaseModel):
     questions: List[QuizQuestion]
     passing_score: int
     difficulty_level: str
+
+class LessonWithQuizRequest(LessonRequest):
+    """A lesson plus the quiz on it; the quiz uses the lesson's difficulty level"""
+    num_questions: Optional[int] = Field(5, ge=3, le=10)
+    include_explanations: Optional[bool] = True
+
+class LessonWithQuizResponse(BaseModel):
+    lesson: LessonResponse
+    quiz: QuizResponse
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from app.models.v2.course import CourseResponse, ModuleInfo
+from app.models.v2.module import ModuleResponse, LessonInfo
+from app.models.v2.lesson import LessonResponse, QuizResponse
+
+class LessonBundle(BaseModel):
+    lesson_info: LessonInfo
+    lesson: Optional[LessonResponse] = None
+    quiz: Optional[QuizResponse] = None
+    error: Optional[str] = None
+
+class ModuleBundle(BaseModel):
+    module_info: ModuleInfo
+    module: Optional[ModuleResponse] = None
+    lessons: List[LessonBundle] = []
+    error: Optional[str] = None
+
+class FullCourseResponse(BaseModel):
+    course: CourseResponse
+    modules: List[ModuleBundle]
+    metadata: Dict[str, Any] = {}
@@ -3,7 +3,6 @@ import os
 from typing import Any, Dict
 from fastapi import HTTPException
 from app.config import get_settings
-from app.services.mcp_service import LangChainAgent # mcp server adapter
 
 class AIService:
     def __init__(self):
@@ -11,6 +10,9 @@ class AIService:
         if not settings.google_api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
+        # LangChain, LangGraph and the MCP adapters are slow to import; load them only when v1 is used
+        from app.services.mcp_service import LangChainAgent # mcp server adapter
+        
         # Initialize the LangChain agent
         self.lang_chain_agent = LangChainAgent()
     
@@ -1,67 +1,710 @@
 import json
-from typing import Any, Dict
-import google.generativeai as genai
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple, Type
 from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
 from app.config import get_settings
+from app.services.generation_cache import CacheMode, GenerationCache, get_generation_cache
+from app.services.single_flight import SingleFlight, get_single_flight
+from app.services.llm_scheduler import LLMScheduler, Priority, get_llm_scheduler
+from app.services.llm_resilience import LLMResilience, get_llm_resilience
+from app.services.hedging import HedgingPolicy, get_hedging_policy
+from app.services.context_cache import ContextCache, Prompt, get_context_cache, record_prompt_usage
+from app.services.parse_stats import ParseStats, get_parse_stats
+from app.services.metrics import Metrics, get_metrics, timed_stage
+from app.services.tracing import get_tracer
+from app.services.continuation import (
+    MAX_TOKENS, ContinuationStats, continuation_config, continuation_prompt, finish_reason, get_continuation_stats, stitch
+)
+from app.utils.response_schema import generation_model, response_schema, strip_code_fence
+from app.utils.json_repair import parse_json_lenient, repair_json
+import asyncio
 import logging
+import random
 import re
-from tenacity import retry, stop_after_attempt, wait_exponential
+import time
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers are configured once by the application (app.logging_config), never at import
 logger = logging.getLogger("ai_service_v2")
+raw_output_logger = logging.getLogger("raw_output")
+
+def _is_valid_json(text: str) -> bool:
+    """Check whether a model response (optionally fenced) parses as JSON"""
+    if "```" in text:
+        json_match = re.search(r'```(?:json)?(.*?)```', text, re.DOTALL)
+        if json_match:
+            text = json_match.group(1)
+    try:
+        json.loads(text.strip())
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def _parse_generated(generated_model: Type[BaseModel], text: str) -> Tuple[BaseModel, bool]:
+    """Validate model output in one pass, repairing malformed JSON locally if needed; returns (result, repaired)"""
+    try:
+        return generated_model.model_validate_json(strip_code_fence(text)), False
+    except ValidationError as e:
+        # Only syntax errors can be repaired; well-formed JSON with the wrong shape is a real failure
+        if not any(error["type"] == "json_invalid" for error in e.errors()):
+            raise
+        repaired = repair_json(text)
+        if repaired is None:
+            raise
+        return generated_model.model_validate_json(repaired), True
+
+def _total_token_count(response) -> Optional[int]:
+    """Total tokens billed for a response, if the SDK reported usage"""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage else None
+
+# Prompts for module, lesson and quiz calls start with these instructions and the
+# course context, which stay identical across every call of a course of the same
+# task (see AIServiceV2._assemble_prompt); only the TASK part that follows varies
+PROMPT_HEADER = """
+        You write course material: module plans, lessons and quizzes. The instructions below describe the
+        material and its JSON format; the TASK at the end of this prompt says what to produce.
+        """
+
+MODULE_INSTRUCTIONS = """
+        # MODULE PLAN INSTRUCTIONS
+        Design a detailed module structure that follows best practices in instructional design:
+        
+        1. Create a compelling module introduction (1-2 paragraphs) that:
+           - Establishes relevance of this module within the larger course
+           - Creates interest and motivation for the learner
+           - Provides an overview of what will be covered
+        2. Develop a clear learning path description explaining how concepts build upon each other
+        3. Design 3-5 logical lessons that cover the module content comprehensively
+        4. Include 1-3 engaging activities that reinforce the module's content
+        
+        For each lesson provide:
+        - A clear, descriptive title
+        - A specific learning objective
+        - Estimated time to complete
+        - 3-5 key points that will be covered
+        
+        For each activity provide:
+        - A descriptive title
+        - The activity type (discussion, exercise, project, reflection, etc.)
+        - A brief description
+        - Estimated time to complete
+        
+        Include 3-5 high-quality recommended resources that specifically support this module's content.
+        
+        A module plan is a JSON object with EXACTLY this structure:
+        {
+          "module_introduction": "A compelling introduction to the module...",
+          "learning_path": "Description of how the concepts build upon each other...",
+          "lessons": [
+            {
+              "lesson_title": "Title of Lesson 1",
+              "lesson_objective": "Specific objective for lesson 1",
+              "estimated_duration": "30-45 minutes",
+              "key_points": ["Key point 1", "Key point 2", "Key point 3"]
+            }
+          ],
+          "activities": [
+            {
+              "activity_title": "Title of Activity 1",
+              "activity_type": "exercise",
+              "activity_description": "Description of the activity",
+              "estimated_duration": "20 minutes"
+            }
+          ],
+          "resources": [
+            {
+              "title": "Resource Title",
+              "description": "Description of the resource",
+              "type": "book/article/video",
+              "url": "http://example.com/resource"
+            }
+          ]
+        }
+        Each lesson MUST include lesson_title, lesson_objective, estimated_duration, and key_points (as an array).
+        """
+
+LESSON_INSTRUCTIONS = """
+        # LESSON INSTRUCTIONS
+        Create comprehensive, well-structured lesson content that effectively teaches the subject matter.
+        Structure your lesson with the following components:
+        
+        1. An engaging introduction (1-2 paragraphs) that:
+           - Creates interest in the topic
+           - Connects to prior knowledge
+           - Clearly states what will be learned
+           
+        2. 4-6 content sections, each with:
+           - A descriptive heading
+           - Clear explanations of concepts (200-400 words per section)
+           - Examples, analogies, or case studies where appropriate
+           - Visual descriptions or diagrams where helpful
+           - A smooth transition to the next section
+           
+        3. A concise summary (1 paragraph) that:
+           - Reinforces key takeaways
+           - Connects back to the main learning objective
+           
+        4. 3-5 reflection questions that promote critical thinking
+        
+        5. Next steps guidance that suggests how to apply or extend the learning
+        
+        6. 2-4 recommended resources for further exploration
+        
+        A lesson is a JSON object with the following structure:
+        {
+          "lesson_title": "The lesson title from the lesson specifications",
+          "introduction": "An engaging introduction to the lesson...",
+          "sections": [
+            {
+              "heading": "First Section Heading",
+              "content": "Detailed content for the first section...",
+              "importance": 2
+            },
+            {
+              "heading": "Second Section Heading",
+              "content": "Detailed content for the second section...",
+              "importance": 3
+            }
+          ],
+          "summary": "A concise summary of the lesson...",
+          "reflection_questions": [
+            "First reflection question?",
+            "Second reflection question?",
+            "Third reflection question?"
+          ],
+          "next_steps": "Guidance on how to apply or extend the learning...",
+          "resources": [
+            {
+              "title": "Resource Title",
+              "description": "Description of the resource",
+              "type": "book/article/video",
+              "url": "http://example.com/resource"
+            }
+          ]
+        }
+        """
+
+QUIZ_INSTRUCTIONS = """
+        # QUIZ INSTRUCTIONS
+        Design a comprehensive assessment that effectively evaluates understanding of the lesson content.
+        Create a quiz with the following elements:
+        
+        1. A brief quiz introduction that:
+           - Explains the purpose of the assessment
+           - Provides clear instructions for completion
+           
+        2. The number of questions given in the quiz specifications, which:
+           - Are directly aligned with the lesson objective
+           - Test different cognitive levels (knowledge, comprehension, application, analysis)
+           - Use a variety of question types (predominantly multiple choice for this format)
+           - Increase in complexity throughout the quiz
+           
+        For each question provide:
+        - A clear, unambiguous question prompt
+        - 4 options (labeled A, B, C, D) with only one correct answer
+        - The correct answer, written exactly as one of the options
+        - A brief explanation of why the answer is correct
+        - A difficulty rating (easy, medium, hard)
+        
+        Set an appropriate passing score based on the quiz difficulty.
+        
+        A quiz is a JSON object with the following structure:
+        {
+          "quiz_introduction": "A brief introduction to the quiz...",
+          "questions": [
+            {
+              "question": "First question text?",
+              "options": ["A. First option", "B. Second option", "C. Third option", "D. Fourth option"],
+              "correct_answer": "B. Second option",
+              "explanation": "Explanation of why B is correct...",
+              "difficulty": "medium"
+            },
+            {
+              "question": "Second question text?",
+              "options": ["A. First option", "B. Second option", "C. Third option", "D. Fourth option"],
+              "correct_answer": "A. First option",
+              "explanation": "Explanation of why A is correct...",
+              "difficulty": "easy"
+            }
+          ],
+          "passing_score": 80,
+          "difficulty_level": "The difficulty level from the quiz specifications"
+        }
+        """
+
+LESSON_WITH_QUIZ_INSTRUCTIONS = """
+        # LESSON WITH QUIZ INSTRUCTIONS
+        Write the lesson following the LESSON INSTRUCTIONS, then a quiz on it following the QUIZ INSTRUCTIONS.
+        The quiz must test the concepts, examples and terminology of the lesson you wrote, not general
+        knowledge of the topic, and each explanation should refer to the lesson.
+        
+        The response is a JSON object with the lesson object under "lesson" and the quiz object under "quiz":
+        {"lesson": { ...lesson... }, "quiz": { ...quiz... }}
+        """
+
+TASK_INSTRUCTIONS = {
+    "module": MODULE_INSTRUCTIONS,
+    "lesson": LESSON_INSTRUCTIONS,
+    "quiz": QUIZ_INSTRUCTIONS,
+    "lesson_with_quiz": LESSON_WITH_QUIZ_INSTRUCTIONS,
+}
+
+# The instruction blocks each task needs when the prefix is not shared
+TASK_BLOCKS = {
+    "module": ["module"],
+    "lesson": ["lesson"],
+    "quiz": ["quiz"],
+    "lesson_with_quiz": ["lesson", "quiz", "lesson_with_quiz"],
+}
+
+RESPONSE_FOOTER = """
+        CRITICAL: The response MUST be a valid JSON object that can be directly parsed. Do not include any explanation or markdown formatting outside the JSON structure. Ensure ALL required fields are included with appropriate values.
+        """
 
 class AIServiceV2:
-    def __init__(self):
+    def __init__(self, model=None, max_concurrent_generations: Optional[int] = None,
+                 cache: Optional[GenerationCache] = None, single_flight: Optional[SingleFlight] = None,
+                 scheduler: Optional[LLMScheduler] = None, resilience: Optional[LLMResilience] = None,
+                 hedging: Optional[HedgingPolicy] = None, context_cache: Optional[ContextCache] = None,
+                 metrics: Optional[Metrics] = None, parse_stats: Optional[ParseStats] = None,
+                 continuation_stats: Optional[ContinuationStats] = None):
         settings = get_settings()
+        self.model_name = settings.model_name
+        self.expected_output_tokens = settings.llm_expected_output_tokens
+        self.max_attempts = settings.llm_max_attempts
+        
+        # Replies cut off at the token limit are resumed rather than regenerated
+        self.max_continuations = settings.llm_max_continuations
+        self.continuation_stats = continuation_stats or get_continuation_stats()
+        
+        # Send response schemas derived from the pydantic models as structured-output constraints
+        self.structured_output = settings.structured_output_enabled
+        self.parse_stats = parse_stats or get_parse_stats()
+        
+        # Share of successfully parsed outputs kept in the raw output ring buffer (failures are always kept)
+        self.raw_output_sample_rate = settings.raw_output_sample_rate
+        
+        # Per-stage latency, token and fallback metrics, exposed at /api/v2/metrics
+        self.metrics = metrics or get_metrics()
+        # Spans for prompt building, retry attempts, model calls and parsing, when tracing is enabled
+        self.tracer = get_tracer()
+        
+        # Error classification, retry budget and circuit breaker, shared process-wide by default
+        self.resilience = resilience or get_llm_resilience()
+        
+        # Opt-in hedging of slow calls with a second identical call
+        if hedging is not None:
+            self.hedging = hedging
+        else:
+            self.hedging = get_hedging_policy() if settings.hedging_enabled else None
+        
+        # Shared prompt prefixes are cached provider-side when the model supports it
+        if context_cache is not None:
+            self.context_cache = context_cache
+        else:
+            self.context_cache = get_context_cache() if settings.context_cache_enabled else None
+        
+        # Identical concurrent generations share one in-flight model call
+        if single_flight is not None:
+            self.single_flight = single_flight
+        else:
+            self.single_flight = get_single_flight() if settings.coalescing_enabled else None
+        
+        # Cache of raw model output, shared process-wide unless one is injected
+        if cache is not None:
+            self.cache = cache
+        else:
+            self.cache = get_generation_cache() if settings.cache_enabled else None
+        
+        # Every model call is admitted by the scheduler (concurrency cap, rate limits, priority lanes).
+        # The process-wide scheduler is used unless one, or a private concurrency cap, is given.
+        if scheduler is not None:
+            self.scheduler = scheduler
+        elif max_concurrent_generations is not None:
+            self.scheduler = LLMScheduler(max_concurrency=max_concurrent_generations)
+        else:
+            self.scheduler = get_llm_scheduler()
+        
+        # Allow a pre-built model (e.g. a stub for load testing) to be injected
+        if model is not None:
+            self._model = model
+            return
+        
         if not settings.google_api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
-        
-        # Initialize the model
-        genai.configure(api_key=settings.google_api_key)
-        self.model = genai.GenerativeModel(settings.model_name)
+        self._model = None
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-    async def generate_ai_content(self, prompt: str, temperature=0.7) -> str:
-        """Generate content using the AI model with retry logic"""
-        try:
-            generation_config = {
-                "temperature": temperature,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-                "response_mime_type": "application/json" # Request JSON format if supported
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
+    @property
+    def model(self):
+        """The Gemini model client, created on first use so google.generativeai is only imported when needed"""
+        if self._model is None:
+            import google.generativeai as genai
             
-            # Log a truncated version of the response for debugging
-            response_preview = response.text[:200] + "..." if len(response.text) > 200 else response.text
-            logger.debug(f"AI response preview: {response_preview}")
+            # Initialize the model
+            genai.configure(api_key=get_settings().google_api_key)
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+    
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+    
+    def build_generation_config(self, temperature=0.7, schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the generation config used for every model call"""
+        config = {
+            "temperature": temperature,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": 8192,
+            "response_mime_type": "application/json" # Request JSON format if supported
+        }
+        if schema is not None:
+            config["response_schema"] = schema
+        return config
+    
+    def schema_for(self, response_model: Optional[Type[BaseModel]]) -> Optional[Dict[str, Any]]:
+        """The structured-output schema for a response model, if structured output is enabled"""
+        if response_model is None or not self.structured_output:
+            return None
+        return response_schema(response_model)
+    
+    def estimate_tokens(self, prompt: str) -> int:
+        """Rough token estimate for rate limiting (~4 characters per token plus expected output)"""
+        return len(prompt) // 4 + self.expected_output_tokens
+    
+    async def generate_ai_content(self, prompt: str, temperature=0.7, cache_mode: CacheMode = CacheMode.USE,
+                                  priority: Priority = Priority.INTERACTIVE, schema: Optional[Dict[str, Any]] = None,
+                                  is_valid: Callable[[str], bool] = _is_valid_json) -> str:
+        """Generate content using the AI model, served from the generation cache when possible"""
+        generation_config = self.build_generation_config(temperature, schema)
+        cache_key = GenerationCache.make_key(prompt, self.model_name, generation_config)
+        store_result = self.cache is not None and cache_mode != CacheMode.BYPASS
+        
+        if self.cache is not None:
+            if cache_mode == CacheMode.BYPASS:
+                self.cache.record_bypass()
+            elif cache_mode == CacheMode.REFRESH:
+                self.cache.record_refresh()
+            else:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("Generation cache hit: %.12s", cache_key)
+                    return cached
+        
+        async def generate() -> str:
+            text = await self._generate_with_retry(prompt, generation_config, priority)
             
-            return response.text
+            # Never cache malformed output, otherwise resubmitting would replay the failure
+            if store_result and is_valid(text):
+                await self.cache.set(cache_key, text)
+            return text
+        
+        if self.single_flight is None:
+            return await generate()
+        return await self.single_flight.do(cache_key, generate)
+    
+    async def _generate_with_retry(self, prompt: str, generation_config: Dict[str, Any],
+                                   priority: Priority = Priority.INTERACTIVE) -> str:
+        """Call the AI model, resuming a reply cut off at the token limit with continuation calls"""
+        text, truncated = await self._call_with_retry(prompt, generation_config, priority)
+        if not truncated:
+            return text
+        
+        self.continuation_stats.truncated += 1
+        for _ in range(self.max_continuations):
+            # Only the missing tail is generated; the partial reply goes back in as context
+            self.continuation_stats.continuations += 1
+            logger.info("Reply hit the token limit after %d characters; requesting a continuation", len(text))
+            tail, truncated = await self._call_with_retry(
+                continuation_prompt(prompt, text), continuation_config(generation_config), priority
+            )
+            text = stitch(text, tail)
+            if not truncated:
+                self.continuation_stats.completed += 1
+                return text
+        
+        # Still truncated: hand back what we have and let JSON repair salvage the complete elements
+        self.continuation_stats.gave_up += 1
+        logger.warning("Reply still truncated after %d continuations", self.max_continuations)
+        return text
+    
+    async def _call_with_retry(self, prompt: str, generation_config: Dict[str, Any],
+                               priority: Priority = Priority.INTERACTIVE) -> Tuple[str, bool]:
+        """Call the AI model, retrying transient errors while the retry budget allows; returns (text, truncated)"""
+        self.resilience.budget.record_request()
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=1, max=10),
+            retry=retry_if_exception(self.resilience.should_retry),
+            reraise=True
+        )
+        async for attempt in retrying:
+            with attempt, self.tracer.span("attempt", number=attempt.retry_state.attempt_number):
+                return await self._generate_guarded(prompt, generation_config, priority)
+    
+    async def _generate_guarded(self, prompt: str, generation_config: Dict[str, Any],
+                                priority: Priority = Priority.INTERACTIVE) -> Tuple[str, bool]:
+        """
+        One logical model call behind the circuit breaker, hedged when hedging is enabled.
+        
+        The breaker sees a single outcome however many hedged calls were made for it.
+        """
+        breaker = self.resilience.breaker
+        breaker.before_call()
+        try:
+            if self.hedging is None:
+                result = await self._generate_once(prompt, generation_config, priority)
+            else:
+                # The hedge clock starts only once the primary call holds a scheduler slot
+                admitted = asyncio.Event()
+                result = await self.hedging.run(
+                    lambda: self._generate_once(prompt, generation_config, priority, admitted),
+                    admitted=admitted
+                )
+        except (HTTPException, asyncio.CancelledError):
+            breaker.release()
+            raise
         except Exception as e:
-            logger.error(f"AI generation error: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error generating content: {str(e)}")
+            error = self.resilience.classify(e)
+            kind = "transient" if error.transient else "permanent"
+            logger.error("AI generation error (%s): %s", kind, e)
+            raise error
+        breaker.record_success()
+        return result
     
-    async def generate_structured_content(self, prompt: str) -> Dict[str, Any]:
-        """Generate content and parse it as JSON"""
+    async def _model_for(self, prompt: str, priority: Priority) -> Tuple[Any, str]:
+        """
+        The model to call and what to send it; a cached shared prefix is not sent again.
+        
+        Uploading a new prefix is a model call of its own, so it waits for its own scheduler slot.
+        """
+        if self.context_cache is None:
+            record_prompt_usage(prompt, cached_prefix=False)
+            return self.model, prompt
+        return await self.context_cache.resolve(
+            self.model, self.model_name, prompt,
+            admission=lambda tokens: self.scheduler.slot(priority, tokens)
+        )
+    
+    async def _generate_once(self, prompt: str, generation_config: Dict[str, Any],
+                             priority: Priority = Priority.INTERACTIVE,
+                             admitted: Optional[asyncio.Event] = None) -> Tuple[str, bool]:
+        """
+        A single model call, admitted by the scheduler; returns (text, truncated).
+        
+        `admitted`, if given, is set once the scheduler has admitted the call.
+        """
+        model, contents = await self._model_for(prompt, priority)
+        # Use the async client so a slow generation never blocks the event loop.
+        # The call is charged for what is sent, i.e. without a cached prefix.
+        queued = time.perf_counter()
+        async with self.scheduler.slot(priority, self.estimate_tokens(contents)) as permit:
+            called = time.perf_counter()
+            if admitted is not None:
+                admitted.set()
+            self.metrics.observe_stage("queue", called - queued)
+            self.tracer.record("scheduler_wait", called - queued, priority=priority.value)
+            with self.tracer.span("model_call", model=self.model_name) as span:
+                response = await model.generate_content_async(
+                    contents,
+                    generation_config=generation_config
+                )
+                if span is not None:
+                    span.set_attribute("finish_reason", finish_reason(response))
+                    span.set_attribute("cached_prefix", contents is not prompt)
+                    span.set_attribute("total_tokens", _total_token_count(response))
+            self.metrics.observe_stage("model_call", time.perf_counter() - called)
+            permit.record_usage(_total_token_count(response))
+        self.metrics.record_usage(response)
+        
+        text = response.text
+        logger.debug("AI response preview: %.200s", text)
+        
+        return text, finish_reason(response) == MAX_TOKENS
+    
+    async def stream_ai_content(self, prompt: str, temperature=0.7, cache_mode: CacheMode = CacheMode.USE,
+                                priority: Priority = Priority.INTERACTIVE,
+                                response_model: Optional[Type[BaseModel]] = None) -> AsyncIterator[str]:
+        """Stream generated text chunk by chunk; a cache hit is yielded as a single chunk"""
+        generation_config = self.build_generation_config(temperature, self.schema_for(response_model))
+        cache_key = None
+        
+        if self.cache is not None:
+            if cache_mode == CacheMode.BYPASS:
+                self.cache.record_bypass()
+            else:
+                cache_key = GenerationCache.make_key(prompt, self.model_name, generation_config)
+                if cache_mode == CacheMode.REFRESH:
+                    self.cache.record_refresh()
+                else:
+                    cached = await self.cache.get(cache_key)
+                    if cached is not None:
+                        yield cached
+                        return
+        
+        chunks = []
+        async for text in self._stream_hedged(prompt, generation_config, priority):
+            chunks.append(text)
+            yield text
+        
+        full_text = "".join(chunks)
+        if cache_key is not None and _is_valid_json(full_text):
+            await self.cache.set(cache_key, full_text)
+    
+    async def _stream_hedged(self, prompt: str, generation_config: Dict[str, Any],
+                             priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[str]:
+        """
+        Stream from whichever of the primary and hedge calls produces its first chunk sooner.
+        
+        As with generations, the circuit breaker records one outcome for the whole stream.
+        """
+        breaker = self.resilience.breaker
+        breaker.before_call()
         try:
-            response = await self.generate_ai_content(prompt)
-            
-            # Clean the response to extract JSON
-            if "```" in response:
-                json_match = re.search(r'```(?:json)?(.*?)```', response, re.DOTALL)
-                if json_match:
-                    response = json_match.group(1).strip()
+            if self.hedging is None:
+                first, stream = None, self._stream_once(prompt, generation_config, priority)
+            else:
+                admitted = asyncio.Event()
                 
-            return json.loads(response.strip())
+                async def open_stream():
+                    stream = self._stream_once(prompt, generation_config, priority, admitted)
+                    try:
+                        return await stream.__anext__(), stream
+                    except StopAsyncIteration:
+                        return None, stream
+                
+                first, stream = await self.hedging.run(
+                    open_stream,
+                    kind="first_chunk",
+                    discard=lambda opened: opened[1].aclose(),
+                    admitted=admitted
+                )
+            try:
+                if first is not None:
+                    yield first
+                async for text in stream:
+                    yield text
+            finally:
+                await stream.aclose()
+        except (HTTPException, asyncio.CancelledError, GeneratorExit):
+            breaker.release()
+            raise
+        except Exception as e:
+            error = self.resilience.classify(e)
+            logger.error("AI streaming error: %s", e)
+            raise error
+        breaker.record_success()
+    
+    async def _stream_once(self, prompt: str, generation_config: Dict[str, Any],
+                           priority: Priority = Priority.INTERACTIVE,
+                           admitted: Optional[asyncio.Event] = None) -> AsyncIterator[str]:
+        """A single streamed model call, admitted by the scheduler"""
+        # Streams are not retried: part of the output may already have been sent
+        model, contents = await self._model_for(prompt, priority)
+        queued = time.perf_counter()
+        async with self.scheduler.slot(priority, self.estimate_tokens(contents)) as permit:
+            if admitted is not None:
+                admitted.set()
+            self.metrics.observe_stage("queue", time.perf_counter() - queued)
+            self.tracer.record("scheduler_wait", time.perf_counter() - queued, priority=priority.value)
+            response = await model.generate_content_async(
+                contents,
+                generation_config=generation_config,
+                stream=True
+            )
+            async for chunk in response:
+                yield chunk.text
+            permit.record_usage(_total_token_count(response))
+        self.metrics.record_usage(response)
+    
+    async def generate_validated(self, prompt: str, response_model: Type[BaseModel], temperature=0.7,
+                                 cache_mode: CacheMode = CacheMode.USE,
+                                 priority: Priority = Priority.INTERACTIVE) -> BaseModel:
+        """
+        Generate output constrained to `response_model`'s schema and validate it in one pass.
+        
+        Returns an instance of generation_model(response_model), i.e. the response
+        without server-assigned IDs. Malformed JSON is repaired locally first;
+        output that still fails validation is regenerated once before giving up
+        with a 500.
+        """
+        generated_model = generation_model(response_model)
+        schema = self.schema_for(response_model)
+        model_name = response_model.__name__
+        
+        # Outcome of parsing each output text: (result and repaired flag, or the error; seconds; CPU seconds).
+        # The cache's is_valid check and the caller share it, so an output is parsed and repaired once.
+        outcomes: Dict[str, Tuple[Any, float, float]] = {}
+        
+        def parse(text: str) -> Tuple[Any, float, float]:
+            if text not in outcomes:
+                # CPU time of this thread only, so concurrent requests and model waits are not counted
+                started = time.thread_time()
+                parse_started = time.perf_counter()
+                try:
+                    outcome = _parse_generated(generated_model, text)
+                except ValidationError as e:
+                    outcome = e
+                outcomes[text] = (outcome, time.perf_counter() - parse_started, time.thread_time() - started)
+            return outcomes[text]
+        
+        def is_valid(text: str) -> bool:
+            return not isinstance(parse(text)[0], ValidationError)
+        
+        for attempt in range(2):
+            text = await self.generate_ai_content(
+                prompt, temperature=temperature, cache_mode=cache_mode if attempt == 0 else CacheMode.BYPASS,
+                priority=priority, schema=schema, is_valid=is_valid
+            )
+            outcome, parse_seconds, cpu_seconds = parse(text)
+            self.metrics.observe_stage("parse_validate", parse_seconds)
+            if not isinstance(outcome, ValidationError):
+                result, repaired = outcome
+                self.tracer.record("parse_validate", parse_seconds, model=model_name, ok=True, repaired=repaired)
+                self.parse_stats.record_parse(
+                    model_name, schema is not None, ok=True, repaired=repaired, cpu_seconds=cpu_seconds
+                )
+                if repaired:
+                    logger.info("Repaired malformed %s output locally", model_name, extra={"response_model": model_name})
+                    self._keep_raw_output("repaired", model_name, prompt, text)
+                elif self.raw_output_sample_rate and random.random() < self.raw_output_sample_rate:
+                    self._keep_raw_output("sampled", model_name, prompt, text)
+                return result
+            
+            self.tracer.record("parse_validate", parse_seconds, model=model_name, ok=False)
+            self.parse_stats.record_parse(model_name, schema is not None, ok=False, cpu_seconds=cpu_seconds)
+            logger.error(
+                "%s output failed validation (%d errors)", model_name, outcome.error_count(),
+                extra={"response_model": model_name, "errors": outcome.errors(include_url=False, include_input=False)}
+            )
+            self._keep_raw_output("validation_failed", model_name, prompt, text)
+            if attempt == 0:
+                self.parse_stats.record_regeneration(model_name, schema is not None)
+        
+        raise HTTPException(status_code=500, detail="Failed to parse AI response. Please try again.")
+    
+    def _keep_raw_output(self, reason: str, model_name: str, prompt: str, text: str) -> None:
+        """Write a raw model output to the on-disk ring buffer; serialized off the request path"""
+        if raw_output_logger.isEnabledFor(logging.INFO):
+            raw_output_logger.info(reason, extra={
+                "response_model": model_name,
+                "prompt_key": GenerationCache.make_key(prompt, self.model_name, {}),
+                "output": text,
+            })
+    
+    async def generate_structured_content(self, prompt: str, cache_mode: CacheMode = CacheMode.USE) -> Dict[str, Any]:
+        """Generate content and parse it as JSON, repairing almost-valid output locally"""
+        try:
+            response = await self.generate_ai_content(
+                prompt, cache_mode=cache_mode,
+                is_valid=lambda text: repair_json(text) is not None
+            )
+            return parse_json_lenient(strip_code_fence(response))
         except json.JSONDecodeError as e:
             raise HTTPException(status_code=500, detail=f"Invalid JSON response: {str(e)}")
     
+    @timed_stage("prompt_build")
     def create_course_planning_prompt(self, request) -> str:
         """Create a detailed prompt for course planning"""
         objectives_text = "\n".join([f"- {obj}" for obj in request.learning_objectives]) if request.learning_objectives else "No specific objectives provided."
@@ -168,16 +811,37 @@ class AIServiceV2:
         IMPORTANT: Follow the EXACT format above, with all required fields. Each module MUST have module_title, module_summary, estimated_duration, and key_concepts fields.
         """
     
-    def create_module_planning_prompt(self, request, course_context: Dict) -> str:
-        """Create a detailed prompt for module planning"""
-        return f"""
-        As an expert instructional designer specializing in module development, create a comprehensive, 
-        well-structured module plan based on the following specifications:
+    def _assemble_prompt(self, task: str, course_context: Optional[Dict], suffix: str) -> Prompt:
+        """
+        Put the static instructions and the course context in front of the request-specific part.
         
+        The prompt carries only the instructions this task needs. When the model
+        supports explicit context caching, it also offers a shared prefix with the
+        instructions of every task, so all module, lesson and quiz calls of a
+        course can use one cached prefix; that longer prefix is only ever sent
+        as cached content, never inline.
+        """
+        context = ""
+        if course_context is not None:
+            context = f"""
         # COURSE CONTEXT
         COURSE TITLE: {course_context.get('course_title', 'N/A')}
         COURSE DESCRIPTION: {course_context.get('course_description', 'N/A')}
         TARGET AUDIENCE: {course_context.get('target_audience_description', 'N/A')}
+        """
+        prefix = PROMPT_HEADER + "".join(TASK_INSTRUCTIONS[name] for name in TASK_BLOCKS[task]) + context
+        shared_prefix = None
+        if self.context_cache is not None and self.context_cache.supports(self.model):
+            shared_prefix = PROMPT_HEADER + "".join(TASK_INSTRUCTIONS.values()) + context
+        return Prompt(prefix, suffix + RESPONSE_FOOTER, shared_prefix)
+    
+    @timed_stage("prompt_build")
+    def create_module_planning_prompt(self, request, course_context: Dict) -> str:
+        """Create a detailed prompt for module planning"""
+        return self._assemble_prompt("module", course_context, f"""
+        # TASK
+        As an expert instructional designer specializing in module development, create a comprehensive,
+        well-structured module plan for the module below, following the MODULE PLAN INSTRUCTIONS.
         
         # MODULE SPECIFICATIONS
         MODULE TITLE: {request.module_title}
@@ -186,87 +850,18 @@ class AIServiceV2:
         DIFFICULTY LEVEL: {request.difficulty_level.value if request.difficulty_level else "Not specified"}
         CONTENT STYLE: {request.content_style.value if request.content_style else "Not specified"}
         
-        # INSTRUCTIONS
-        Design a detailed module structure that follows best practices in instructional design:
-        
-        1. Create a compelling module introduction (1-2 paragraphs) that:
-           - Establishes relevance of this module within the larger course
-           - Creates interest and motivation for the learner
-           - Provides an overview of what will be covered
-        2. Develop a clear learning path description explaining how concepts build upon each other
-        3. Design 3-5 logical lessons that cover the module content comprehensively
-        4. Include 1-3 engaging activities that reinforce the module's content
-        
-        For each lesson provide:
-        - A clear, descriptive title
-        - A specific learning objective
-        - Estimated time to complete
-        - 3-5 key points that will be covered
-        
-        For each activity provide:
-        - A descriptive title
-        - The activity type (discussion, exercise, project, reflection, etc.)
-        - A brief description
-        - Estimated time to complete
-        
-        Include 3-5 high-quality recommended resources that specifically support this module's content.
-        
-        Format the response as a structured JSON object with EXACTLY this structure:
-        ```json
-        {{
-          "module_introduction": "A compelling introduction to the module...",
-          "learning_path": "Description of how the concepts build upon each other...",
-          "lessons": [
-            {{
-              "lesson_title": "Title of Lesson 1",
-              "lesson_objective": "Specific objective for lesson 1",
-              "estimated_duration": "30-45 minutes",
-              "key_points": [
-                "Key point 1",
-                "Key point 2",
-                "Key point 3"
-              ]
-            }},
-            {{
-              "lesson_title": "Title of Lesson 2",
-              "lesson_objective": "Specific objective for lesson 2",
-              "estimated_duration": "45-60 minutes",
-              "key_points": [
-                "Key point 1",
-                "Key point 2",
-                "Key point 3"
-              ]
-            }}
-          ],
-          "activities": [
-            {{
-              "activity_title": "Title of Activity 1",
-              "activity_type": "exercise",
-              "activity_description": "Description of the activity",
-              "estimated_duration": "20 minutes"
-            }}
-          ],
-          "resources": [
-            {{
-              "title": "Resource Title",
-              "description": "Description of the resource",
-              "type": "book/article/video",
-              "url": "http://example.com/resource"
-            }}
-          ]
-        }}
-        ```
-        
-        IMPORTANT: Follow the EXACT format above, with all required fields. Each lesson MUST include lesson_title, lesson_objective, estimated_duration, and key_points (as an array).
-        """
+        Respond with the module plan object only.
+        """)
     
-    def create_lesson_content_prompt(self, request, module_context: Dict) -> str:
+    @timed_stage("prompt_build")
+    def create_lesson_content_prompt(self, request, module_context: Dict, course_context: Optional[Dict] = None) -> str:
         """Create a detailed prompt for lesson content creation"""
         focus_areas_text = ", ".join(request.focus_areas) if request.focus_areas else "Not specified"
         
-        return f"""
+        return self._assemble_prompt("lesson", course_context, f"""
+        # TASK
         As an expert educational content developer with expertise in creating engaging and instructional lesson content,
-        create a comprehensive lesson based on the following specifications:
+        create a comprehensive lesson for the lesson below, following the LESSON INSTRUCTIONS.
         
         # MODULE CONTEXT
         MODULE TITLE: {module_context.get('module_title', 'N/A')}
@@ -279,77 +874,20 @@ class AIServiceV2:
         CONTENT STYLE: {request.content_style.value if request.content_style else "Not specified"}
         FOCUS AREAS: {focus_areas_text}
         
-        # INSTRUCTIONS
-        Create comprehensive, well-structured lesson content that effectively teaches the subject matter.
-        Structure your lesson with the following components:
-        
-        1. An engaging introduction (1-2 paragraphs) that:
-           - Creates interest in the topic
-           - Connects to prior knowledge
-           - Clearly states what will be learned
-           
-        2. 4-6 content sections, each with:
-           - A descriptive heading
-           - Clear explanations of concepts (200-400 words per section)
-           - Examples, analogies, or case studies where appropriate
-           - Visual descriptions or diagrams where helpful
-           - A smooth transition to the next section
-           
-        3. A concise summary (1 paragraph) that:
-           - Reinforces key takeaways
-           - Connects back to the main learning objective
-           
-        4. 3-5 reflection questions that promote critical thinking
-        
-        5. Next steps guidance that suggests how to apply or extend the learning
-        
-        6. 2-4 recommended resources for further exploration
-        
-        You MUST format the response as a valid JSON object with the following structure:
-        {{
-          "lesson_title": "{request.lesson_title}",
-          "introduction": "An engaging introduction to the lesson...",
-          "sections": [
-            {{
-              "heading": "First Section Heading",
-              "content": "Detailed content for the first section...",
-              "importance": 2
-            }},
-            {{
-              "heading": "Second Section Heading",
-              "content": "Detailed content for the second section...",
-              "importance": 3
-            }}
-          ],
-          "summary": "A concise summary of the lesson...",
-          "reflection_questions": [
-            "First reflection question?",
-            "Second reflection question?",
-            "Third reflection question?"
-          ],
-          "next_steps": "Guidance on how to apply or extend the learning...",
-          "resources": [
-            {{
-              "title": "Resource Title",
-              "description": "Description of the resource",
-              "type": "book/article/video",
-              "url": "http://example.com/resource"
-            }}
-          ]
-        }}
-        
-        CRITICAL: The response MUST be a valid JSON object that can be directly parsed. Do not include any explanation or markdown formatting outside the JSON structure. Ensure ALL required fields are included with appropriate values.
-        """
+        Respond with the lesson object only.
+        """)
     
-    def create_quiz_prompt(self, request, lesson_context: Dict) -> str:
+    @timed_stage("prompt_build")
+    def create_quiz_prompt(self, request, lesson_context: Dict, course_context: Optional[Dict] = None) -> str:
         """Create a detailed prompt for quiz generation"""
         difficulty = request.difficulty_level.value if hasattr(request, 'difficulty_level') and request.difficulty_level else "intermediate"
         num_questions = request.num_questions if hasattr(request, 'num_questions') else 5
         include_explanations = request.include_explanations if hasattr(request, 'include_explanations') else True
         
-        return f"""
+        return self._assemble_prompt("quiz", course_context, f"""
+        # TASK
         As an expert assessment designer with expertise in educational testing and evaluation,
-        create a comprehensive quiz based on the following specifications:
+        create a comprehensive quiz for the lesson below, following the QUIZ INSTRUCTIONS.
         
         # LESSON CONTEXT
         LESSON TITLE: {lesson_context.get('lesson_title', 'N/A')}
@@ -360,51 +898,36 @@ class AIServiceV2:
         NUMBER OF QUESTIONS: {num_questions}
         INCLUDE EXPLANATIONS: {include_explanations}
         
-        # INSTRUCTIONS
-        Design a comprehensive assessment that effectively evaluates understanding of the lesson content.
-        Create a quiz with the following elements:
+        Respond with the quiz object only.
+        """)
+    
+    @timed_stage("prompt_build")
+    def create_lesson_with_quiz_prompt(self, request, module_context: Dict, course_context: Optional[Dict] = None) -> str:
+        """Create a prompt for a lesson and a quiz on that lesson's content, generated together"""
+        focus_areas_text = ", ".join(request.focus_areas) if request.focus_areas else "Not specified"
+        difficulty = request.difficulty_level.value if request.difficulty_level else "intermediate"
         
-        1. A brief quiz introduction that:
-           - Explains the purpose of the assessment
-           - Provides clear instructions for completion
-           
-        2. {num_questions} questions that:
-           - Are directly aligned with the lesson objective
-           - Test different cognitive levels (knowledge, comprehension, application, analysis)
-           - Use a variety of question types (predominantly multiple choice for this format)
-           - Increase in complexity throughout the quiz
-           
-        For each question provide:
-        - A clear, unambiguous question prompt
-        - 4 options (labeled A, B, C, D) with only one correct answer
-        - The correct answer clearly indicated
-        - A brief explanation of why the answer is correct
-        - A difficulty rating (easy, medium, hard)
+        return self._assemble_prompt("lesson_with_quiz", course_context, f"""
+        # TASK
+        As an expert educational content developer and assessment author,
+        write a lesson and then a quiz that tests exactly what that lesson teaches,
+        following the LESSON WITH QUIZ INSTRUCTIONS.
         
-        Set an appropriate passing score based on the quiz difficulty.
+        # MODULE CONTEXT
+        MODULE TITLE: {module_context.get('module_title', 'N/A')}
+        MODULE SUMMARY: {module_context.get('module_summary', 'N/A')}
         
-        You MUST format the response as a valid JSON object with the following structure:
-        {{
-          "quiz_introduction": "A brief introduction to the quiz...",
-          "questions": [
-            {{
-              "question": "First question text?",
-              "options": ["A. First option", "B. Second option", "C. Third option", "D. Fourth option"],
-              "correct_answer": "B. Second option",
-              "explanation": "Explanation of why B is correct...",
-              "difficulty": "medium"
-            }},
-            {{
-              "question": "Second question text?",
-              "options": ["A. First option", "B. Second option", "C. Third option", "D. Fourth option"],
-              "correct_answer": "A. First option",
-              "explanation": "Explanation of why A is correct...",
-              "difficulty": "easy"
-            }}
-          ],
-          "passing_score": 80,
-          "difficulty_level": "{difficulty}"
-        }}
+        # LESSON SPECIFICATIONS
+        LESSON TITLE: {request.lesson_title}
+        LESSON OBJECTIVE: {request.lesson_objective}
+        DIFFICULTY LEVEL: {request.difficulty_level.value if request.difficulty_level else "Not specified"}
+        CONTENT STYLE: {request.content_style.value if request.content_style else "Not specified"}
+        FOCUS AREAS: {focus_areas_text}
         
-        CRITICAL: The response MUST be a valid JSON object that can be directly parsed. Do not include any explanation or markdown formatting outside the JSON structure. Ensure ALL required fields are included with appropriate values.
-        """
+        # QUIZ SPECIFICATIONS
+        DIFFICULTY LEVEL: {difficulty}
+        NUMBER OF QUESTIONS: {request.num_questions}
+        INCLUDE EXPLANATIONS: {request.include_explanations}
+        
+        Respond with the object holding the lesson and the quiz.
+        """)
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from app.config import get_settings
+from app.services.tracing import current_span, link_to
+
+logger = logging.getLogger("artifact_store")
+
+# A stored artifact is a plain dict:
+#   kind       - "course", "module", "lesson" or "quiz"
+#   id         - the artifact's public ID (course_id, module_id, ...)
+#   parent_id  - ID of the artifact it was generated under, if any
+#   context    - the compact context used to prompt child generations
+#   artifact   - the full generated response (e.g. CourseResponse.model_dump())
+#   created_at - UNIX timestamp
+#
+# When the request that generates an artifact is traced, its traceparent is
+# kept in the context, and fetching that context later links the child
+# generation's span to it, so a whole course build can be followed across requests.
+
+class ArtifactStore(ABC):
+    """Storage interface for generated courses, modules, lessons and quizzes"""
+
+    @abstractmethod
+    async def put(self, kind: str, artifact_id: str, context: Dict[str, Any],
+                  artifact: Optional[Dict[str, Any]] = None, parent_id: Optional[str] = None) -> None:
+        """Insert or replace an artifact"""
+
+    @abstractmethod
+    async def get(self, kind: str, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an artifact record, or None if it does not exist"""
+
+    @abstractmethod
+    async def list_children(self, kind: str, parent_id: str) -> List[Dict[str, Any]]:
+        """Fetch every artifact of `kind` generated under `parent_id`, oldest first"""
+
+    async def get_context(self, kind: str, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch only the prompt context of an artifact"""
+        record = await self.get(kind, artifact_id)
+        if record is None:
+            return None
+        link_to(record["context"].get("traceparent"))
+        return record["context"]
+
+    async def close(self) -> None:
+        pass
+
+def _make_record(kind, artifact_id, context, artifact, parent_id, created_at=None) -> Dict[str, Any]:
+    if created_at is None:
+        # A new artifact: remember which trace generated it
+        span = current_span()
+        if span is not None:
+            context = {**context, "traceparent": span.traceparent}
+            span.attributes.setdefault("artifacts", []).append(f"{kind}:{artifact_id}")
+    return {
+        "kind": kind,
+        "id": artifact_id,
+        "parent_id": parent_id,
+        "context": context,
+        "artifact": artifact,
+        "created_at": created_at if created_at is not None else time.time(),
+    }
+
+class MemoryArtifactStore(ArtifactStore):
+    """Process-local store; contents are lost on restart and not shared between workers"""
+
+    def __init__(self):
+        self._records: Dict[tuple, Dict[str, Any]] = {}
+
+    async def put(self, kind, artifact_id, context, artifact=None, parent_id=None) -> None:
+        self._records[(kind, artifact_id)] = _make_record(kind, artifact_id, context, artifact, parent_id)
+
+    async def get(self, kind, artifact_id):
+        return self._records.get((kind, artifact_id))
+
+    async def list_children(self, kind, parent_id):
+        children = [r for r in self._records.values() if r["kind"] == kind and r["parent_id"] == parent_id]
+        return sorted(children, key=lambda r: r["created_at"])
+
+class SQLiteArtifactStore(ArtifactStore):
+    """
+    SQLite-backed store in WAL mode.
+
+    WAL lets any number of uvicorn worker processes read concurrently while one
+    writes, so an artifact created on one worker is visible to all of them.
+    Queries run in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach the ones opened in worker threads
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                kind TEXT NOT NULL,
+                id TEXT NOT NULL,
+                parent_id TEXT,
+                context TEXT NOT NULL,
+                artifact TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (kind, id)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_parent ON artifacts (kind, parent_id)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only this thread uses it; check_same_thread=False just lets close() run elsewhere
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _row_to_record(row) -> Dict[str, Any]:
+        kind, artifact_id, parent_id, context, artifact, created_at = row
+        return _make_record(
+            kind, artifact_id, json.loads(context),
+            json.loads(artifact) if artifact is not None else None,
+            parent_id, created_at
+        )
+
+    def _put_sync(self, record: Dict[str, Any]) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (kind, id, parent_id, context, artifact, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                record["kind"], record["id"], record["parent_id"],
+                json.dumps(record["context"]),
+                json.dumps(record["artifact"]) if record["artifact"] is not None else None,
+                record["created_at"],
+            )
+        )
+        conn.commit()
+
+    def _get_sync(self, kind: str, artifact_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT kind, id, parent_id, context, artifact, created_at FROM artifacts WHERE kind = ? AND id = ?",
+            (kind, artifact_id)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def _list_children_sync(self, kind: str, parent_id: str) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT kind, id, parent_id, context, artifact, created_at FROM artifacts "
+            "WHERE kind = ? AND parent_id = ? ORDER BY created_at",
+            (kind, parent_id)
+        ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    async def put(self, kind, artifact_id, context, artifact=None, parent_id=None) -> None:
+        record = _make_record(kind, artifact_id, context, artifact, parent_id)
+        await asyncio.to_thread(self._put_sync, record)
+
+    async def get(self, kind, artifact_id):
+        return await asyncio.to_thread(self._get_sync, kind, artifact_id)
+
+    async def list_children(self, kind, parent_id):
+        return await asyncio.to_thread(self._list_children_sync, kind, parent_id)
+
+    async def close(self) -> None:
+        """Close the connection of every thread that used the store; it must not be used afterwards"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+class CachedArtifactStore(ArtifactStore):
+    """Bounded in-process read-through LRU in front of another store"""
+
+    def __init__(self, backend: ArtifactStore, max_entries: int = 1024):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, record: Dict[str, Any]) -> None:
+        key = (record["kind"], record["id"])
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def put(self, kind, artifact_id, context, artifact=None, parent_id=None) -> None:
+        await self.backend.put(kind, artifact_id, context, artifact, parent_id)
+        self._entries.pop((kind, artifact_id), None)
+
+    async def get(self, kind, artifact_id):
+        key = (kind, artifact_id)
+        record = self._entries.get(key)
+        if record is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        record = await self.backend.get(kind, artifact_id)
+        if record is not None:
+            self._remember(record)
+        return record
+
+    async def list_children(self, kind, parent_id):
+        return await self.backend.list_children(kind, parent_id)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "max_entries": self.max_entries}
+
+@lru_cache()
+def get_artifact_store() -> ArtifactStore:
+    settings = get_settings()
+    if settings.artifact_store_backend == "memory":
+        backend = MemoryArtifactStore()
+    elif settings.artifact_store_backend == "sqlite":
+        backend = SQLiteArtifactStore(settings.artifact_store_path)
+    else:
+        raise ValueError(f"Unknown artifact store backend: {settings.artifact_store_backend}")
+
+    logger.info("Using %s artifact store", settings.artifact_store_backend)
+    return CachedArtifactStore(backend, max_entries=settings.artifact_cache_max_entries)
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, AsyncContextManager, Callable, Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException
+from app.config import get_settings
+
+logger = logging.getLogger("context_cache")
+
+# Cached prefixes are dropped locally this long before the provider expires them,
+# so a call never references a cache entry that is about to disappear
+EXPIRY_MARGIN_SECONDS = 60
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of prompt text (~4 characters per token, as the scheduler estimates)"""
+    return len(text) // 4
+
+class Prompt(str):
+    """
+    A prompt whose first `prefix_length` characters are shared by many calls.
+
+    The prefix holds the static instructions and the course context, the
+    suffix the request-specific part. A Prompt is a plain string everywhere
+    else (cache keys, token estimates, logging); only the model call splits it.
+
+    `shared_prefix`, if set, is a longer prefix that may stand in for `prefix`
+    once it is cached (e.g. the instructions of every task rather than just
+    this one's), so that calls of different tasks share one cache entry. It is
+    never sent as part of a plain prompt.
+    """
+
+    prefix_length: int
+    shared_prefix: Optional[str]
+
+    def __new__(cls, prefix: str, suffix: str, shared_prefix: Optional[str] = None):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix_length = len(prefix)
+        prompt.shared_prefix = shared_prefix
+        return prompt
+
+    @property
+    def prefix(self) -> str:
+        return str.__getitem__(self, slice(None, self.prefix_length))
+
+    @property
+    def suffix(self) -> str:
+        return str.__getitem__(self, slice(self.prefix_length, None))
+
+class PromptUsage:
+    """
+    Estimated input tokens of the model calls made while tracking, e.g. during one course build.
+
+    `input_tokens` counts every call's plain per-task prompt, i.e. what would be
+    sent without context caching; `sent_input_tokens` what was actually sent,
+    and `prefix_upload_tokens` the prefixes uploaded to create cache entries.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.cached_calls = 0
+        self.input_tokens = 0
+        self.sent_input_tokens = 0
+        self.prefix_upload_tokens = 0
+
+    def stats(self) -> Dict[str, Any]:
+        paid = self.sent_input_tokens + self.prefix_upload_tokens
+        return {
+            "model_calls": self.calls,
+            "cached_prefix_calls": self.cached_calls,
+            "input_tokens": self.input_tokens,
+            "sent_input_tokens": self.sent_input_tokens,
+            "prefix_upload_tokens": self.prefix_upload_tokens,
+            "input_token_savings": round(1 - paid / self.input_tokens, 4) if self.input_tokens else 0.0,
+        }
+
+_usage: ContextVar[Optional[PromptUsage]] = ContextVar("prompt_usage", default=None)
+
+@contextmanager
+def track_prompt_usage() -> Iterator[PromptUsage]:
+    """Count the input tokens of every model call made in this context, including tasks it starts"""
+    usage = PromptUsage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+def record_prompt_usage(prompt: str, cached_prefix: bool) -> None:
+    usage = _usage.get()
+    if usage is None:
+        return
+    usage.calls += 1
+    usage.input_tokens += estimate_tokens(prompt)
+    if cached_prefix:
+        usage.cached_calls += 1
+        usage.sent_input_tokens += estimate_tokens(prompt.suffix)
+    else:
+        usage.sent_input_tokens += estimate_tokens(prompt)
+
+def _record_prefix_upload(prefix: str) -> None:
+    usage = _usage.get()
+    if usage is not None:
+        usage.prefix_upload_tokens += estimate_tokens(prefix)
+
+def _is_gemini_model(model) -> bool:
+    return type(model).__module__.startswith("google.generativeai")
+
+class ContextCache:
+    """
+    Provider-side caches of long prompt prefixes, shared by every call that starts with them.
+
+    For a Prompt with a shared prefix of at least `min_prefix_tokens` (the
+    provider's minimum cached content size), the shared prefix is uploaded once
+    as explicit cached content and calls send only their suffix against it.
+    Concurrent calls for a new prefix share one upload, which can be made to
+    wait for its own admission (e.g. a scheduler slot). Models without explicit
+    context caching and short prefixes are sent as plain prompts; so is every
+    prompt for a model whose provider refused a prefix (e.g. a model version
+    without caching) during the following TTL.
+
+    Gemini models are supported through google.generativeai's CachedContent.
+    Any other model opts in with a true `supports_context_caching` attribute
+    and `async create_cached_content(prefix, ttl_seconds)`, which returns an
+    object with the usual `generate_content_async`, bound to that prefix.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, min_prefix_tokens: int = 4096, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.min_prefix_tokens = min_prefix_tokens
+        self.max_entries = max_entries
+        # Prefix key -> (local expiry, model bound to the cached prefix)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Model -> time after which the provider may be asked to cache again
+        self._refused: Dict[Tuple[str, int], float] = {}
+        self._creating: Dict[str, asyncio.Task] = {}
+        self._stats = {"cached_calls": 0, "plain_calls": 0, "created": 0, "refused": 0, "cached_input_tokens": 0}
+
+    def supports(self, model) -> bool:
+        """Whether prompts for `model` should offer a shared prefix to cache"""
+        if self._refused.get((getattr(model, "model_name", ""), id(model)), 0) > time.monotonic():
+            # Caching was refused recently; don't ask again before the refusal expires
+            return False
+        return _is_gemini_model(model) or bool(getattr(model, "supports_context_caching", False))
+
+    async def resolve(self, model, model_name: str, prompt: str,
+                      admission: Optional[Callable[[int], AsyncContextManager]] = None) -> Tuple[Any, str]:
+        """
+        The model to call and the contents to send it: the cached-prefix model and the suffix, or `model` and `prompt`.
+
+        A prefix upload runs inside `admission(estimated_tokens)`, if given.
+        """
+        bound = None
+        shared_prefix = prompt.shared_prefix if isinstance(prompt, Prompt) else None
+        if (shared_prefix is not None and estimate_tokens(shared_prefix) >= self.min_prefix_tokens
+                and self.supports(model)):
+            bound = await self._bound_model(model, model_name, shared_prefix, admission)
+
+        record_prompt_usage(prompt, cached_prefix=bound is not None)
+        if bound is None:
+            self._stats["plain_calls"] += 1
+            return model, prompt
+        self._stats["cached_calls"] += 1
+        self._stats["cached_input_tokens"] += estimate_tokens(shared_prefix)
+        return bound, prompt.suffix
+
+    async def _bound_model(self, model, model_name: str, prefix: str,
+                           admission: Optional[Callable[[int], AsyncContextManager]]) -> Optional[Any]:
+        # The bound model keeps `model` alive, so its id is not reused while the entry exists
+        key = hashlib.sha256(f"{model_name}\x00{id(model)}\x00{prefix}".encode("utf-8")).hexdigest()
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+        task = self._creating.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(model, prefix, admission))
+            self._creating[key] = task
+            task.add_done_callback(lambda t: self._creating.pop(key, None))
+        try:
+            bound = await asyncio.shield(task)
+        except HTTPException:
+            # The upload was not admitted (e.g. the queue is full): send this call plain, it is not a refusal
+            return None
+        except Exception as e:
+            # Too short for the provider, model without caching support, quota...: use plain prompts for a while
+            refused_key = (getattr(model, "model_name", ""), id(model))
+            if self._refused.get(refused_key, 0) <= now:
+                self._stats["refused"] += 1
+                logger.warning("Context caching refused for a %d-character prefix: %s", len(prefix), e)
+            self._refused[refused_key] = now + self.ttl_seconds
+            return None
+
+        if key not in self._entries:
+            self._stats["created"] += 1
+            logger.info("Cached a %d-character prompt prefix for %ds", len(prefix), self.ttl_seconds)
+        expires = now + max(self.ttl_seconds - EXPIRY_MARGIN_SECONDS, self.ttl_seconds / 2)
+        self._entries[key] = (expires, bound)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            # The provider entry simply expires on its own
+            self._entries.popitem(last=False)
+        return bound
+
+    async def _create(self, model, prefix: str, admission: Optional[Callable[[int], AsyncContextManager]]) -> Any:
+        if admission is None:
+            bound = await self._upload(model, prefix)
+        else:
+            async with admission(estimate_tokens(prefix)):
+                bound = await self._upload(model, prefix)
+        # Runs in a copy of the first caller's context, so the upload is charged to that caller's usage
+        _record_prefix_upload(prefix)
+        return bound
+
+    async def _upload(self, model, prefix: str) -> Any:
+        if not _is_gemini_model(model):
+            return await model.create_cached_content(prefix, self.ttl_seconds)
+
+        import google.generativeai as genai
+
+        cached = await asyncio.to_thread(
+            genai.caching.CachedContent.create,
+            model=model.model_name,
+            contents=[prefix],
+            ttl=timedelta(seconds=self.ttl_seconds)
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cached)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self._stats["cached_calls"] + self._stats["plain_calls"]
+        return {
+            **self._stats,
+            "cached_rate": round(self._stats["cached_calls"] / calls, 4) if calls else 0.0,
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "min_prefix_tokens": self.min_prefix_tokens,
+        }
+
+def create_context_cache() -> ContextCache:
+    settings = get_settings()
+    return ContextCache(
+        ttl_seconds=settings.context_cache_ttl_seconds,
+        min_prefix_tokens=settings.context_cache_min_prefix_tokens,
+        max_entries=settings.context_cache_max_entries
+    )
+
+@lru_cache()
+def get_context_cache() -> ContextCache:
+    return create_context_cache()
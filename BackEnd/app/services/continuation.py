@@ -0,0 +1,87 @@
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Finish reason reported by Gemini when a reply hit max_output_tokens
+MAX_TOKENS = "MAX_TOKENS"
+
+# Overlap shorter than this between the partial output and its continuation is
+# left alone: a few repeated characters are as likely to be real content
+MIN_OVERLAP = 16
+MAX_OVERLAP = 2000
+
+def finish_reason(response) -> Optional[str]:
+    """Name of the first candidate's finish reason (e.g. "STOP", "MAX_TOKENS"), if reported"""
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return None
+    reason = getattr(candidates[0], "finish_reason", None)
+    if reason is None:
+        return None
+    return getattr(reason, "name", str(reason))
+
+def continuation_prompt(prompt: str, partial: str) -> str:
+    """Prompt asking the model to resume a reply that was cut off at the token limit"""
+    return f"""{prompt}
+
+        # CONTINUATION
+        Your previous reply to the request above was cut off because it reached the output length limit.
+        This is the reply so far, between the markers:
+        <<<PARTIAL_REPLY
+{partial}
+        PARTIAL_REPLY>>>
+
+        Continue the reply from exactly where it stops. Output ONLY the remaining text, starting with the
+        very next character. Do not repeat any of the text above, do not restart the document, and do not
+        add a code fence or any commentary.
+        """
+
+def continuation_config(generation_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Generation config for a continuation: the tail of a document is not valid JSON on its own"""
+    config = {key: value for key, value in generation_config.items() if key != "response_schema"}
+    config["response_mime_type"] = "text/plain"
+    return config
+
+def _strip_fence_opening(text: str) -> str:
+    stripped = text.lstrip()
+    if stripped.startswith("```"):
+        newline = stripped.find("\n")
+        return stripped[newline + 1:] if newline >= 0 else ""
+    return text
+
+def stitch(partial: str, continuation: str) -> str:
+    """
+    Join a truncated reply and its continuation.
+
+    Drops a code fence the model opened at the start of the continuation (unless
+    the partial output was itself fenced) and any text the continuation repeated
+    from the end of the partial output.
+    """
+    if "```" not in partial:
+        continuation = _strip_fence_opening(continuation)
+
+    longest = min(len(partial), len(continuation), MAX_OVERLAP)
+    for size in range(longest, MIN_OVERLAP - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return partial + continuation[size:]
+    return partial + continuation
+
+class ContinuationStats:
+    """Counters for replies that hit the token limit and were resumed instead of regenerated"""
+
+    def __init__(self):
+        self.truncated = 0
+        self.continuations = 0
+        self.completed = 0
+        self.gave_up = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "truncated": self.truncated,
+            "continuations": self.continuations,
+            "completed": self.completed,
+            "gave_up": self.gave_up,
+        }
+
+@lru_cache()
+def get_continuation_stats() -> ContinuationStats:
+    return ContinuationStats()
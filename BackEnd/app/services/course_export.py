@@ -0,0 +1,490 @@
+import asyncio
+import hashlib
+import html
+import json
+import logging
+import os
+import textwrap
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from app.config import get_settings
+from app.services.artifact_store import ArtifactStore
+
+logger = logging.getLogger("course_export")
+
+class ExportFormat(str, Enum):
+    MARKDOWN = "md"
+    HTML = "html"
+    PDF = "pdf"
+
+MEDIA_TYPES = {
+    ExportFormat.MARKDOWN: "text/markdown; charset=utf-8",
+    ExportFormat.HTML: "text/html; charset=utf-8",
+    ExportFormat.PDF: "application/pdf",
+}
+
+# Part of every content hash: bump it when rendering changes so cached exports are rendered again
+RENDERER_VERSION = 1
+
+# Chunk size for streaming a cached export from disk
+READ_CHUNK_SIZE = 64 * 1024
+
+# A document is a sequence of blocks: (style, text), style being one of
+# title, h1, h2, h3, p, li or meta. Renderers turn blocks into output chunks.
+Block = Tuple[str, str]
+
+# ---------------------------------------------------------------------------
+# Course tree -> blocks
+# ---------------------------------------------------------------------------
+
+# A course tree in export order: the course, then each module with its lessons and their quizzes
+Snapshot = List[Tuple[str, Dict[str, Any]]]
+
+async def walk_course(artifact_store: ArtifactStore, course_id: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield (kind, record) for the course, then each module with its lessons and
+    their quizzes, in creation order.
+    """
+    course = await artifact_store.get("course", course_id)
+    if course is None:
+        return
+    yield "course", course
+    for module in await artifact_store.list_children("module", course_id):
+        yield "module", module
+        for lesson in await artifact_store.list_children("lesson", module["id"]):
+            yield "lesson", lesson
+            for quiz in await artifact_store.list_children("quiz", lesson["id"]):
+                yield "quiz", quiz
+
+async def load_course(artifact_store: ArtifactStore, course_id: str) -> Optional[Snapshot]:
+    """
+    Read the whole course tree once, or None if the course does not exist.
+
+    The content hash and the rendered export both come from this snapshot, so
+    the ETag always describes the bytes that were sent even if a lesson is
+    regenerated mid-export.
+    """
+    snapshot = [item async for item in walk_course(artifact_store, course_id)]
+    return snapshot or None
+
+def _resource_blocks(resources: Optional[List[Dict[str, Any]]]) -> List[Block]:
+    blocks = []
+    for resource in resources or []:
+        url = f" ({resource['url']})" if resource.get("url") else ""
+        blocks.append(("li", f"{resource.get('title', '')} [{resource.get('type', '')}]{url}: {resource.get('description', '')}"))
+    return blocks
+
+def course_blocks(record: Dict[str, Any], has_modules: bool) -> List[Block]:
+    course = record["artifact"] or {}
+    blocks = [
+        ("title", course.get("course_title", record["id"])),
+        ("p", course.get("course_description", "")),
+        ("meta", f"Audience: {course.get('target_audience_description', '')}"),
+        ("meta", f"Estimated duration: {course.get('estimated_total_duration', '')}"),
+        ("h1", "Introduction"),
+        ("p", course.get("course_introduction", "")),
+        ("h1", "Learning outcomes"),
+        *[("li", outcome) for outcome in course.get("learning_outcomes", [])],
+    ]
+    if course.get("prerequisites"):
+        blocks += [("h1", "Prerequisites"), *[("li", item) for item in course["prerequisites"]]]
+    if not has_modules:
+        # Nothing generated below the course yet: export the planned outline
+        blocks.append(("h1", "Course outline"))
+        for module in course.get("modules", []):
+            blocks += [("h2", module.get("module_title", "")), ("p", module.get("module_summary", ""))]
+            blocks += [("li", concept) for concept in module.get("key_concepts", [])]
+    if course.get("recommended_resources"):
+        blocks += [("h1", "Recommended resources"), *_resource_blocks(course["recommended_resources"])]
+    return [block for block in blocks if block[1]]
+
+def module_blocks(record: Dict[str, Any], has_lessons: bool) -> List[Block]:
+    module = record["artifact"] or {}
+    blocks = [
+        ("h1", record["context"].get("module_title", "Module")),
+        ("p", module.get("module_introduction", "")),
+        ("p", module.get("learning_path", "")),
+    ]
+    if not has_lessons:
+        for lesson in module.get("lessons", []):
+            blocks += [("h2", lesson.get("lesson_title", "")), ("p", lesson.get("lesson_objective", ""))]
+            blocks += [("li", point) for point in lesson.get("key_points", [])]
+    for activity in module.get("activities") or []:
+        blocks.append(("li", f"Activity: {activity.get('activity_title', '')}: {activity.get('activity_description', '')}"))
+    blocks += _resource_blocks(module.get("resources"))
+    return [block for block in blocks if block[1]]
+
+def lesson_blocks(record: Dict[str, Any]) -> List[Block]:
+    lesson = record["artifact"] or {}
+    blocks = [("h2", lesson.get("lesson_title", "Lesson")), ("p", lesson.get("introduction", ""))]
+    for section in lesson.get("sections", []):
+        blocks += [("h3", section.get("heading", "")), ("p", section.get("content", ""))]
+    blocks += [("h3", "Summary"), ("p", lesson.get("summary", ""))]
+    if lesson.get("reflection_questions"):
+        blocks += [("h3", "Reflection questions"), *[("li", q) for q in lesson["reflection_questions"]]]
+    blocks += [("h3", "Next steps"), ("p", lesson.get("next_steps", ""))]
+    if lesson.get("resources"):
+        blocks += [("h3", "Resources"), *_resource_blocks(lesson["resources"])]
+    return [block for block in blocks if block[1]]
+
+def quiz_blocks(record: Dict[str, Any]) -> List[Block]:
+    quiz = record["artifact"] or {}
+    blocks = [
+        ("h3", "Quiz"),
+        ("p", quiz.get("quiz_introduction", "")),
+        ("meta", f"Passing score: {quiz.get('passing_score', '')}"),
+    ]
+    for i, question in enumerate(quiz.get("questions", []), start=1):
+        blocks.append(("p", f"{i}. {question.get('question', '')}"))
+        blocks += [("li", option) for option in question.get("options", [])]
+        blocks.append(("meta", f"Answer: {question.get('correct_answer', '')}. {question.get('explanation', '')}"))
+    return [block for block in blocks if block[1]]
+
+def course_documents(snapshot: Snapshot) -> Iterator[List[Block]]:
+    """The export as a sequence of documents: the course, then each module, lesson (with its quizzes) in turn"""
+    pending: Optional[List[Block]] = None
+    for i, (kind, record) in enumerate(snapshot):
+        if kind == "quiz":
+            pending += quiz_blocks(record)
+            continue
+        if pending is not None:
+            yield pending
+        if kind == "course":
+            pending = course_blocks(record, any(kind == "module" for kind, _ in snapshot))
+        elif kind == "module":
+            # A module's lessons directly follow it in the snapshot
+            has_lessons = i + 1 < len(snapshot) and snapshot[i + 1][0] == "lesson"
+            pending = module_blocks(record, has_lessons)
+        else:
+            pending = lesson_blocks(record)
+    if pending is not None:
+        yield pending
+
+# ---------------------------------------------------------------------------
+# Markdown and HTML
+# ---------------------------------------------------------------------------
+
+_MARKDOWN_PREFIX = {"title": "# ", "h1": "## ", "h2": "### ", "h3": "#### ", "li": "- ", "p": ""}
+
+def render_markdown(blocks: List[Block]) -> str:
+    lines = []
+    for i, (style, text) in enumerate(blocks):
+        line = f"_{text}_" if style == "meta" else _MARKDOWN_PREFIX[style] + text
+        # List items stay together; everything else is its own paragraph
+        joined_list = style == "li" and i > 0 and blocks[i - 1][0] == "li"
+        lines.append(("\n" if joined_list else "\n\n") + line if lines else line)
+    return "".join(lines) + "\n\n"
+
+_HTML_TAGS = {"title": "h1", "h1": "h2", "h2": "h3", "h3": "h4", "p": "p", "meta": "p class=\"meta\""}
+
+HTML_HEADER = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Georgia, serif; max-width: 46em; margin: 2em auto; padding: 0 1em; line-height: 1.55; color: #222; }}
+h1, h2, h3, h4 {{ font-family: Helvetica, Arial, sans-serif; }}
+h2 {{ border-bottom: 1px solid #ddd; padding-bottom: .2em; margin-top: 2.5em; }}
+.meta {{ color: #666; font-size: .9em; font-style: italic; }}
+</style>
+</head>
+<body>
+"""
+
+HTML_FOOTER = "</body>\n</html>\n"
+
+def render_html(blocks: List[Block]) -> str:
+    parts = []
+    in_list = False
+    for style, text in blocks:
+        if style == "li" and not in_list:
+            parts.append("<ul>\n")
+        elif style != "li" and in_list:
+            parts.append("</ul>\n")
+        in_list = style == "li"
+        if style == "li":
+            parts.append(f"<li>{html.escape(text)}</li>\n")
+        else:
+            tag = _HTML_TAGS[style]
+            parts.append(f"<{tag}>{html.escape(text)}</{tag.split()[0]}>\n")
+    if in_list:
+        parts.append("</ul>\n")
+    return "".join(parts)
+
+# ---------------------------------------------------------------------------
+# PDF
+# ---------------------------------------------------------------------------
+
+PAGE_WIDTH, PAGE_HEIGHT, MARGIN = 612, 792, 72
+
+# style -> (font resource, size, space before)
+_PDF_STYLES = {
+    "title": ("F2", 20, 0), "h1": ("F2", 16, 14), "h2": ("F2", 13, 12), "h3": ("F2", 11, 8),
+    "p": ("F1", 10, 6), "li": ("F1", 10, 2), "meta": ("F3", 9, 4),
+}
+
+# Helvetica with WinAnsi encoding covers Latin-1; map the punctuation models like to use onto it
+_PDF_TRANSLATION = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-",
+                                  "—": "-", "…": "...", "•": "-"})
+
+def _pdf_text(text: str) -> str:
+    # Strict: callers reject content with unsupported_pdf_characters rather than print "?" for it
+    text = text.translate(_PDF_TRANSLATION).encode("latin-1").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def unsupported_pdf_characters(snapshot: Snapshot) -> List[str]:
+    """Characters in the course that the built-in PDF fonts cannot show, in order of appearance"""
+    found: Dict[str, None] = {}
+    for blocks in course_documents(snapshot):
+        for _, text in blocks:
+            for ch in text.translate(_PDF_TRANSLATION):
+                if ord(ch) > 0xFF:
+                    found[ch] = None
+    return list(found)
+
+def layout_pdf_pages(blocks: List[Block]) -> List[bytes]:
+    """
+    Lay a document out on letter pages and return each page's compressed content stream.
+
+    Runs in the export process pool: wrapping, escaping and compression are
+    the CPU-heavy part of a PDF export.
+    """
+    pages: List[bytes] = []
+    lines: List[str] = []
+    y = PAGE_HEIGHT - MARGIN
+
+    def finish_page():
+        nonlocal lines, y
+        if lines:
+            pages.append(zlib.compress("\n".join(lines).encode("latin-1"), 6))
+        lines, y = [], PAGE_HEIGHT - MARGIN
+
+    for style, text in blocks:
+        font, size, space_before = _PDF_STYLES[style]
+        indent = 14 if style == "li" else 0
+        # Helvetica averages about half an em per character
+        width = max(20, int((PAGE_WIDTH - 2 * MARGIN - indent) / (size * 0.5)))
+        wrapped = textwrap.wrap(text, width) or [""]
+        line_height = size * 1.35
+        y -= space_before
+        for n, line in enumerate(wrapped):
+            if y - line_height < MARGIN:
+                finish_page()
+            y -= line_height
+            prefix = "- " if style == "li" and n == 0 else ""
+            x = MARGIN + indent - (8 if prefix else 0)
+            lines.append(f"BT /{font} {size} Tf {x} {y:.1f} Td ({_pdf_text(prefix + line)}) Tj ET")
+    finish_page()
+    return pages
+
+class PDFStreamWriter:
+    """
+    Writes a PDF incrementally: pages are emitted as soon as they are laid out,
+    and the page tree, catalog and cross-reference table follow at the end.
+    """
+
+    CATALOG, PAGES, FIRST_FONT = 1, 2, 3
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold", "F3": "Helvetica-Oblique"}
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = self.FIRST_FONT + len(self.FONTS)
+
+    def _object(self, object_id: int, body: bytes) -> bytes:
+        data = f"{object_id} 0 obj\n".encode() + body + b"\nendobj\n"
+        self.offsets[object_id] = self.offset
+        self.offset += len(data)
+        return data
+
+    def start(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset = len(header)
+        chunks = [header]
+        for i, (resource, font) in enumerate(self.FONTS.items()):
+            chunks.append(self._object(
+                self.FIRST_FONT + i,
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>".encode()
+            ))
+        return b"".join(chunks)
+
+    def pages(self, contents: List[bytes]) -> bytes:
+        fonts = " ".join(f"/{resource} {self.FIRST_FONT + i} 0 R" for i, resource in enumerate(self.FONTS))
+        chunks = []
+        for content in contents:
+            content_id, page_id = self.next_id, self.next_id + 1
+            self.next_id += 2
+            chunks.append(self._object(
+                content_id,
+                f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream"
+            ))
+            chunks.append(self._object(page_id, (
+                f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>"
+            ).encode()))
+            self.page_ids.append(page_id)
+        return b"".join(chunks)
+
+    def finish(self, title: str) -> bytes:
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        chunks = [
+            self._object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode()),
+            self._object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode()),
+        ]
+        info_id = self.next_id
+        chunks.append(self._object(info_id, f"<< /Title ({_pdf_text(title)}) >>".encode("latin-1")))
+
+        xref_offset = self.offset
+        size = info_id + 1
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        xref += [f"{self.offsets[object_id]:010d} 00000 n \n" for object_id in range(1, size)]
+        xref.append(f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R /Info {info_id} 0 R >>\n")
+        xref.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        chunks.append("".join(xref).encode())
+        return b"".join(chunks)
+
+def create_render_pool() -> ProcessPoolExecutor:
+    """Process pool for PDF layout; owned by the ServiceRegistry, which shuts it down with the app"""
+    return ProcessPoolExecutor(max_workers=get_settings().export_render_workers)
+
+# ---------------------------------------------------------------------------
+# Export with a content-addressed cache
+# ---------------------------------------------------------------------------
+
+class CourseExporter:
+    """
+    Streams Markdown, HTML or PDF exports of a course snapshot (see load_course).
+
+    Output is produced one document (course, module, or lesson with its
+    quizzes) at a time, so nothing holds the whole rendered file. Finished
+    exports are cached on disk under the SHA-256 of the snapshot, so a repeat
+    download of an unchanged course is a file read, and any regenerated lesson
+    produces a new key.
+    """
+
+    def __init__(self, artifact_store: ArtifactStore, pool: ProcessPoolExecutor, cache_dir: Optional[str] = None,
+                 max_cached_files: Optional[int] = None):
+        settings = get_settings()
+        self.artifact_store = artifact_store
+        # PDF pages are laid out in this pool; the caller owns it and shuts it down
+        self.pool = pool
+        self.cache_dir = cache_dir if cache_dir is not None else settings.export_cache_dir
+        self.max_cached_files = max_cached_files if max_cached_files is not None else settings.export_cache_max_files
+
+    @staticmethod
+    def content_hash(snapshot: Snapshot, export_format: ExportFormat) -> str:
+        """SHA-256 of everything the export is rendered from"""
+        digest = hashlib.sha256(f"{export_format.value}:{RENDERER_VERSION}".encode())
+        for kind, record in snapshot:
+            digest.update(json.dumps(
+                [kind, record["id"], record["context"].get("module_title"), record["artifact"]],
+                sort_keys=True, default=str
+            ).encode())
+        return digest.hexdigest()
+
+    async def load(self, course_id: str) -> Optional[Snapshot]:
+        return await load_course(self.artifact_store, course_id)
+
+    def cache_path(self, digest: str, export_format: ExportFormat) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.{export_format.value}")
+
+    def is_cached(self, digest: str, export_format: ExportFormat) -> bool:
+        return bool(self.cache_dir) and os.path.exists(self.cache_path(digest, export_format))
+
+    async def export(self, snapshot: Snapshot, export_format: ExportFormat, digest: str) -> AsyncIterator[bytes]:
+        """Stream the export, from the cache if it was rendered before, otherwise rendering and caching it"""
+        if self.is_cached(digest, export_format):
+            async for chunk in self._read_cached(self.cache_path(digest, export_format)):
+                yield chunk
+            return
+
+        if not self.cache_dir:
+            async for chunk in self.render(snapshot, export_format):
+                yield chunk
+            return
+
+        # Tee the rendered output into a temporary file; only a complete export is published
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.cache_path(digest, export_format)
+        partial = f"{path}.{os.getpid()}.{id(self)}.partial"
+        f = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in self.render(snapshot, export_format):
+                await asyncio.to_thread(f.write, chunk)
+                yield chunk
+            await asyncio.to_thread(f.close)
+            os.replace(partial, path)
+            await asyncio.to_thread(self._evict)
+        finally:
+            if not f.closed:
+                f.close()
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    async def _read_cached(self, path: str) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            f.close()
+
+    def _evict(self) -> None:
+        """Keep only the most recently written exports"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if not entry.name.endswith(".partial")]
+        except OSError:
+            return
+        if len(entries) <= self.max_cached_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[self.max_cached_files:]:
+            try:
+                os.remove(entry.path)
+            except OSError as e:
+                logger.warning("Failed to evict cached export %s: %s", entry.name, e)
+
+    async def render(self, snapshot: Snapshot, export_format: ExportFormat) -> AsyncIterator[bytes]:
+        documents = course_documents(snapshot)
+        if export_format == ExportFormat.PDF:
+            async for chunk in self._render_pdf(documents):
+                yield chunk
+            return
+
+        title = None
+        for blocks in documents:
+            if export_format == ExportFormat.MARKDOWN:
+                yield render_markdown(blocks).encode("utf-8")
+                continue
+            if title is None:
+                title = blocks[0][1] if blocks else snapshot[0][1]["id"]
+                yield HTML_HEADER.format(title=html.escape(title)).encode("utf-8")
+            yield render_html(blocks).encode("utf-8")
+        if export_format == ExportFormat.HTML:
+            yield HTML_FOOTER.encode("utf-8")
+
+    async def _render_pdf(self, documents: Iterator[List[Block]]) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        writer = PDFStreamWriter()
+        yield writer.start()
+
+        # Lay out the next document in the pool while the current one is being sent
+        title = "Course"
+        pending = None
+        for blocks in documents:
+            if pending is None:
+                title = blocks[0][1] if blocks else title
+            layout = loop.run_in_executor(self.pool, layout_pdf_pages, blocks)
+            if pending is not None:
+                yield writer.pages(await pending)
+            pending = layout
+        if pending is not None:
+            yield writer.pages(await pending)
+        yield writer.finish(title)
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+from app.config import get_settings
+from app.models.v2.course import CourseRequest
+
+logger = logging.getLogger("course_index")
+
+# MinHash signature length and LSH banding: 16 bands of 4 rows make a pair with
+# Jaccard similarity s a candidate with probability 1 - (1 - s^4)^16, which is
+# above 0.99 for s >= 0.75 and below 0.1 for s <= 0.3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Each shingle is hashed to this many 64-bit values, each filling one signature slot
+SAMPLES_PER_SHINGLE = 4
+
+_EMPTY = 0xFFFFFFFF
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def _words(text: Optional[str]) -> List[str]:
+    return _WORD.findall(text.lower()) if text else []
+
+def shingles(request: CourseRequest) -> set:
+    """
+    Words and word bigrams of each normalized text field, prefixed with the field name.
+
+    Casing, punctuation and whitespace are dropped, and list fields are sorted,
+    so requests that differ only in those respects have identical shingles.
+    """
+    fields = {
+        "title": _words(request.title),
+        "description": _words(request.description),
+        "audience": _words(request.target_audience),
+        "time": _words(request.time_available),
+        "objectives": [word for item in sorted(" ".join(_words(o)) for o in request.learning_objectives or []) for word in item.split()],
+        "prerequisites": [word for item in sorted(" ".join(_words(p)) for p in request.prerequisites or []) for word in item.split()],
+        "skills": [word for item in sorted(" ".join(_words(s)) for s in request.skills_to_develop or []) for word in item.split()],
+    }
+    result = set()
+    for field, words in fields.items():
+        result.update(f"{field}:{word}" for word in words)
+        result.update(f"{field}:{a} {b}" for a, b in zip(words, words[1:]))
+    return result
+
+def signature(shingle_set: set) -> array:
+    """
+    One-permutation MinHash signature of a shingle set.
+
+    Instead of NUM_PERM hash functions per shingle, every shingle is hashed
+    once into SAMPLES_PER_SHINGLE 64-bit values. The low bits of a value pick
+    a slot and the high bits compete for that slot's minimum, which estimates
+    Jaccard similarity like classic MinHash at a fraction of the cost. Slots
+    left empty (very short requests) borrow the next filled slot's value, offset
+    by the distance, so they stay comparable between signatures. Hashes are
+    stable across processes.
+    """
+    slots = [_EMPTY] * NUM_PERM
+    for shingle in shingle_set or {""}:
+        for value in array("Q", hashlib.blake2b(shingle.encode("utf-8"), digest_size=8 * SAMPLES_PER_SHINGLE).digest()):
+            slot = value & (NUM_PERM - 1)
+            value >>= 32
+            if value < slots[slot]:
+                slots[slot] = value
+
+    if _EMPTY in slots:
+        filled = [i for i, value in enumerate(slots) if value != _EMPTY]
+        for i in range(NUM_PERM):
+            if slots[i] == _EMPTY:
+                donor = next((j for j in filled if j > i), filled[0])
+                distance = (donor - i) % NUM_PERM
+                slots[i] = (slots[donor] + distance * 0x9E3779B1) & 0xFFFFFFFE
+    return array("I", slots)
+
+def request_scope(request: CourseRequest) -> str:
+    """Only courses planned with the same settings, industry and assessment type may be reused for each other"""
+    return "|".join((
+        request.difficulty_level.value if request.difficulty_level else "",
+        request.content_style.value if request.content_style else "",
+        request.preferred_format.value if request.preferred_format else "",
+        "resources" if request.include_resources else "no-resources",
+        " ".join(_words(request.industry_focus)),
+        request.assessment_preference.value if request.assessment_preference else "",
+    ))
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+class CourseSimilarityIndex:
+    """
+    In-memory MinHash/LSH index of past course requests, persisted to SQLite.
+
+    A lookup signs the request, probes one hash bucket per LSH band within the
+    request's scope (difficulty, style, format and resources), and ranks the
+    few candidates by estimated similarity, so its cost does not grow with the
+    number of stored courses. Memory use is under 2 KB per indexed course.
+    Everything is computed locally; no model or network call is involved.
+    """
+
+    def __init__(self, path: str = "", threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self._signatures: Dict[str, Tuple[str, array]] = {}
+        # Band key -> course ID, or a list of IDs when several share the bucket
+        self._buckets: Dict[int, Union[str, List[str]]] = {}
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "removed": 0}
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = self._connection()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS course_signatures (
+                    course_id TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            for course_id, scope, blob in conn.execute("SELECT course_id, scope, signature FROM course_signatures"):
+                sig = array("I")
+                sig.frombytes(blob)
+                if len(sig) == NUM_PERM:
+                    self._insert(course_id, scope, sig)
+            logger.info("Loaded %d course signatures", len(self._signatures))
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _band_keys(scope: str, sig: array) -> List[int]:
+        return [hash((scope, band, tuple(sig[band * ROWS:(band + 1) * ROWS]))) for band in range(BANDS)]
+
+    def _insert(self, course_id: str, scope: str, sig: array) -> None:
+        if course_id in self._signatures:
+            self._delete(course_id)
+        self._signatures[course_id] = (scope, sig)
+        for key in self._band_keys(scope, sig):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = course_id
+            elif isinstance(bucket, str):
+                self._buckets[key] = [bucket, course_id]
+            else:
+                bucket.append(course_id)
+
+    def _delete(self, course_id: str) -> None:
+        scope, sig = self._signatures.pop(course_id)
+        for key in self._band_keys(scope, sig):
+            bucket = self._buckets.get(key)
+            if bucket == course_id:
+                del self._buckets[key]
+            elif isinstance(bucket, list) and course_id in bucket:
+                bucket.remove(course_id)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket[0]
+
+    def find(self, request: CourseRequest) -> Optional[Tuple[str, float]]:
+        """(course_id, estimated similarity) of the most similar indexed course at or above the threshold"""
+        self._stats["lookups"] += 1
+        scope = request_scope(request)
+        sig = signature(shingles(request))
+        candidates = set()
+        for key in self._band_keys(scope, sig):
+            bucket = self._buckets.get(key)
+            if isinstance(bucket, str):
+                candidates.add(bucket)
+            elif bucket:
+                candidates.update(bucket)
+
+        best = None
+        for course_id in candidates:
+            score = similarity(sig, self._signatures[course_id][1])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (course_id, score)
+        if best is not None:
+            self._stats["hits"] += 1
+        return best
+
+    async def add(self, course_id: str, request: CourseRequest) -> None:
+        scope = request_scope(request)
+        sig = signature(shingles(request))
+        self._insert(course_id, scope, sig)
+        if self.path:
+            await asyncio.to_thread(self._add_sync, course_id, scope, sig.tobytes())
+
+    async def remove(self, course_id: str) -> None:
+        """Forget a course, e.g. one that no longer exists in the artifact store"""
+        if course_id not in self._signatures:
+            return
+        self._delete(course_id)
+        self._stats["removed"] += 1
+        if self.path:
+            await asyncio.to_thread(self._remove_sync, course_id)
+
+    def _add_sync(self, course_id: str, scope: str, blob: bytes) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO course_signatures (course_id, scope, signature, created_at) VALUES (?, ?, ?, ?)",
+            (course_id, scope, blob, time.time())
+        )
+        conn.commit()
+
+    def _remove_sync(self, course_id: str) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM course_signatures WHERE course_id = ?", (course_id,))
+        conn.commit()
+
+    async def close(self) -> None:
+        """Close the signature table's connections; lookups keep working from memory"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._signatures), "threshold": self.threshold}
+
+def create_course_index() -> CourseSimilarityIndex:
+    settings = get_settings()
+    return CourseSimilarityIndex(settings.course_index_path, threshold=settings.course_reuse_threshold)
+
+@lru_cache()
+def get_course_index() -> CourseSimilarityIndex:
+    return create_course_index()
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from app.config import get_settings
+
+logger = logging.getLogger("generation_cache")
+
+class CacheMode(str, Enum):
+    USE = "use"          # Serve from cache when possible, store fresh results
+    BYPASS = "bypass"    # Skip the cache entirely for this request
+    REFRESH = "refresh"  # Always regenerate, then overwrite the cached entry
+
+class GenerationCache:
+    """
+    Content-addressed cache of raw model output.
+    
+    Entries are keyed on a hash of the normalized prompt, model name and
+    generation config. A bounded in-memory LRU tier with TTL sits in front of
+    an optional on-disk tier that survives restarts. The disk tier is swept
+    periodically: expired files are removed, then the oldest files until it
+    is within `disk_max_files` and `disk_max_bytes`.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 3600, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024, disk_max_files: int = 10000,
+                 disk_sweep_interval: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_max_files = disk_max_files
+        self.disk_sweep_interval = disk_sweep_interval
+        self._last_sweep = 0.0
+        self._sweeping = False
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "bypasses": 0,
+            "refreshes": 0,
+            "disk_evictions": 0,
+        }
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(prompt: str, model_name: str, generation_config: Dict[str, Any]) -> str:
+        """Build a content address for a generation request"""
+        # Collapse all whitespace runs so indentation/line-wrapping differences don't matter
+        normalized_prompt = " ".join(prompt.split())
+        material = json.dumps(
+            {"prompt": normalized_prompt, "model": model_name, "config": generation_config},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached response, checking memory first and then disk"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if self._is_fresh(created_at):
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+            del self._entries[key]
+            self._stats["expirations"] += 1
+        
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                created_at, value = entry
+                # Promote to the memory tier, keeping the original timestamp
+                self._remember(key, created_at, value)
+                self._stats["disk_hits"] += 1
+                return value
+        
+        self._stats["misses"] += 1
+        return None
+    
+    async def set(self, key: str, value: str) -> None:
+        """Store a response in every enabled tier"""
+        created_at = time.time()
+        self._remember(key, created_at, value)
+        self._stats["stores"] += 1
+        
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, created_at, value)
+            except OSError as e:
+                logger.warning("Failed to write cache entry to disk: %s", e)
+            
+            if not self._sweeping and time.monotonic() - self._last_sweep >= self.disk_sweep_interval:
+                self._sweeping = True
+                try:
+                    await asyncio.to_thread(self._sweep_disk)
+                finally:
+                    self._last_sweep = time.monotonic()
+                    self._sweeping = False
+    
+    def record_bypass(self) -> None:
+        self._stats["bypasses"] += 1
+    
+    def record_refresh(self) -> None:
+        self._stats["refreshes"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes"""
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": bool(self.disk_dir),
+        }
+    
+    def clear(self) -> None:
+        """Drop every entry from the memory tier"""
+        self._entries.clear()
+    
+    def _is_fresh(self, created_at: float) -> bool:
+        return self.ttl_seconds <= 0 or (time.time() - created_at) < self.ttl_seconds
+    
+    def _remember(self, key: str, created_at: float, value: str) -> None:
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+    
+    def _disk_path(self, key: str) -> str:
+        # Shard by prefix to keep directories small
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+    
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not self._is_fresh(entry["created_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._stats["expirations"] += 1
+            return None
+        
+        return entry["created_at"], entry["value"]
+    
+    def _write_disk(self, key: str, created_at: float, value: str) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        # Write to a temp file first so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": created_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _sweep_disk(self) -> None:
+        """Remove expired entries, then the least recently written ones until the disk tier is within bounds"""
+        now = time.time()
+        entries = []
+        for shard in os.scandir(self.disk_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                # Leftover temp files of interrupted writes are removed once they are clearly stale
+                expired = entry.name.endswith(".tmp") and now - stat.st_mtime > 3600
+                if entry.name.endswith(".json"):
+                    expired = self.ttl_seconds > 0 and now - stat.st_mtime >= self.ttl_seconds
+                if expired:
+                    self._remove_disk_file(entry.path)
+                    self._stats["expirations"] += entry.name.endswith(".json")
+                elif entry.name.endswith(".json"):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total_bytes = sum(size for _, size, _ in entries)
+        entries.sort()
+        removed = 0
+        while entries and (len(entries) - removed > self.disk_max_files or total_bytes > self.disk_max_bytes):
+            _, size, path = entries[removed]
+            self._remove_disk_file(path)
+            total_bytes -= size
+            removed += 1
+        self._stats["disk_evictions"] += removed
+        if removed:
+            logger.info("Evicted %d disk cache entries to stay within bounds", removed)
+    
+    @staticmethod
+    def _remove_disk_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def create_generation_cache() -> GenerationCache:
+    settings = get_settings()
+    return GenerationCache(
+        max_entries=settings.cache_max_entries,
+        ttl_seconds=settings.cache_ttl_seconds,
+        disk_dir=settings.cache_dir or None,
+        disk_max_bytes=settings.cache_disk_max_bytes,
+        disk_max_files=settings.cache_disk_max_files,
+        disk_sweep_interval=settings.cache_disk_sweep_interval
+    )
+
+@lru_cache()
+def get_generation_cache() -> GenerationCache:
+    return create_generation_cache()
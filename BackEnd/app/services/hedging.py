@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import math
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from app.config import get_settings
+from app.services.llm_resilience import RetryBudget
+
+logger = logging.getLogger("hedging")
+
+T = TypeVar("T")
+
+class LatencyTracker:
+    """Sliding window of recent latencies used to pick the hedge delay"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+class HedgingPolicy:
+    """
+    Fires a second, identical model call when the first one is slow.
+
+    The hedge delay is the `percentile` of recent latencies, so only the slowest
+    few percent of calls are ever hedged. Latency is measured from scheduler
+    admission when the caller reports it. No hedges are sent until
+    `min_samples` latencies have been seen. Hedges draw on their own budget,
+    capped at `budget_ratio` of recent requests, and every hedge still goes
+    through the scheduler, so they never bypass the rate limits.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 20, min_delay: float = 0.0,
+                 budget_ratio: float = 0.1, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = RetryBudget(ratio=budget_ratio, min_retries_per_second=0.0)
+        # Latency until a call completes, and until a stream produces its first chunk
+        self.latency = {"complete": LatencyTracker(window), "first_chunk": LatencyTracker(window)}
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_denied = 0
+
+    def record_latency(self, kind: str, seconds: float) -> None:
+        self.latency[kind].record(seconds)
+
+    def delay(self, kind: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little data"""
+        tracker = self.latency[kind]
+        if len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def start_request(self, kind: str) -> Optional[float]:
+        """Count a request and return its hedge delay"""
+        self.requests += 1
+        self.budget.record_request()
+        return self.delay(kind)
+
+    def try_hedge(self) -> bool:
+        if self.budget.try_acquire():
+            self.hedges_fired += 1
+            return True
+        self.hedges_denied += 1
+        return False
+
+    async def run(self, call: Callable[[], Awaitable[T]], kind: str = "complete",
+                  discard: Optional[Callable[[T], Awaitable[Any]]] = None,
+                  admitted: Optional[asyncio.Event] = None) -> T:
+        """
+        Run `call`, hedging it with a second identical call if it is slow.
+
+        The first call to succeed wins and the other is cancelled; `discard`
+        releases the result of a loser that also succeeded. If one call fails
+        the other is still awaited; if both fail the primary's error is raised.
+
+        When `admitted` is given, the primary call sets it once the scheduler
+        has admitted it. The hedge clock and the recorded latency start at that
+        point, so time spent queueing never triggers a hedge: under overload a
+        hedge would only add load.
+        """
+        delay = self.start_request(kind)
+        loop = asyncio.get_running_loop()
+        primary = asyncio.ensure_future(call())
+        hedge = None
+        winner = None
+        try:
+            await self._wait_admitted(primary, admitted)
+            started = loop.time()
+            if delay is None:
+                result = await primary
+                winner = primary
+                self.record_latency(kind, loop.time() - started)
+                return result
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self.try_hedge():
+                result = await primary
+                winner = primary
+                self.record_latency(kind, loop.time() - started)
+                return result
+
+            hedge = asyncio.ensure_future(call())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is hedge:
+                            self.hedges_won += 1
+                        # Latency as seen by the caller once admitted, including the hedge delay
+                        self.record_latency(kind, loop.time() - started)
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            losers = [task for task in (primary, hedge) if task is not None and task is not winner]
+            for task in losers:
+                task.cancel()
+            if losers:
+                # Let cancelled losers unwind before returning, then retrieve every outcome
+                await asyncio.wait(losers)
+            for task in losers:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    logger.debug("Hedged call failed: %s", task.exception())
+                elif discard is not None:
+                    await discard(task.result())
+
+    @staticmethod
+    async def _wait_admitted(primary: asyncio.Future, admitted: Optional[asyncio.Event]) -> None:
+        """Wait until the primary call is admitted by the scheduler (or finishes first)"""
+        if admitted is None or admitted.is_set():
+            return
+        waiter = asyncio.ensure_future(admitted.wait())
+        try:
+            await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        delays = {kind: self.delay(kind) for kind in self.latency}
+        return {
+            "percentile": self.percentile,
+            "delay_ms": {kind: round(delay * 1000, 2) if delay is not None else None for kind, delay in delays.items()},
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedges_denied": self.hedges_denied,
+            "hedge_rate": round(self.hedges_fired / self.requests, 4) if self.requests else 0.0,
+        }
+
+def create_hedging_policy() -> HedgingPolicy:
+    settings = get_settings()
+    return HedgingPolicy(
+        percentile=settings.hedge_percentile,
+        min_samples=settings.hedge_min_samples,
+        min_delay=settings.hedge_min_delay,
+        budget_ratio=settings.hedge_budget_ratio
+    )
+
+@lru_cache()
+def get_hedging_policy() -> HedgingPolicy:
+    return create_hedging_policy()
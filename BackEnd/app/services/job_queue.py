@@ -0,0 +1,538 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.config import get_settings
+from app.utils.id_generator import generate_id
+
+if TYPE_CHECKING:
+    from app.services.registry import ServiceRegistry
+
+logger = logging.getLogger("job_queue")
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+FINISHED = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+# How often idle workers look for jobs submitted by other processes or left behind by a crashed one
+POLL_INTERVAL = 1.0
+
+# A job is a plain dict:
+#   id, type        - job ID and the name of the handler that runs it
+#   status          - a JobStatus value
+#   payload         - the handler's input (the original request, JSON-encodable)
+#   webhook_url     - POSTed the job's final state once it finishes, if set
+#   total/completed - progress, in units the handler chooses (e.g. generations)
+#   result, error   - the handler's return value, or why it failed
+#   attempts        - times a worker has claimed the job
+#   created_at, started_at, finished_at - UNIX timestamps
+# Partial results are stored separately, one row per result, numbered by `seq`.
+
+JobHandler = Callable[["JobContext"], Awaitable[Dict[str, Any]]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+def job_handler(job_type: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the coroutine that runs jobs of `job_type`"""
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[job_type] = handler
+        return handler
+    return register
+
+_JOB_COLUMNS = ("id, type, status, payload, webhook_url, webhook_status, total, completed, result, error, "
+                "attempts, created_at, started_at, finished_at")
+
+class JobStore:
+    """
+    SQLite job table in WAL mode, shared by every worker process.
+
+    A worker claims a job by atomically moving it to "running" under its owner
+    ID with a lease, which it keeps renewing while the job runs. A job whose
+    lease has expired (its process died) can be claimed again, so unfinished
+    jobs resume after a restart. Queries run in a worker thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach the ones opened in worker threads
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                webhook_url TEXT,
+                webhook_status TEXT,
+                total INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_expires_at REAL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+        """)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Only this thread uses it; check_same_thread=False just lets close() run elsewhere
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        (job_id, job_type, status, payload, webhook_url, webhook_status, total, completed, result, error,
+         attempts, created_at, started_at, finished_at) = row
+        return {
+            "id": job_id,
+            "type": job_type,
+            "status": JobStatus(status),
+            "payload": json.loads(payload),
+            "webhook_url": webhook_url,
+            "webhook_status": webhook_status,
+            "total": total,
+            "completed": completed,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "attempts": attempts,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def _create_sync(self, job_id: str, job_type: str, payload: Dict[str, Any], webhook_url: Optional[str]) -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO jobs (id, type, status, payload, webhook_url, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, job_type, JobStatus.QUEUED.value, json.dumps(payload), webhook_url, time.time())
+        )
+        conn.commit()
+
+    def _get_sync(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _list_sync(self, status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        if status is None:
+            rows = self._connection().execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _claim_sync(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            f"""
+            UPDATE jobs SET status = 'running', owner = ?, lease_expires_at = ?, attempts = attempts + 1,
+                started_at = COALESCE(started_at, ?), total = 0, completed = 0
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_expires_at < ?)
+                ORDER BY created_at LIMIT 1
+            )
+            RETURNING {_JOB_COLUMNS}
+            """,
+            (owner, now + lease_seconds, now, now)
+        ).fetchone()
+        if row is not None:
+            # A resumed job starts over, so drop the partial results of the earlier attempt
+            conn.execute("DELETE FROM job_results WHERE job_id = ?", (row[0],))
+        conn.commit()
+        return self._row_to_job(row) if row else None
+
+    def _renew_sync(self, owner: str, job_ids: List[str], lease_seconds: float) -> List[str]:
+        """Extend the leases of this owner's running jobs; returns those no longer running (cancelled elsewhere)"""
+        conn = self._connection()
+        stopped = []
+        for job_id in job_ids:
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + lease_seconds, job_id, owner)
+            ).rowcount
+            if not updated:
+                stopped.append(job_id)
+        conn.commit()
+        return stopped
+
+    def _add_total_sync(self, job_id: str, amount: int) -> None:
+        conn = self._connection()
+        conn.execute("UPDATE jobs SET total = total + ? WHERE id = ?", (amount, job_id))
+        conn.commit()
+
+    def _add_result_sync(self, job_id: str, kind: str, data: Any) -> int:
+        conn = self._connection()
+        # One statement, so concurrent results of the same job never get the same seq
+        seq = conn.execute(
+            "INSERT INTO job_results (job_id, seq, kind, data) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM job_results WHERE job_id = ? RETURNING seq",
+            (job_id, kind, json.dumps(data, default=str), job_id)
+        ).fetchone()[0]
+        conn.execute("UPDATE jobs SET completed = completed + 1 WHERE id = ?", (job_id,))
+        conn.commit()
+        return seq
+
+    def _results_sync(self, job_id: str, after: int) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            "SELECT seq, kind, data FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+        return [{"seq": seq, "kind": kind, "data": json.loads(data)} for seq, kind, data in rows]
+
+    def _finish_sync(self, job_id: str, owner: str, status: JobStatus,
+                     result: Optional[Dict[str, Any]], error: Optional[str]) -> bool:
+        """Record the outcome of a job this owner is running; False if it was cancelled or taken over meanwhile"""
+        conn = self._connection()
+        updated = conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL, lease_expires_at = NULL "
+            "WHERE id = ? AND owner = ? AND status = 'running'",
+            (status.value, json.dumps(result, default=str) if result is not None else None, error,
+             time.time(), job_id, owner)
+        ).rowcount
+        conn.commit()
+        return bool(updated)
+
+    def _cancel_sync(self, job_id: str) -> bool:
+        conn = self._connection()
+        updated = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ?, owner = NULL, lease_expires_at = NULL "
+            "WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id)
+        ).rowcount
+        conn.commit()
+        return bool(updated)
+
+    def _release_sync(self, owner: str) -> int:
+        """Put this owner's running jobs back in the queue (on shutdown) so they resume without waiting for the lease"""
+        conn = self._connection()
+        released = conn.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_expires_at = NULL WHERE owner = ? AND status = 'running'",
+            (owner,)
+        ).rowcount
+        conn.commit()
+        return released
+
+    def _set_webhook_status_sync(self, job_id: str, webhook_status: str) -> None:
+        conn = self._connection()
+        conn.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+        conn.commit()
+
+    async def create(self, job_id: str, job_type: str, payload: Dict[str, Any], webhook_url: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._create_sync, job_id, job_type, payload, webhook_url)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get_sync, job_id)
+
+    async def list(self, status: Optional[JobStatus] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list_sync, status.value if status else None, limit)
+
+    async def claim(self, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._claim_sync, owner, lease_seconds)
+
+    async def renew(self, owner: str, job_ids: List[str], lease_seconds: float) -> List[str]:
+        return await asyncio.to_thread(self._renew_sync, owner, job_ids, lease_seconds)
+
+    async def add_total(self, job_id: str, amount: int) -> None:
+        await asyncio.to_thread(self._add_total_sync, job_id, amount)
+
+    async def add_result(self, job_id: str, kind: str, data: Any) -> int:
+        return await asyncio.to_thread(self._add_result_sync, job_id, kind, data)
+
+    async def results(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._results_sync, job_id, after)
+
+    async def finish(self, job_id: str, owner: str, status: JobStatus,
+                     result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self._finish_sync, job_id, owner, status, result, error)
+
+    async def cancel(self, job_id: str) -> bool:
+        return await asyncio.to_thread(self._cancel_sync, job_id)
+
+    async def release(self, owner: str) -> int:
+        return await asyncio.to_thread(self._release_sync, owner)
+
+    async def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        await asyncio.to_thread(self._set_webhook_status_sync, job_id, webhook_status)
+
+    async def close(self) -> None:
+        """Close every thread's connection; only once the queue using the store has stopped"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+class JobContext:
+    """What a handler sees of its job: the payload, the shared services, and progress reporting"""
+
+    def __init__(self, job: Dict[str, Any], queue: "JobQueue"):
+        self.id = job["id"]
+        self.type = job["type"]
+        self.payload = job["payload"]
+        self.services = queue.services
+        self._store = queue.store
+
+    async def add_total(self, amount: int) -> None:
+        """Announce `amount` more units of work (may be negative when planned work is dropped)"""
+        await self._store.add_total(self.id, amount)
+
+    async def add_result(self, kind: str, data: Any) -> None:
+        """Publish a partial result, readable while the job runs; counts as one completed unit"""
+        await self._store.add_result(self.id, kind, data)
+
+class JobQueue:
+    """
+    In-process asyncio worker pool over the persistent job table.
+
+    Workers claim queued jobs from the store, so jobs submitted to any process
+    sharing the table are picked up, and jobs left running by a process that
+    died are claimed again once their lease expires. A job is attempted at most
+    max_attempts times. Handlers restart from the beginning when a job resumes;
+    the generation cache makes replaying already generated steps cheap.
+    Webhooks are delivered in background tasks, so workers move on to the next
+    job at once.
+    """
+
+    def __init__(self, store: JobStore, services: "ServiceRegistry", workers: int = 2,
+                 lease_seconds: float = 30.0, max_attempts: int = 3,
+                 webhook_timeout: float = 10.0, webhook_attempts: int = 3):
+        self.store = store
+        self.services = services
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.webhook_timeout = webhook_timeout
+        self.webhook_attempts = webhook_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{random.getrandbits(32):08x}"
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+        # Webhook deliveries in progress; they run beside the workers so a slow endpoint never holds a claim loop
+        self._deliveries: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """Start the workers; safe to call more than once"""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info("Job queue started with %d workers (owner %s)", self.workers, self.owner)
+
+    async def stop(self) -> None:
+        """Stop the workers, hand running jobs back to the queue to resume later, and drain webhook deliveries"""
+        if not self._tasks:
+            return
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._deliveries:
+            # Deliveries still retrying after one more timeout are cut short and recorded as failed
+            _, pending = await asyncio.wait(set(self._deliveries), timeout=self.webhook_timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        released = await self.store.release(self.owner)
+        if released:
+            logger.info("Returned %d unfinished jobs to the queue", released)
+
+    async def submit(self, job_type: str, payload: Dict[str, Any], webhook_url: Optional[str] = None) -> Dict[str, Any]:
+        self.start()
+        job_id = generate_id("job")
+        await self.store.create(job_id, job_type, payload, webhook_url)
+        self._wakeup.set()
+        logger.info("Queued %s job %s", job_type, job_id, extra={"job_id": job_id})
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it had already finished"""
+        if not await self.store.cancel(job_id):
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+        # A job running in another process is stopped by that process's next lease renewal
+        logger.info("Cancelled job %s", job_id, extra={"job_id": job_id})
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            # Cleared before looking, so a job submitted while this worker looks still wakes it
+            self._wakeup.clear()
+            try:
+                job = await self.store.claim(self.owner, self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.error("Job worker %d failed to claim a job: %s", index, e)
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # A failure around a job (store errors, a bad webhook) must not take the worker down with it
+                logger.error("Job worker %d failed while running job %s: %s", index, job["id"], e,
+                             extra={"job_id": job["id"]})
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not self._running:
+                continue
+            try:
+                stopped = await self.store.renew(self.owner, list(self._running), self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.error("Failed to renew job leases: %s", e)
+                continue
+            for job_id in stopped:
+                task = self._running.get(job_id)
+                if task is not None:
+                    self._cancelled.add(job_id)
+                    task.cancel()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        handler = _handlers.get(job["type"])
+        if handler is None:
+            await self._finish(job, JobStatus.FAILED, error=f"No handler for job type {job['type']}")
+            return
+        if job["attempts"] > self.max_attempts:
+            await self._finish(job, JobStatus.FAILED, error=f"Gave up after {self.max_attempts} attempts")
+            return
+
+        logger.info("Running %s job %s (attempt %d)", job["type"], job_id, job["attempts"], extra={"job_id": job_id})
+        task = asyncio.ensure_future(handler(JobContext(job, self)))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                self._deliver(job_id)
+            if job_id not in self._cancelled or self._stopping:
+                # The queue is stopping: leave the job for release() to requeue. When stop() races a
+                # cancellation, this error also carries the worker's own cancellation, so it must propagate
+                raise
+            return
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+            logger.error("Job %s failed: %s", job_id, detail, extra={"job_id": job_id})
+            await self._finish(job, JobStatus.FAILED, error=str(detail))
+            return
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+        await self._finish(job, JobStatus.SUCCEEDED, result=result)
+
+    async def _finish(self, job: Dict[str, Any], status: JobStatus,
+                      result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        if await self.store.finish(job["id"], self.owner, status, result, error):
+            logger.info("Job %s %s", job["id"], status.value, extra={"job_id": job["id"]})
+            self._deliver(job["id"])
+
+    def _deliver(self, job_id: str) -> None:
+        """Send a finished job to its webhook in the background; stop() waits for deliveries in progress"""
+        task = asyncio.create_task(self._notify(job_id))
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _notify(self, job_id: str) -> None:
+        """Deliver a finished job to its webhook, retrying with backoff; failures are recorded, never raised"""
+        try:
+            job = await self.store.get(job_id)
+        except sqlite3.Error as e:
+            logger.error("Failed to load job %s for its webhook: %s", job_id, e, extra={"job_id": job_id})
+            return
+        if job is None or not job["webhook_url"]:
+            return
+        import httpx
+        from app.models.v2.jobs import JobInfo
+
+        body = JobInfo.from_job(job).model_dump(mode="json")
+        delivered = False
+        try:
+            async with httpx.AsyncClient(timeout=self.webhook_timeout) as client:
+                for attempt in range(self.webhook_attempts):
+                    try:
+                        response = await client.post(job["webhook_url"], json=body)
+                        if response.status_code < 400:
+                            delivered = True
+                            break
+                        logger.warning("Webhook for job %s returned %d", job_id, response.status_code,
+                                       extra={"job_id": job_id})
+                    except Exception as e:
+                        # Transport errors, but also URLs httpx rejects only when sending (stored before validation)
+                        logger.warning("Webhook for job %s failed: %s", job_id, e, extra={"job_id": job_id})
+                    if attempt + 1 < self.webhook_attempts:
+                        await asyncio.sleep(2 ** attempt + random.random())
+        finally:
+            # Also when stop() cuts the delivery short, so the outcome is never left unrecorded
+            try:
+                await asyncio.shield(self.store.set_webhook_status(job_id, "delivered" if delivered else "failed"))
+            except (asyncio.CancelledError, sqlite3.Error) as e:
+                logger.error("Failed to record the webhook status of job %s: %s", job_id, e, extra={"job_id": job_id})
+
+def create_job_queue(services: "ServiceRegistry") -> JobQueue:
+    settings = get_settings()
+    return JobQueue(
+        JobStore(settings.job_store_path),
+        services,
+        workers=settings.job_workers,
+        lease_seconds=settings.job_lease_seconds,
+        max_attempts=settings.job_max_attempts,
+        webhook_timeout=settings.job_webhook_timeout,
+        webhook_attempts=settings.job_webhook_attempts,
+    )
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional
+from fastapi import HTTPException, status
+from app.config import get_settings
+
+logger = logging.getLogger("llm_resilience")
+
+@lru_cache()
+def _error_classes():
+    """
+    (transient, permanent, any API error) exception classes, resolved on first use.
+
+    The Google client libraries are slow to import, so they are only loaded
+    once a model call has actually failed.
+    """
+    from google.api_core import exceptions as google_exceptions
+    from google.generativeai.types import BlockedPromptException, StopCandidateException
+
+    # Upstream errors worth retrying: overload, rate limits, timeouts and dropped connections
+    transient = (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.BadGateway,
+        google_exceptions.GatewayTimeout,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.Aborted,
+        google_exceptions.RetryError,
+        asyncio.TimeoutError,
+        ConnectionError,
+    )
+
+    # Errors that will fail the same way every time: bad requests, auth, safety blocks
+    permanent = (
+        google_exceptions.InvalidArgument,
+        google_exceptions.FailedPrecondition,
+        google_exceptions.PermissionDenied,
+        google_exceptions.Unauthenticated,
+        google_exceptions.NotFound,
+        BlockedPromptException,
+        StopCandidateException,
+        ValueError,  # response.text raises ValueError when the candidate was blocked
+    )
+    return transient, permanent, google_exceptions.GoogleAPICallError
+
+def is_transient_error(error: BaseException) -> bool:
+    """Classify a model call failure; unknown errors are treated as transient"""
+    transient, permanent, api_error = _error_classes()
+    if isinstance(error, transient):
+        return True
+    if isinstance(error, permanent):
+        return False
+    if isinstance(error, api_error):
+        # Any other 5xx is the server's fault, any other 4xx is ours
+        return error.code is None or error.code >= 500
+    return True
+
+class LLMCallError(HTTPException):
+    """A failed model call, tagged with whether retrying could help"""
+
+    def __init__(self, error: BaseException, transient: bool):
+        super().__init__(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating content: {str(error)}"
+        )
+        self.transient = transient
+
+class CircuitOpenError(HTTPException):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """
+    Fails model calls fast while Gemini is unhealthy.
+
+    The circuit opens after `failure_threshold` consecutive transient failures.
+    While open every call is rejected immediately with 503. After
+    `reset_timeout` seconds up to `half_open_max_calls` probe calls are let
+    through: a success closes the circuit again, a failure reopens it.
+    Permanent errors (bad requests, safety blocks) say nothing about upstream
+    health and are not counted.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1,
+                 history_size: int = 20):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._transition_counts = {state: 0 for state in CircuitState}
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError"""
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self._reject()
+            self._transition(CircuitState.HALF_OPEN, "reset timeout elapsed")
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_max_calls:
+                self._reject()
+            self._probes_in_flight += 1
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._transition(CircuitState.CLOSED, "probe succeeded")
+
+    def record_failure(self, transient: bool) -> None:
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+        if not transient:
+            return
+
+        self.consecutive_failures += 1
+        if self.state == CircuitState.HALF_OPEN:
+            self._open("probe failed")
+        elif self.state == CircuitState.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(f"{self.consecutive_failures} consecutive failures")
+
+    def release(self) -> None:
+        """Give back a half-open probe slot for a call that neither succeeded nor failed (e.g. cancelled)"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self, reason: str) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(CircuitState.OPEN, reason)
+
+    def _transition(self, state: CircuitState, reason: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("LLM circuit breaker %s -> %s: %s", self.state.value, state.value, reason)
+        self._history.append({"from": self.state.value, "to": state.value, "reason": reason, "at": time.time()})
+        self._transition_counts[state] += 1
+        self.state = state
+        self._probes_in_flight = 0
+
+    def _reject(self) -> None:
+        self.rejected += 1
+        retry_after = max(1, math.ceil(self.reset_timeout - (time.monotonic() - self._opened_at)))
+        raise CircuitOpenError(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The AI model is temporarily unavailable. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "rejected": self.rejected,
+            "transitions": {state.value: count for state, count in self._transition_counts.items()},
+            "recent_transitions": list(self._history),
+        }
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of recent traffic.
+
+    Over a sliding `window` of seconds, retries may not exceed `ratio` of the
+    first attempts, plus a small floor of `min_retries_per_second` so a quiet
+    process can still retry. During an outage nearly every call fails, so the
+    budget runs dry and extra load on Gemini stays bounded at roughly
+    (1 + ratio) times normal instead of multiplying by the attempt count.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 1.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self.retries_allowed = 0
+        self.retries_denied = 0
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def _available(self, now: float) -> float:
+        self._expire(now)
+        allowed = len(self._requests) * self.ratio + self.min_retries_per_second * self.window
+        return allowed - len(self._retries)
+
+    def record_request(self) -> None:
+        """Record a first attempt; each one earns `ratio` of a retry"""
+        self._requests.append(time.monotonic())
+
+    def try_acquire(self) -> bool:
+        """Spend one retry if the budget allows it"""
+        now = time.monotonic()
+        if self._available(now) >= 1:
+            self._retries.append(now)
+            self.retries_allowed += 1
+            return True
+        self.retries_denied += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        available = self._available(time.monotonic())
+        return {
+            "ratio": self.ratio,
+            "window_seconds": self.window,
+            "requests_in_window": len(self._requests),
+            "retries_in_window": len(self._retries),
+            "available": max(0, math.floor(available)),
+            "retries_allowed": self.retries_allowed,
+            "retries_denied": self.retries_denied,
+        }
+
+class LLMResilience:
+    """Error classification, retry budget and circuit breaker shared by every model call"""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None, budget: Optional[RetryBudget] = None):
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.errors = {"transient": 0, "permanent": 0}
+
+    def classify(self, error: BaseException) -> LLMCallError:
+        """Record a failed attempt and wrap it in an LLMCallError"""
+        transient = is_transient_error(error)
+        self.errors["transient" if transient else "permanent"] += 1
+        self.breaker.record_failure(transient)
+        return LLMCallError(error, transient)
+
+    def should_retry(self, error: BaseException) -> bool:
+        """Only transient failures are retried, and only while the retry budget lasts"""
+        if not isinstance(error, LLMCallError) or not error.transient:
+            return False
+        if not self.budget.try_acquire():
+            logger.warning("Retry budget exhausted; not retrying failed generation")
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit_breaker": self.breaker.stats(),
+            "retry_budget": self.budget.stats(),
+            "errors": dict(self.errors),
+        }
+
+def create_llm_resilience() -> LLMResilience:
+    settings = get_settings()
+    return LLMResilience(
+        breaker=CircuitBreaker(
+            failure_threshold=settings.llm_breaker_failure_threshold,
+            reset_timeout=settings.llm_breaker_reset_timeout
+        ),
+        budget=RetryBudget(
+            ratio=settings.llm_retry_budget_ratio,
+            min_retries_per_second=settings.llm_retry_budget_min_per_second
+        )
+    )
+
+@lru_cache()
+def get_llm_resilience() -> LLMResilience:
+    return create_llm_resilience()
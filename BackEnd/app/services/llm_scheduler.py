@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional
+from fastapi import HTTPException, status
+from app.config import get_settings
+
+logger = logging.getLogger("llm_scheduler")
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"  # A user is waiting on the response
+    BATCH = "batch"              # Background or bulk generation
+
+# Lanes are served strictly in this order
+LANE_ORDER = [Priority.INTERACTIVE, Priority.BATCH]
+
+class SchedulerRejected(HTTPException):
+    """Raised when a generation is shed instead of queued; never retried"""
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate_per_minute`; a rate of 0 disables the limit"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if available now)"""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        # May go negative when actual usage exceeds the estimate; the debt is repaid by refill
+        self.level -= amount
+
+class Permit:
+    """Handle for an admitted generation, used to report actual token usage"""
+
+    def __init__(self, scheduler: "LLMScheduler", estimated_tokens: int):
+        self._scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+
+    def record_usage(self, total_tokens: Optional[int]) -> None:
+        """Charge the difference between the estimated and actual token count"""
+        if total_tokens is None:
+            return
+        self._scheduler.tokens.take(total_tokens - self.estimated_tokens)
+        self.estimated_tokens = total_tokens
+
+class LLMScheduler:
+    """
+    Central admission control for every model call.
+
+    Calls are admitted when a concurrency slot is free and both the
+    requests-per-minute and tokens-per-minute buckets allow it. Waiting calls
+    sit in bounded per-priority lanes; interactive calls are always admitted
+    ahead of batch calls. When a lane is full, or a call has waited longer than
+    `max_queue_wait`, the call is rejected immediately with a Retry-After hint
+    instead of piling up more coroutines.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_queue: Optional[Dict[Priority, int]] = None, max_queue_wait: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue or {Priority.INTERACTIVE: 100, Priority.BATCH: 500}
+        self.max_queue_wait = max_queue_wait
+
+        self.in_flight = 0
+        self._lanes: Dict[Priority, Deque] = {lane: deque() for lane in LANE_ORDER}
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self._avg_service_time = 1.0
+
+        self._stats = {
+            lane: {"admitted": 0, "rejected": 0, "timed_out": 0, "total_wait": 0.0, "max_wait": 0.0, "max_depth": 0}
+            for lane in LANE_ORDER
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE, estimated_tokens: int = 0):
+        """Wait for admission, then hold a concurrency slot for the duration of the call"""
+        if not self.tokens.unlimited:
+            # A call larger than the whole bucket would otherwise never be admitted
+            estimated_tokens = min(estimated_tokens, int(self.tokens.capacity))
+        await self._acquire(priority, estimated_tokens)
+        started = time.monotonic()
+        try:
+            yield Permit(self, estimated_tokens)
+        finally:
+            # Exponentially weighted service time, used for Retry-After estimates
+            self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * (time.monotonic() - started)
+            self.in_flight -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: Priority, estimated_tokens: int) -> None:
+        lane = self._lanes[priority]
+        stats = self._stats[priority]
+
+        # Fast path: nothing queued ahead of us and capacity is available now
+        if not self._queued_ahead(priority) and self._delay_for(estimated_tokens) == 0:
+            self._admit(estimated_tokens)
+            stats["admitted"] += 1
+            return
+
+        if len(lane) >= self.max_queue[priority]:
+            stats["rejected"] += 1
+            raise SchedulerRejected(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Generation queue for {priority.value} requests is full. Please retry later.",
+                headers={"Retry-After": str(self._retry_after(priority))}
+            )
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, estimated_tokens)
+        lane.append(entry)
+        stats["max_depth"] = max(stats["max_depth"], len(lane))
+        enqueued = time.monotonic()
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Admitted just as the timeout fired; keep the slot
+                pass
+            else:
+                waiter.cancel()
+                self._remove(lane, entry)
+                stats["timed_out"] += 1
+                raise SchedulerRejected(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Generation capacity is exhausted. Please retry later.",
+                    headers={"Retry-After": str(self._retry_after(priority))}
+                )
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were admitted but the caller went away: hand the slot back
+                self.in_flight -= 1
+                self._dispatch()
+            else:
+                waiter.cancel()
+                self._remove(lane, entry)
+            raise
+
+        waited = time.monotonic() - enqueued
+        stats["admitted"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def _queued_ahead(self, priority: Priority) -> bool:
+        for lane in LANE_ORDER:
+            if self._lanes[lane]:
+                return True
+            if lane == priority:
+                return False
+        return False
+
+    def _delay_for(self, estimated_tokens: int) -> float:
+        """0 if a call can start now, otherwise seconds until rate limits allow it (inf if no slot)"""
+        if self.in_flight >= self.max_concurrency:
+            return math.inf
+        return max(self.requests.time_until(1), self.tokens.time_until(estimated_tokens))
+
+    def _admit(self, estimated_tokens: int) -> None:
+        self.in_flight += 1
+        self.requests.take(1)
+        self.tokens.take(estimated_tokens)
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in priority order while capacity allows"""
+        for priority in LANE_ORDER:
+            lane = self._lanes[priority]
+            while lane:
+                waiter, estimated_tokens = lane[0]
+                if waiter.done():
+                    lane.popleft()
+                    continue
+
+                delay = self._delay_for(estimated_tokens)
+                if delay > 0:
+                    # Rate limited: wake up once the buckets have refilled
+                    if delay != math.inf:
+                        self._schedule_wake(delay)
+                    return
+
+                lane.popleft()
+                self._admit(estimated_tokens)
+                waiter.set_result(None)
+
+    def _schedule_wake(self, delay: float) -> None:
+        if self._wake_handle is not None and not self._wake_handle.cancelled():
+            return
+
+        def wake():
+            self._wake_handle = None
+            self._dispatch()
+
+        self._wake_handle = asyncio.get_running_loop().call_later(delay, wake)
+
+    @staticmethod
+    def _remove(lane: Deque, entry) -> None:
+        try:
+            lane.remove(entry)
+        except ValueError:
+            pass
+
+    def _retry_after(self, priority: Priority) -> int:
+        """Rough estimate of seconds until a new call in this lane could start"""
+        ahead = sum(len(self._lanes[lane]) for lane in LANE_ORDER[:LANE_ORDER.index(priority) + 1])
+        drain_time = ahead * self._avg_service_time / max(self.max_concurrency, 1)
+        rate_wait = max(self.requests.time_until(ahead + 1), 0.0)
+        return max(1, math.ceil(max(drain_time, rate_wait)))
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for priority in LANE_ORDER:
+            stats = self._stats[priority]
+            waited = stats["admitted"] or 1
+            lanes[priority.value] = {
+                "queue_depth": len(self._lanes[priority]),
+                "max_queue_depth": stats["max_depth"],
+                "queue_limit": self.max_queue[priority],
+                "admitted": stats["admitted"],
+                "rejected": stats["rejected"],
+                "timed_out": stats["timed_out"],
+                "avg_wait_ms": round(stats["total_wait"] / waited * 1000, 2),
+                "max_wait_ms": round(stats["max_wait"] * 1000, 2),
+            }
+
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests_available": None if self.requests.unlimited else round(self.requests.level, 2),
+            "tokens_available": None if self.tokens.unlimited else round(self.tokens.level),
+            "lanes": lanes,
+        }
+
+def create_llm_scheduler() -> LLMScheduler:
+    settings = get_settings()
+    return LLMScheduler(
+        max_concurrency=settings.max_concurrent_generations,
+        requests_per_minute=settings.llm_requests_per_minute,
+        tokens_per_minute=settings.llm_tokens_per_minute,
+        max_queue={
+            Priority.INTERACTIVE: settings.llm_interactive_queue_size,
+            Priority.BATCH: settings.llm_batch_queue_size,
+        },
+        max_queue_wait=settings.llm_max_queue_wait
+    )
+
+@lru_cache()
+def get_llm_scheduler() -> LLMScheduler:
+    return create_llm_scheduler()
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from app.config import get_settings
+
+logger = logging.getLogger("mcp_pool")
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'mcp_servers', 'mcp.json')
+
+class MCPServerHandle:
+    """A single long-lived MCP server connection and the tools it exposes"""
+
+    def __init__(self, name: str, config: Dict[str, Any], max_concurrency: int):
+        self.name = name
+        self.config = config
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.session = None
+        self.tools: List[BaseTool] = []
+        self.healthy = False
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.in_flight = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "tools": [tool.name for tool in self.tools],
+            "restarts": self.restarts,
+            "in_flight": self.in_flight,
+            "last_error": self.last_error,
+        }
+
+class MCPSessionPool:
+    """
+    Pool of persistent MCP server sessions shared across requests.
+
+    Every server in mcp.json is started once and kept alive. A background
+    health check pings each session and restarts servers that crashed or stopped
+    responding. Tool calls are limited per server so one slow server can't be
+    flooded. `generation` changes whenever the set of live tools changes, so
+    callers know when to rebuild anything compiled from the tool list.
+    """
+
+    def __init__(self, config: Dict[str, Dict[str, Any]], max_concurrency_per_server: int = 4,
+                 health_check_interval: float = 30.0, startup_timeout: float = 60.0,
+                 tool_timeout: float = 120.0, ping_timeout: float = 10.0):
+        self.servers = {
+            name: MCPServerHandle(name, server_config, max_concurrency_per_server)
+            for name, server_config in config.items()
+        }
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self.tool_timeout = tool_timeout
+        self.ping_timeout = ping_timeout
+        self.generation = 0
+        self._started = False
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._check_requested: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_config_file(cls, path: str = DEFAULT_CONFIG_PATH, **kwargs) -> "MCPSessionPool":
+        """Build a pool from an mcp.json file; a missing file yields a pool with no servers"""
+        try:
+            with open(path, 'r') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"MCP config not found at {path}; running without MCP tools")
+            config = {}
+        return cls(config, **kwargs)
+
+    async def start(self) -> None:
+        """Start every server and the health-check loop (idempotent)"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+
+        async with self._start_lock:
+            if self._started:
+                return
+
+            await asyncio.gather(*[self._start_server(handle) for handle in self.servers.values()])
+
+            self._check_requested = asyncio.Event()
+            self._health_task = asyncio.create_task(self._health_loop())
+            self._started = True
+
+    async def stop(self) -> None:
+        """Stop the health-check loop and shut every server down"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+        await asyncio.gather(*[self._stop_server(handle) for handle in self.servers.values()])
+        self._started = False
+
+    def get_tools(self) -> List[BaseTool]:
+        """All tools from currently healthy servers"""
+        tools: List[BaseTool] = []
+        for handle in self.servers.values():
+            if handle.healthy:
+                tools.extend(handle.tools)
+        return tools
+
+    def request_health_check(self) -> None:
+        """Wake the health-check loop early, e.g. after a failed tool call"""
+        if self._check_requested is not None:
+            self._check_requested.set()
+
+    async def check_health(self) -> None:
+        """Ping every server and restart the ones that are down"""
+        await asyncio.gather(*[self._check_server(handle) for handle in self.servers.values()])
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "started": self._started,
+            "generation": self.generation,
+            "servers": {name: handle.status() for name, handle in self.servers.items()},
+        }
+
+    async def _health_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._check_requested.wait(), timeout=self.health_check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._check_requested.clear()
+
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"MCP health check failed: {str(e)}")
+
+    async def _check_server(self, handle: MCPServerHandle) -> None:
+        if handle.healthy and handle.session is not None and not handle._task.done():
+            try:
+                await asyncio.wait_for(handle.session.send_ping(), timeout=self.ping_timeout)
+                return
+            except Exception as e:
+                handle.last_error = str(e) or type(e).__name__
+                logger.warning(f"MCP server {handle.name} failed health check: {handle.last_error}")
+
+        # Server is down (or never came up): restart it
+        await self._stop_server(handle)
+        handle.restarts += 1
+        await self._start_server(handle)
+
+    async def _start_server(self, handle: MCPServerHandle) -> None:
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        handle._stop = asyncio.Event()
+        # The client must be entered and exited from the same task, so each
+        # server lives in its own task for the lifetime of the connection
+        handle._task = asyncio.create_task(self._run_server(handle, ready))
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout=self.startup_timeout)
+            handle.healthy = True
+            handle.last_error = None
+            self.generation += 1
+            logger.info(f"MCP server {handle.name} started with {len(handle.tools)} tools")
+        except Exception as e:
+            handle.healthy = False
+            handle.last_error = str(e) or type(e).__name__
+            logger.error(f"Failed to start MCP server {handle.name}: {handle.last_error}")
+            await self._stop_server(handle)
+
+    async def _stop_server(self, handle: MCPServerHandle) -> None:
+        was_healthy = handle.healthy
+        handle.healthy = False
+
+        if handle._task is not None and not handle._task.done():
+            handle._stop.set()
+            try:
+                await asyncio.wait_for(handle._task, timeout=self.ping_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            except Exception as e:
+                logger.debug(f"MCP server {handle.name} raised during shutdown: {str(e)}")
+        handle._task = None
+        handle.session = None
+        handle.tools = []
+
+        if was_healthy:
+            self.generation += 1
+
+    async def _run_server(self, handle: MCPServerHandle, ready: asyncio.Future) -> None:
+        try:
+            async with MultiServerMCPClient({handle.name: handle.config}) as client:
+                handle.session = client.sessions[handle.name]
+                handle.tools = [self._limit_tool(tool, handle) for tool in client.get_tools()]
+                ready.set_result(True)
+                await handle._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"MCP server {handle.name} connection closed: {str(e)}")
+                handle.last_error = str(e)
+                handle.healthy = False
+                self.request_health_check()
+
+    def _limit_tool(self, tool: BaseTool, handle: MCPServerHandle) -> BaseTool:
+        """Wrap a tool so calls respect the server's concurrency limit"""
+        call_tool = tool.coroutine
+
+        async def limited_call_tool(**arguments):
+            async with handle.slots:
+                handle.in_flight += 1
+                try:
+                    # A crashed stdio server never answers, so never wait forever
+                    return await asyncio.wait_for(call_tool(**arguments), timeout=self.tool_timeout)
+                except Exception:
+                    # The server may have crashed; check it now rather than at the next interval
+                    self.request_health_check()
+                    raise
+                finally:
+                    handle.in_flight -= 1
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=limited_call_tool,
+            response_format=tool.response_format,
+        )
+
+@lru_cache()
+def get_mcp_pool() -> MCPSessionPool:
+    settings = get_settings()
+    return MCPSessionPool.from_config_file(
+        max_concurrency_per_server=settings.mcp_max_concurrency_per_server,
+        health_check_interval=settings.mcp_health_check_interval,
+        startup_timeout=settings.mcp_startup_timeout,
+        tool_timeout=settings.mcp_tool_timeout
+    )
@@ -1,36 +1,49 @@
 import os
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from typing import Optional
 from langgraph.prebuilt import create_react_agent
 from langchain_google_genai import ChatGoogleGenerativeAI
+from app.services.mcp_pool import MCPSessionPool, get_mcp_pool
 import json
 
 class LangChainAgent:
-    def __init__(self):
+    def __init__(self, pool: Optional[MCPSessionPool] = None):
         """Initialize the LangChain agent."""
         self.model = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash-exp", 
             google_api_key=os.getenv("GOOGLE_API_KEY")
         )
+        
+        # MCP sessions are long-lived and shared; the agent is compiled once per tool set
+        self.pool = pool or get_mcp_pool()
+        self._agent = None
+        self._agent_generation = None
+    
+    async def get_agent(self):
+        """Return the compiled agent, rebuilding it only when the available tools change."""
+        await self.pool.start()
+        
+        if self._agent is None or self._agent_generation != self.pool.generation:
+            self._agent_generation = self.pool.generation
+            self._agent = create_react_agent(self.model, self.pool.get_tools())
+        
+        return self._agent
     
     async def get_response(self, message):
         """Get a response from the LangChain agent."""
-        # Connect to the MCP clients
-        async with MultiServerMCPClient(self.get_mcp_server_config()) as client:
-            # Create the agent with available tools
-            agent = create_react_agent(self.model, client.get_tools())
-            
-            # Create formatted input for the agent
-            formatted_input = {"messages": [{"type": "human", "content": message}]}
-            
-            # Invoke the agent with the message
-            response = await agent.ainvoke(formatted_input)
-            
-            response = response["messages"][-1].content
-            
-            # print("LangChain Response:", response)
-            
-            # Return the full response
-            return response
+        agent = await self.get_agent()
+        
+        # Create formatted input for the agent
+        formatted_input = {"messages": [{"type": "human", "content": message}]}
+        
+        # Invoke the agent with the message
+        response = await agent.ainvoke(formatted_input)
+        
+        response = response["messages"][-1].content
+        
+        # print("LangChain Response:", response)
+        
+        # Return the full response
+        return response
     
     @staticmethod
     def get_mcp_server_config():
@@ -0,0 +1,241 @@
+import bisect
+import time
+from functools import lru_cache, wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds: cache hits and parsing sit at the low end, long lessons at the top
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """A monotonically increasing Prometheus counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """
+    A Prometheus histogram with optional labels.
+
+    Each observation costs one bisect over the bucket bounds and two additions;
+    cumulative bucket counts are only computed when the metrics are scraped.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labels, label_values, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+def _snapshot(name: str, documentation: str, samples: List[Tuple[Dict[str, str], float]], kind: str = "gauge") -> List[str]:
+    """Render a metric whose samples are read from existing stats at scrape time"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return lines
+
+class Metrics:
+    """
+    Request, stage and token metrics in Prometheus text format.
+
+    Hot-path recording is a dict lookup and a few additions per observation.
+    Counters the services already keep (cache, coalescing, scheduler, retries,
+    parse failures, continuations) are not duplicated: they are read from
+    AIServiceV2 when /api/v2/metrics is scraped.
+    """
+
+    def __init__(self):
+        self.requests_in_flight = 0
+        self.request_latency = Histogram(
+            "tuteai_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+        )
+        self.stage_latency = Histogram(
+            "tuteai_generation_stage_duration_seconds",
+            "Time spent in each generation stage: queue, prompt_build, model_call, parse_validate",
+            ("stage",)
+        )
+        self.tokens = Counter(
+            "tuteai_llm_tokens_total", "Tokens reported in Gemini usage metadata, by kind (prompt, output)", ("kind",)
+        )
+        self.fallbacks = Counter(
+            "tuteai_fallbacks_total", "Default content substituted for fields the model left out or empty", ("kind",)
+        )
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stage_latency.observe(seconds, stage)
+
+    def record_usage(self, response) -> None:
+        """Count prompt and output tokens from a response's usage metadata, if the SDK reported it"""
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        output_tokens = getattr(usage, "candidates_token_count", None)
+        if prompt_tokens:
+            self.tokens.inc("prompt", amount=prompt_tokens)
+        if output_tokens:
+            self.tokens.inc("output", amount=output_tokens)
+
+    def render(self, ai_service: Optional[Any] = None) -> str:
+        lines = _snapshot("tuteai_http_requests_in_flight", "HTTP requests currently being served",
+                          [({}, self.requests_in_flight)])
+        for metric in (self.request_latency, self.stage_latency, self.tokens, self.fallbacks):
+            lines.extend(metric.render())
+        if ai_service is not None:
+            lines.extend(self._service_lines(ai_service))
+        return "\n".join(lines) + "\n"
+
+    def _service_lines(self, ai_service) -> List[str]:
+        """Snapshot the counters AIServiceV2 and its collaborators already keep"""
+        lines = []
+        scheduler = ai_service.scheduler.stats()
+        lines += _snapshot("tuteai_llm_calls_in_flight", "Model calls holding a scheduler slot",
+                           [({}, scheduler["in_flight"])])
+        lines += _snapshot("tuteai_llm_queue_depth", "Model calls waiting for a scheduler slot",
+                           [({"lane": lane}, stats["queue_depth"]) for lane, stats in scheduler["lanes"].items()])
+        lines += _snapshot("tuteai_llm_rejected_total", "Model calls rejected by the scheduler (queue full or timed out)",
+                           [({"lane": lane}, stats["rejected"] + stats["timed_out"])
+                            for lane, stats in scheduler["lanes"].items()], kind="counter")
+
+        resilience = ai_service.resilience.stats()
+        budget = resilience["retry_budget"]
+        lines += _snapshot("tuteai_llm_retries_total", "Retries of failed model calls, by retry budget outcome",
+                           [({"outcome": "allowed"}, budget["retries_allowed"]),
+                            ({"outcome": "denied"}, budget["retries_denied"])], kind="counter")
+        lines += _snapshot("tuteai_llm_errors_total", "Failed model calls by classification",
+                           [({"kind": kind}, count) for kind, count in resilience["errors"].items()], kind="counter")
+        lines += _snapshot("tuteai_circuit_breaker_open", "1 while the circuit breaker is not closed",
+                           [({}, 0 if resilience["circuit_breaker"]["state"] == "closed" else 1)])
+
+        if ai_service.cache is not None:
+            cache = ai_service.cache.stats()
+            lines += _snapshot("tuteai_cache_lookups_total", "Generation cache lookups by result",
+                               [({"result": "memory_hit"}, cache["memory_hits"]),
+                                ({"result": "disk_hit"}, cache["disk_hits"]),
+                                ({"result": "miss"}, cache["misses"])], kind="counter")
+            lines += _snapshot("tuteai_cache_hit_ratio", "Share of generation cache lookups served from cache",
+                               [({}, cache["hit_rate"])])
+        if ai_service.single_flight is not None:
+            coalescing = ai_service.single_flight.stats()
+            lines += _snapshot("tuteai_coalesced_requests_total", "Generations that joined an identical in-flight call",
+                               [({}, coalescing["coalesced"])], kind="counter")
+
+        parse_samples = {"parsed": [], "repaired": [], "failures": [], "regenerations": []}
+        for model_name, modes in ai_service.parse_stats.stats().items():
+            for mode, counters in modes.items():
+                for outcome in parse_samples:
+                    parse_samples[outcome].append(({"model": model_name, "mode": mode}, counters[outcome]))
+        for outcome, samples in parse_samples.items():
+            lines += _snapshot(f"tuteai_parse_{outcome}_total", f"Model outputs by parse outcome: {outcome}",
+                               samples, kind="counter")
+
+        continuations = ai_service.continuation_stats.stats()
+        lines += _snapshot("tuteai_continuations_total", "Replies cut off at the token limit, by outcome",
+                           [({"outcome": outcome}, continuations[outcome])
+                            for outcome in ("truncated", "continuations", "completed", "gave_up")], kind="counter")
+        return lines
+
+def timed_stage(stage: str):
+    """Record a method's duration as a generation stage on `self.metrics`, traced as a span on `self.tracer`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with self.tracer.span(stage):
+                    return func(self, *args, **kwargs)
+            finally:
+                self.metrics.observe_stage(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and in-flight requests.
+
+    Labels use the matched route template (e.g. /api/v2/create-quiz), never the
+    raw path, so label cardinality stays bounded; static files and unmatched
+    paths share the "other" route.
+    """
+
+    def __init__(self, app, metrics: "Metrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.requests_in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.requests_in_flight -= 1
+            route = scope.get("route")
+            metrics.request_latency.observe(
+                time.perf_counter() - started, scope["method"],
+                getattr(route, "path", "other"), str(status_code)
+            )
+
+@lru_cache()
+def get_metrics() -> Metrics:
+    return Metrics()
@@ -0,0 +1,57 @@
+from functools import lru_cache
+from typing import Any, Dict
+
+class ParseStats:
+    """
+    Parse-failure counters for model output, per response model.
+    
+    Counted separately with and without a response schema so the failure rate
+    of schema-constrained generation can be compared with free-form JSON.
+    """
+    
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, Dict[str, int]]] = {}
+    
+    def _bucket(self, model_name: str, schema_enforced: bool) -> Dict[str, int]:
+        mode = "schema" if schema_enforced else "free_form"
+        per_model = self._counters.setdefault(model_name, {})
+        return per_model.setdefault(
+            mode, {"parsed": 0, "repaired": 0, "failures": 0, "regenerations": 0, "cpu_seconds": 0.0}
+        )
+    
+    def record_parse(self, model_name: str, schema_enforced: bool, ok: bool, repaired: bool = False,
+                     cpu_seconds: float = 0.0) -> None:
+        """
+        Count one parse attempt; `repaired` marks output that only parsed after
+        local JSON repair, `cpu_seconds` is the CPU time spent parsing and validating it
+        """
+        bucket = self._bucket(model_name, schema_enforced)
+        bucket["parsed" if ok else "failures"] += 1
+        bucket["cpu_seconds"] += cpu_seconds
+        if repaired:
+            bucket["repaired"] += 1
+    
+    def record_regeneration(self, model_name: str, schema_enforced: bool) -> None:
+        self._bucket(model_name, schema_enforced)["regenerations"] += 1
+    
+    def total_cpu_seconds(self) -> float:
+        """CPU time spent parsing and validating model output, across all models"""
+        return sum(counters["cpu_seconds"] for modes in self._counters.values() for counters in modes.values())
+    
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for model_name, modes in self._counters.items():
+            result[model_name] = {}
+            for mode, counters in modes.items():
+                attempts = counters["parsed"] + counters["failures"]
+                result[model_name][mode] = {
+                    **{key: value for key, value in counters.items() if key != "cpu_seconds"},
+                    "avg_parse_cpu_ms": round(counters["cpu_seconds"] / attempts * 1000, 3) if attempts else 0.0,
+                    "failure_rate": round(counters["failures"] / attempts, 4) if attempts else 0.0,
+                    "repair_rate": round(counters["repaired"] / attempts, 4) if attempts else 0.0,
+                }
+        return result
+
+@lru_cache()
+def get_parse_stats() -> ParseStats:
+    return ParseStats()
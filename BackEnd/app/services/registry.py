@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Optional
+from app.config import get_settings
+from app.services.artifact_store import ArtifactStore, get_artifact_store
+from app.services.context_cache import ContextCache, create_context_cache
+from app.services.continuation import ContinuationStats
+from app.services.course_index import CourseSimilarityIndex, create_course_index
+from app.services.generation_cache import GenerationCache, create_generation_cache
+from app.services.hedging import HedgingPolicy, create_hedging_policy
+from app.services.llm_resilience import LLMResilience, create_llm_resilience
+from app.services.llm_scheduler import LLMScheduler, create_llm_scheduler
+from app.services.metrics import Metrics
+from app.services.parse_stats import ParseStats
+from app.services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from app.services.ai_service import AIService
+    from app.services.ai_service_v2 import AIServiceV2
+    from app.services.job_queue import JobQueue
+
+logger = logging.getLogger("service_registry")
+
+class ServiceRegistry:
+    """
+    Application-scoped services shared by every request.
+
+    Created by create_app and handed to endpoints through the dependencies in
+    app.api.dependencies. The registry builds its own generation cache,
+    scheduler, resilience (retry budget and circuit breaker), hedging policy,
+    metrics, parse and continuation counters, single-flight group, context
+    cache and course index, and hands them to the v2 service, so every router
+    and background job talks to the same instances while two registries (e.g.
+    a stubbed one in a test) share no state. A component switched off in
+    settings is None.
+
+    Services are built on first use, so the app starts without importing the
+    Gemini, LangChain or MCP client libraries and without a GOOGLE_API_KEY.
+
+    Tests and load tests build one around a stub model with
+    ServiceRegistry.create(model=...) and pass it to create_app. The v1 agent
+    and the MCP pool need a real Gemini key and MCP servers, so they are left
+    out of a stubbed registry.
+    """
+
+    def __init__(self, model=None, artifact_store: Optional[ArtifactStore] = None,
+                 ai_service_v2: Optional["AIServiceV2"] = None, v1_enabled: bool = True):
+        settings = get_settings()
+        self._model = model
+        self._artifact_store = artifact_store
+        self._ai_service_v2 = ai_service_v2
+        # Cheap to build, so built up front. A pre-built v2 service keeps its own metrics,
+        # which the app's MetricsMiddleware must feed as well.
+        self.metrics: Metrics = ai_service_v2.metrics if ai_service_v2 is not None else Metrics()
+        self.scheduler: LLMScheduler = create_llm_scheduler()
+        self.resilience: LLMResilience = create_llm_resilience()
+        self.hedging: Optional[HedgingPolicy] = create_hedging_policy() if settings.hedging_enabled else None
+        self.parse_stats = ParseStats()
+        self.continuation_stats = ContinuationStats()
+        self.generation_cache: Optional[GenerationCache] = create_generation_cache() if settings.cache_enabled else None
+        self.single_flight: Optional[SingleFlight] = SingleFlight() if settings.coalescing_enabled else None
+        self.context_cache: Optional[ContextCache] = (
+            create_context_cache() if settings.context_cache_enabled else None
+        )
+        self._course_index: Optional[CourseSimilarityIndex] = None
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+        self.course_reuse_enabled = settings.course_reuse_enabled
+        self._ai_service: Optional["AIService"] = None
+        self._job_queue: Optional["JobQueue"] = None
+        self.v1_enabled = v1_enabled
+
+    @classmethod
+    def create(cls, model=None, artifact_store: Optional[ArtifactStore] = None) -> "ServiceRegistry":
+        """Build the registry from settings, optionally around an injected (e.g. stub) model"""
+        return cls(
+            model=model,
+            artifact_store=artifact_store,
+            v1_enabled=model is None and get_settings().api_v1_enabled
+        )
+
+    @property
+    def ai_service_v2(self) -> "AIServiceV2":
+        if self._ai_service_v2 is None:
+            from app.services.ai_service_v2 import AIServiceV2
+            self._ai_service_v2 = AIServiceV2(
+                model=self._model,
+                cache=self.generation_cache,
+                single_flight=self.single_flight,
+                scheduler=self.scheduler,
+                resilience=self.resilience,
+                hedging=self.hedging,
+                context_cache=self.context_cache,
+                metrics=self.metrics,
+                parse_stats=self.parse_stats,
+                continuation_stats=self.continuation_stats
+            )
+        return self._ai_service_v2
+
+    @property
+    def course_index(self) -> Optional[CourseSimilarityIndex]:
+        """Index of past course requests for /plan-course reuse, or None when reuse is disabled"""
+        if self._course_index is None and self.course_reuse_enabled:
+            # Loads every stored signature, so it is built on first use rather than at startup
+            self._course_index = create_course_index()
+        return self._course_index
+
+    @property
+    def artifact_store(self) -> ArtifactStore:
+        if self._artifact_store is None:
+            self._artifact_store = get_artifact_store()
+        return self._artifact_store
+
+    @property
+    def render_pool(self) -> ProcessPoolExecutor:
+        """Worker processes for PDF export layout, started on the first export"""
+        if self._render_pool is None:
+            from app.services.course_export import create_render_pool
+            self._render_pool = create_render_pool()
+        return self._render_pool
+
+    @property
+    def job_queue(self) -> "JobQueue":
+        """Background job queue; its workers start with the app (resuming unfinished jobs) or on first submit"""
+        if self._job_queue is None:
+            from app.services.job_queue import create_job_queue
+            self._job_queue = create_job_queue(self)
+        return self._job_queue
+
+    @property
+    def ai_service(self) -> Optional["AIService"]:
+        """The v1 LangChain agent service, or None when v1 is disabled"""
+        if self._ai_service is None and self.v1_enabled:
+            from app.services.ai_service import AIService
+            self._ai_service = AIService()
+        return self._ai_service
+
+    async def close(self) -> None:
+        # Only shut down what was actually built; the MCP pool starts on the v1 agent's first call
+        if self._job_queue is not None:
+            await self._job_queue.stop()
+            await self._job_queue.store.close()
+        if self._ai_service is not None:
+            await self._ai_service.lang_chain_agent.pool.stop()
+        if self._render_pool is not None:
+            # Exports still being laid out are abandoned; waiting for the workers to exit is blocking
+            await asyncio.to_thread(self._render_pool.shutdown, wait=True, cancel_futures=True)
+        if self._artifact_store is not None:
+            await self._artifact_store.close()
+        if self._course_index is not None:
+            await self._course_index.close()
+        logger.info("Shared services closed")
@@ -0,0 +1,280 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from app.config import get_settings
+
+logger = logging.getLogger("tracing")
+
+# The innermost open span of the current request (propagates into tasks the request creates)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, parent span_id) from a W3C traceparent header, or None if it is missing or malformed"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, span_id = parts[1].lower(), parts[2].lower()
+    try:
+        int(trace_id, 16), int(span_id, 16)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id
+
+class Span:
+    """One timed operation within a trace, exported to the sink when it ends"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "links", "status",
+                 "start_time", "_started", "duration")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.links: List[str] = []
+        self.status = "ok"
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration = 0.0
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_link(self, traceparent: Optional[str]) -> None:
+        """Link to a span in another trace, e.g. the request that generated a parent artifact"""
+        if parse_traceparent(traceparent) is not None and traceparent not in self.links:
+            self.links.append(traceparent)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+            "links": self.links,
+        }
+
+class JsonLinesSink:
+    """
+    Append finished spans to a JSON-lines file, one span per line.
+
+    export() only enqueues the span; a writer thread encodes and writes it, so
+    requests never wait on the file. Like log arguments, a span must not be
+    modified once it has ended. Spans still queued when the process is killed
+    are lost; close() (also run at exit) writes out everything queued before it.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_spans, name="trace-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+
+    def _write_spans(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Everything else queued meanwhile goes out in the same write
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = any(entry is self._STOP for entry in batch)
+            try:
+                lines = [json.dumps(entry, default=str) + "\n" for entry in batch if entry is not self._STOP]
+                if lines:
+                    self._file.write("".join(lines))
+                    self._file.flush()
+            except Exception as e:
+                logger.warning("Failed to write %d spans: %s", len(batch), e)
+
+    def close(self) -> None:
+        """Write out the spans queued so far and close the file; safe to call more than once"""
+        if self._writer.is_alive():
+            self._queue.put(self._STOP)
+            self._writer.join()
+        if not self._file.closed:
+            self._file.close()
+
+class MemorySink:
+    """Keep the most recent finished spans in memory (for tests and benchmarks)"""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span.to_dict())
+
+    def close(self) -> None:
+        pass
+
+class Tracer:
+    """
+    Minimal W3C trace-context tracer.
+
+    Spans nest through a context variable, so a span opened anywhere during a
+    request becomes a child of the request's span, including inside tasks the
+    request starts. Any object with export(span) and close() can be the sink;
+    without one, span() is a no-op and costs one attribute check.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+
+    @property
+    def enabled(self) -> bool:
+        return self.sink is not None
+
+    @contextmanager
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Open a span as a child of the current span; `traceparent` continues a
+        remote trace instead (e.g. from an incoming request header)
+        """
+        if self.sink is None:
+            yield None
+            return
+
+        remote = parse_traceparent(traceparent)
+        parent = _current_span.get()
+        if remote is not None:
+            trace_id, parent_id = remote
+        elif parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+
+        span = Span(name, trace_id, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span._started
+            _current_span.reset(token)
+            self._export(span)
+
+    def record(self, name: str, seconds: float, **attributes) -> None:
+        """Export a child of the current span that already finished, having taken `seconds` up to now"""
+        parent = _current_span.get()
+        if self.sink is None or parent is None:
+            return
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        span.start_time -= seconds
+        span.duration = seconds
+        self._export(span)
+
+    def _export(self, span: Span) -> None:
+        try:
+            self.sink.export(span)
+        except Exception as e:
+            logger.warning("Failed to export span %s: %s", span.name, e)
+
+    def close(self) -> None:
+        if self.sink is not None:
+            self.sink.close()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the current span, for storing alongside artifacts it produces"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+def link_to(traceparent: Optional[str]) -> None:
+    """Link the current span to another trace, if tracing this request"""
+    span = _current_span.get()
+    if span is not None and traceparent:
+        span.add_link(traceparent)
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request.
+
+    Continues the caller's trace when the request carries a traceparent header
+    and returns the request span's traceparent in the response, so a client can
+    chain the calls of a course build into one trace.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with self.tracer.span(f"{scope['method']} {scope['path']}", traceparent, **{
+            "http.method": scope["method"], "http.path": scope["path"]
+        }) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    message = {**message, "headers": [
+                        *message.get("headers", []), (b"traceparent", span.traceparent.encode("latin-1"))
+                    ]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Name the span after the route template once routing has happened
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
+
+@lru_cache()
+def get_tracer() -> Tracer:
+    settings = get_settings()
+    if not settings.tracing_enabled:
+        return Tracer()
+    if settings.trace_sink == "jsonl":
+        return Tracer(JsonLinesSink(settings.trace_path))
+    if settings.trace_sink == "memory":
+        return Tracer(MemorySink())
+    raise ValueError(f"Unknown trace sink: {settings.trace_sink}")
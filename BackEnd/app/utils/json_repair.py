@@ -0,0 +1,244 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_WHITESPACE = " \t\r\n"
+_VALID_ESCAPES = '"\\/bfnrtu'
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "-Infinity": "null",
+}
+_TOKEN_CHARS = re.compile(r"[A-Za-z0-9+\-.]+")
+
+class _Frame:
+    """An open object or array in the repaired output"""
+
+    __slots__ = ("closer", "safe", "count", "expect")
+
+    def __init__(self, closer: str, safe: int):
+        self.closer = closer
+        self.safe = safe      # len(out) just after the last complete element
+        self.count = 0        # complete elements so far
+        self.expect = "key" if closer == "}" else "value"
+
+def _scan_string(text: str, i: int):
+    """
+    Scan a string starting at the opening quote text[i].
+
+    Returns (JSON string literal, index after the closing quote), or
+    (None, len(text)) if the text ends inside the string. Raw control
+    characters and invalid escapes are escaped. A quote followed by a
+    structural character, or by whitespace and another quote (a missing
+    comma), ends the string; any other quote is taken to be an unescaped
+    quote inside the string.
+    """
+    n = len(text)
+    chars = ['"']
+    j = i + 1
+    while j < n:
+        ch = text[j]
+        if ch == "\\":
+            if j + 1 >= n:
+                return None, n
+            nxt = text[j + 1]
+            if nxt == "u" and not re.fullmatch(r"[0-9a-fA-F]{4}", text[j + 2:j + 6]):
+                if j + 6 > n:
+                    return None, n
+                chars.append("\\\\")
+                j += 1
+                continue
+            if nxt in _VALID_ESCAPES:
+                chars.append(ch + nxt)
+            else:
+                chars.append("\\\\" + nxt)
+            j += 2
+            continue
+        if ch == '"':
+            k = j + 1
+            while k < n and text[k] in _WHITESPACE:
+                k += 1
+            following = text[k] if k < n else ""
+            if following in ("", ",", ":", "}", "]") or (following == '"' and k > j + 1):
+                chars.append('"')
+                return "".join(chars), j + 1
+            chars.append('\\"')
+            j += 1
+            continue
+        if ch < " ":
+            chars.append(_CONTROL_ESCAPES.get(ch, f"\\u{ord(ch):04x}"))
+        else:
+            chars.append(ch)
+        j += 1
+    return None, n
+
+def _next_char(text: str, i: int) -> str:
+    """The first non-whitespace character at or after text[i], or "" at the end"""
+    while i < len(text) and text[i] in _WHITESPACE:
+        i += 1
+    return text[i] if i < len(text) else ""
+
+def _start_of_document(text: str) -> int:
+    """Index of the first '{' or '[' after any code fence, or -1"""
+    fence = text.find("```")
+    offset = 0
+    if fence >= 0:
+        newline = text.find("\n", fence)
+        offset = newline + 1 if newline >= 0 else fence + 3
+        if not any(bracket in text[offset:] for bracket in "{["):
+            offset = 0
+    starts = [index for index in (text.find("{", offset), text.find("[", offset)) if index >= 0]
+    return min(starts) if starts else -1
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Repair almost-valid JSON produced by a language model.
+
+    Handles prose or code fences around the document, trailing and missing
+    commas, comments, unescaped quotes and raw control characters inside
+    strings, Python-style literals, and truncation. A truncated document keeps
+    every fully-formed element. Arrays are closed after their last complete
+    item, incomplete nested objects are dropped, and the top-level object
+    keeps its complete fields. Returns the repaired JSON text, or None if
+    nothing could be salvaged.
+    """
+    start = _start_of_document(text)
+    if start < 0:
+        return None
+
+    out: List[str] = []
+    stack: List[_Frame] = []
+    n = len(text)
+    i = start
+    finished = False
+
+    def begin_value() -> bool:
+        """Emit any separator needed before a value; False if a value is not allowed here"""
+        if not stack:
+            return not out
+        frame = stack[-1]
+        if frame.closer == "]":
+            if frame.count:
+                out.append(",")
+            return True
+        if frame.expect == "colon":
+            out.append(":")
+            frame.expect = "value"
+        return frame.expect == "value"
+
+    def complete_value() -> None:
+        if stack:
+            frame = stack[-1]
+            frame.count += 1
+            frame.safe = len(out)
+            frame.expect = "comma"
+
+    while i < n and not finished:
+        ch = text[i]
+
+        if ch in _WHITESPACE:
+            i += 1
+        elif ch == '"':
+            literal, i = _scan_string(text, i)
+            if literal is None:
+                break
+            frame = stack[-1] if stack else None
+            if frame is not None and frame.closer == "}" and frame.expect in ("key", "comma"):
+                if frame.expect == "comma" and _next_char(text, i) not in ("", ":"):
+                    # A missing comma is only inserted before something that is clearly a key
+                    return None
+                if frame.count:
+                    out.append(",")
+                out.append(literal)
+                frame.expect = "colon"
+            elif begin_value():
+                out.append(literal)
+                complete_value()
+        elif ch in "{[":
+            if not begin_value():
+                # A container where a key was expected: skip to keep the output well-formed
+                i += 1
+                continue
+            out.append(ch)
+            stack.append(_Frame("}" if ch == "{" else "]", len(out)))
+            i += 1
+        elif ch in "}]":
+            i += 1
+            if not stack:
+                continue
+            frame = stack.pop()
+            if frame.closer == "}" and frame.expect in ("colon", "value"):
+                # A key without a value
+                del out[frame.safe:]
+            out.append(frame.closer)
+            complete_value()
+            finished = not stack
+        elif ch == ",":
+            i += 1
+            if stack:
+                frame = stack[-1]
+                if frame.closer == "}" and frame.expect in ("colon", "value"):
+                    del out[frame.safe:]
+                frame.expect = "key" if frame.closer == "}" else "value"
+        elif ch == ":":
+            i += 1
+            if stack and stack[-1].closer == "}" and stack[-1].expect == "colon":
+                out.append(":")
+                stack[-1].expect = "value"
+        elif ch == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = n if newline < 0 else newline + 1
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+        else:
+            match = _TOKEN_CHARS.match(text, i)
+            if match is None:
+                i += 1
+                continue
+            token = match.group(0)
+            i = match.end()
+            if i >= n:
+                # A number or literal cut off by truncation can't be trusted
+                break
+            value = _LITERALS.get(token)
+            if value is None:
+                try:
+                    float(token)
+                    json.loads(token)
+                    value = token
+                except ValueError:
+                    continue
+            if begin_value():
+                out.append(value)
+                complete_value()
+
+    # Truncated: keep complete elements and close everything still open
+    while stack:
+        frame = stack.pop()
+        if stack and frame.closer == "}":
+            del out[stack[-1].safe:]
+            continue
+        del out[frame.safe:]
+        out.append(frame.closer)
+        complete_value()
+
+    if not out:
+        return None
+    repaired = "".join(out)
+    try:
+        json.loads(repaired)
+    except json.JSONDecodeError:
+        return None
+    return repaired
+
+def parse_json_lenient(text: str) -> Any:
+    """json.loads, falling back to repair_json; raises json.JSONDecodeError if unrecoverable"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        repaired = repair_json(text)
+        if repaired is None:
+            raise e
+        return json.loads(repaired)
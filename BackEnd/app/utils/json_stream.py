@@ -0,0 +1,176 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+# (key, index, value): index is None for a complete top-level value and the
+# element position for items of a streamed array
+JSONStreamEvent = Tuple[str, Optional[int], Any]
+
+_WHITESPACE = " \t\r\n"
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    Text is fed in arbitrary chunks. Each top-level field is emitted as soon as
+    its value is complete. Fields named in `stream_arrays` are emitted element
+    by element as each element closes, instead of waiting for the whole array.
+    Leading text before the first '{' (e.g. a ```json fence) is skipped.
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = set(stream_arrays)
+        self.done = False
+
+        self._buf = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        # Top-level (depth 1) state
+        self._expect = "key"  # key -> colon -> value -> comma
+        self._token_start = -1
+        self._key: Optional[str] = None
+        self._value_start = -1
+
+        # Streamed array (depth 2) state
+        self._streaming = False
+        self._item_start = -1
+        self._item_index = 0
+
+    def feed(self, chunk: str) -> List[JSONStreamEvent]:
+        """Consume a chunk of text and return any events it completed"""
+        events: List[JSONStreamEvent] = []
+        if self.done:
+            return events
+
+        self._buf += chunk
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+
+        while i < n:
+            ch = buf[i]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                i += 1
+                continue
+
+            if ch == '"':
+                self._start_token(i)
+                self._in_string = True
+            elif ch in "{[":
+                self._start_token(i)
+                self._depth += 1
+                if self._depth == 2 and ch == "[" and self._key in self.stream_arrays:
+                    # Elements are emitted individually, so the array itself is never buffered whole
+                    self._streaming = True
+                    self._item_index = 0
+                    self._value_start = -1
+            elif ch in "}]":
+                self._end_scalar(i, events)
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    i += 1
+                    break
+                if self._depth == 1:
+                    if self._streaming:
+                        self._streaming = False
+                        self._reset_value()
+                    else:
+                        self._emit_value(i + 1, events)
+                elif self._depth == 2 and self._streaming and self._item_start >= 0:
+                    self._emit_item(i + 1, events)
+            elif ch == ",":
+                self._end_scalar(i, events)
+            elif ch == ":":
+                if self._depth == 1 and self._expect == "colon":
+                    self._expect = "value"
+            elif ch not in _WHITESPACE:
+                # Start of a number/true/false/null
+                self._start_token(i)
+            i += 1
+
+        self._pos = i
+        self._compact()
+        return events
+
+    def _start_token(self, i: int) -> None:
+        if self._depth == 1:
+            if self._expect == "key":
+                self._token_start = i
+            elif self._expect == "value" and self._value_start < 0:
+                self._value_start = i
+        elif self._depth == 2 and self._streaming and self._item_start < 0:
+            self._item_start = i
+
+    def _end_string(self, i: int, events: List[JSONStreamEvent]) -> None:
+        if self._depth == 1:
+            if self._expect == "key" and self._token_start >= 0:
+                self._key = json.loads(self._buf[self._token_start:i + 1])
+                self._token_start = -1
+                self._expect = "colon"
+            elif self._expect == "value" and self._value_start >= 0:
+                self._emit_value(i + 1, events)
+        elif self._depth == 2 and self._streaming and self._item_start >= 0:
+            self._emit_item(i + 1, events)
+
+    def _end_scalar(self, i: int, events: List[JSONStreamEvent]) -> None:
+        """Close a pending number/literal terminated by ',' or a closing bracket"""
+        if self._depth == 1 and self._expect == "value" and self._value_start >= 0:
+            self._emit_value(i, events)
+        elif self._depth == 2 and self._streaming and self._item_start >= 0:
+            self._emit_item(i, events)
+        if self._depth == 1 and self._expect == "comma":
+            self._expect = "key"
+
+    def _emit_value(self, end: int, events: List[JSONStreamEvent]) -> None:
+        raw = self._buf[self._value_start:end]
+        try:
+            events.append((self._key, None, json.loads(raw)))
+        except json.JSONDecodeError:
+            pass
+        self._reset_value()
+
+    def _emit_item(self, end: int, events: List[JSONStreamEvent]) -> None:
+        raw = self._buf[self._item_start:end]
+        try:
+            events.append((self._key, self._item_index, json.loads(raw)))
+        except json.JSONDecodeError:
+            pass
+        self._item_start = -1
+        self._item_index += 1
+
+    def _reset_value(self) -> None:
+        self._value_start = -1
+        self._expect = "comma"
+
+    def _compact(self) -> None:
+        """Drop consumed text that no pending token still refers to"""
+        starts = [s for s in (self._token_start, self._value_start, self._item_start) if s >= 0]
+        cut = min(starts) if starts else self._pos
+        if cut > 0:
+            self._buf = self._buf[cut:]
+            self._pos -= cut
+            if self._token_start >= 0:
+                self._token_start -= cut
+            if self._value_start >= 0:
+                self._value_start -= cut
+            if self._item_start >= 0:
+                self._item_start -= cut
@@ -0,0 +1,77 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Type, Union, get_args, get_origin
+from pydantic import BaseModel, create_model
+
+# Fields the server fills in after generation; the model is never asked for them
+SERVER_ASSIGNED_FIELDS = frozenset({
+    "course_id", "module_id", "lesson_id", "quiz_id", "question_id", "activity_id", "metadata"
+})
+
+# JSON Schema keywords understood by Gemini structured output
+_SUPPORTED_KEYWORDS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+def _generated_annotation(annotation: Any) -> Any:
+    """Rewrite a field annotation so nested models are replaced by their generated variants"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return generation_model(annotation)
+
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is list:
+        return List[_generated_annotation(args[0])]
+    if origin is Union:
+        return Union[tuple(_generated_annotation(arg) for arg in args)]
+    return annotation
+
+@lru_cache(maxsize=None)
+def generation_model(model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    The part of a response model the AI model generates: the same fields,
+    recursively, minus server-assigned IDs and metadata.
+    """
+    fields = {
+        name: (_generated_annotation(field.annotation), field.default if not field.is_required() else ...)
+        for name, field in model.model_fields.items()
+        if name not in SERVER_ASSIGNED_FIELDS
+    }
+    return create_model(f"Generated{model.__name__}", **fields)
+
+def _to_gemini_schema(schema: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    """Inline $refs, turn Optional unions into nullable and drop keywords Gemini rejects"""
+    if "$ref" in schema:
+        return _to_gemini_schema(defs[schema["$ref"].split("/")[-1]], defs)
+
+    if "anyOf" in schema:
+        variants = [variant for variant in schema["anyOf"] if variant.get("type") != "null"]
+        if len(variants) != 1:
+            raise ValueError(f"Only Optional unions can be expressed in a response schema: {schema}")
+        converted = _to_gemini_schema(variants[0], defs)
+        if len(variants) < len(schema["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    converted = {key: value for key, value in schema.items() if key in _SUPPORTED_KEYWORDS}
+    if "enum" in converted:
+        converted["format"] = "enum"
+    if "properties" in converted:
+        converted["properties"] = {
+            name: _to_gemini_schema(value, defs) for name, value in converted["properties"].items()
+        }
+    if "items" in converted:
+        converted["items"] = _to_gemini_schema(converted["items"], defs)
+    return converted
+
+@lru_cache(maxsize=None)
+def response_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Gemini structured-output schema for the generated part of `model` (shared; do not mutate)"""
+    json_schema = generation_model(model).model_json_schema()
+    return _to_gemini_schema(json_schema, json_schema.get("$defs", {}))
+
+def strip_code_fence(text: str) -> str:
+    """Return the contents of a ```json fenced block if present, otherwise the text itself"""
+    if "```" in text:
+        json_match = re.search(r'```(?:json)?(.*?)```', text, re.DOTALL)
+        if json_match:
+            return json_match.group(1).strip()
+    return text.strip()
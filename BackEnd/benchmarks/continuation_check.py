@@ -0,0 +1,81 @@
+"""
+Compare continuation of truncated replies with regenerating them.
+
+Generates lessons against a stub model that deterministically cuts every
+reply off after --max-output-chars characters (finish reason MAX_TOKENS) and
+repeats --overlap characters of the partial reply when asked to continue.
+With continuations enabled the pieces are stitched back into the original
+document; with them disabled the truncated reply is salvaged by JSON repair
+or regenerated, which truncates again. Reports, for both modes, how many
+lessons came back complete and identical to the stub's document, model
+calls and generated characters per request.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.continuation_check --requests 50 --max-output-chars 4000
+"""
+import argparse
+import asyncio
+import json
+
+from app.models.v2.lesson import LessonResponse
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.continuation import ContinuationStats
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.parse_stats import ParseStats
+from app.services.single_flight import SingleFlight
+from app.utils.response_schema import generation_model
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+
+
+async def run(requests: int, max_output_chars: int, overlap: int, max_continuations: int) -> dict:
+    model = StubModel(latency=0, payload=sample_payloads.LESSON, max_output_chars=max_output_chars,
+                      continuation_overlap=overlap)
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=32),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience()
+    )
+    service.max_continuations = max_continuations
+    service.continuation_stats = ContinuationStats()
+    service.parse_stats = ParseStats()
+    expected = generation_model(LessonResponse).model_validate(sample_payloads.LESSON)
+
+    outcomes = {"complete": 0, "incomplete": 0, "failed": 0}
+    for i in range(requests):
+        try:
+            lesson = await service.generate_validated(f"prompt {i}", LessonResponse, cache_mode=CacheMode.BYPASS)
+        except Exception:
+            outcomes["failed"] += 1
+            continue
+        outcomes["complete" if lesson == expected else "incomplete"] += 1
+
+    return {
+        **outcomes,
+        "model_calls_per_request": round(model.calls / requests, 3),
+        "generated_chars_per_request": round(model.output_chars / requests),
+        "document_chars": len(json.dumps(sample_payloads.LESSON)),
+        "continuations": service.continuation_stats.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--max-output-chars", type=int, default=4000)
+    parser.add_argument("--overlap", type=int, default=40)
+    parser.add_argument("--max-continuations", type=int, default=2)
+    args = parser.parse_args()
+
+    result = {
+        "regenerate": asyncio.run(run(args.requests, args.max_output_chars, args.overlap, max_continuations=0)),
+        "continue": asyncio.run(run(args.requests, args.max_output_chars, args.overlap, args.max_continuations)),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
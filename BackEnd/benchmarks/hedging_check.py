@@ -0,0 +1,78 @@
+"""
+Measure the effect of request hedging on tail latency.
+
+Runs the same workload against a stub model with a heavy-tailed latency
+distribution (most calls near the median, a few percent many times slower),
+once without hedging and once with it, and reports latency percentiles and
+how many extra model calls the hedges cost.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.hedging_check --requests 400 --median 0.05 --tail-probability 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.hedging import HedgingPolicy
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight
+from benchmarks.report import percentiles
+from benchmarks.stub_model import StubModel, heavy_tailed_latency
+
+
+async def run(requests: int, concurrency: int, latency, hedging: HedgingPolicy) -> dict:
+    model = StubModel(latency=latency)
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=concurrency * 2),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience(),
+        hedging=hedging
+    )
+    slots = asyncio.Semaphore(concurrency)
+    latencies = [0.0] * requests
+    
+    async def call(i: int):
+        async with slots:
+            started = time.perf_counter()
+            await service.generate_ai_content(f"prompt {i}", cache_mode=CacheMode.BYPASS)
+            latencies[i] = time.perf_counter() - started
+    
+    await asyncio.gather(*[call(i) for i in range(requests)])
+    
+    # The first min_samples requests only warm up the latency window
+    measured = latencies[hedging.min_samples:] if hedging else latencies
+    result = {**percentiles(measured), "model_calls": model.calls, "extra_calls_pct": round((model.calls / requests - 1) * 100, 1)}
+    if hedging:
+        result["hedging"] = hedging.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median", type=float, default=0.05, help="Median model latency in seconds")
+    parser.add_argument("--tail-probability", type=float, default=0.05)
+    parser.add_argument("--tail-multiplier", type=float, default=10.0)
+    parser.add_argument("--percentile", type=float, default=95.0, help="Hedge after this percentile of recent latency")
+    parser.add_argument("--budget", type=float, default=0.1, help="Maximum hedges as a fraction of requests")
+    args = parser.parse_args()
+    
+    def latency():
+        return heavy_tailed_latency(args.median, args.tail_probability, args.tail_multiplier, seed=42)
+    
+    baseline = asyncio.run(run(args.requests, args.concurrency, latency(), None))
+    hedged = asyncio.run(run(
+        args.requests, args.concurrency, latency(),
+        HedgingPolicy(percentile=args.percentile, min_samples=20, budget_ratio=args.budget)
+    ))
+    print(json.dumps({"baseline": baseline, "hedged": hedged}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
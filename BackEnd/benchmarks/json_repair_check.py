@@ -0,0 +1,140 @@
+"""
+Measure how much malformed model output local JSON repair salvages, and at what cost.
+
+Builds a corpus of bad outputs by injecting the defects language models
+commonly produce (trailing and missing commas, unescaped quotes, raw
+newlines, Python literals, prose around a code fence, truncation) into the
+sample payloads of every v2 response type. Captured outputs can be added
+with --corpus, a JSONL file of {"model": "LessonResponse", "text": "..."}
+records. For each document, reports whether repair produced valid JSON and
+whether that JSON still validates against the generated response model,
+plus the per-document CPU cost of repair.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.json_repair_check --repeat 20
+    python -m benchmarks.json_repair_check --corpus captured_outputs.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import time
+from collections import defaultdict
+
+from pydantic import ValidationError
+
+from app.models.v2.course import CourseResponse
+from app.models.v2.lesson import LessonResponse, QuizResponse
+from app.models.v2.module import ModuleResponse
+from app.utils.json_repair import repair_json
+from app.utils.response_schema import generation_model
+from benchmarks import sample_payloads
+
+MODELS = {
+    "CourseResponse": (CourseResponse, sample_payloads.COURSE),
+    "ModuleResponse": (ModuleResponse, sample_payloads.MODULE),
+    "LessonResponse": (LessonResponse, sample_payloads.LESSON),
+    "QuizResponse": (QuizResponse, sample_payloads.QUIZ),
+}
+
+
+def _replace_random(text: str, pattern: str, replacement, rng: random.Random) -> str:
+    matches = list(re.finditer(pattern, text))
+    if not matches:
+        return text
+    match = rng.choice(matches)
+    new = replacement(match) if callable(replacement) else replacement
+    return text[:match.start()] + new + text[match.end():]
+
+
+def _unescaped_quote(text: str, rng: random.Random) -> str:
+    # Wrap a word inside a string value in bare double quotes
+    return _replace_random(text, r'(?<=": ")(\w+)', lambda m: f'"{m.group(1)}"', rng)
+
+
+def _truncate(text: str, rng: random.Random) -> str:
+    return text[:rng.randint(len(text) // 3, len(text) - 2)]
+
+
+DEFECTS = {
+    "trailing_comma": lambda text, rng: _replace_random(text, r"\n(\s*)([}\]])", lambda m: f",\n{m.group(1)}{m.group(2)}", rng),
+    "missing_comma": lambda text, rng: _replace_random(text, r",\n", "\n", rng),
+    "unescaped_quote": _unescaped_quote,
+    "raw_newline": lambda text, rng: _replace_random(text, r'(?<=[a-z]) (?=[a-z][^"\n]*",)', "\n", rng),
+    "python_literals": lambda text, rng: text.replace("true", "True").replace("false", "False").replace("null", "None"),
+    "prose_and_fence": lambda text, rng: f"Sure! Here is the JSON you asked for:\n```json\n{text}\n```\nLet me know if you need changes.",
+    "truncated": _truncate,
+    "fence_and_truncated": lambda text, rng: _truncate(f"```json\n{text}", rng),
+}
+
+
+def build_corpus(repeat: int, seed: int) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for model_name, (_, payload) in MODELS.items():
+        text = json.dumps(payload, indent=2)
+        for defect, inject in DEFECTS.items():
+            for _ in range(repeat):
+                corpus.append({"model": model_name, "defect": defect, "text": inject(text, rng)})
+    return corpus
+
+
+def load_corpus(path: str) -> list:
+    with open(path) as f:
+        return [{"defect": "captured", **json.loads(line)} for line in f if line.strip()]
+
+
+def evaluate(corpus: list) -> dict:
+    totals = defaultdict(lambda: {"documents": 0, "already_valid": 0, "valid_json": 0, "valid_model": 0, "cpu_us": 0.0})
+    for document in corpus:
+        text = document["text"]
+        response_model = MODELS[document["model"]][0]
+        started = time.process_time()
+        repaired = repair_json(text)
+        cpu = time.process_time() - started
+
+        for key in (document["defect"], "all"):
+            row = totals[key]
+            row["documents"] += 1
+            row["cpu_us"] += cpu * 1e6
+            try:
+                json.loads(text)
+                row["already_valid"] += 1
+            except json.JSONDecodeError:
+                pass
+            if repaired is None:
+                continue
+            row["valid_json"] += 1
+            try:
+                generation_model(response_model).model_validate_json(repaired)
+                row["valid_model"] += 1
+            except ValidationError:
+                pass
+
+    # Overall totals last
+    totals["all"] = totals.pop("all")
+    return {
+        key: {
+            "documents": row["documents"],
+            "already_valid": row["already_valid"],
+            "salvage_rate_json": round(row["valid_json"] / row["documents"], 4),
+            "salvage_rate_model": round(row["valid_model"] / row["documents"], 4),
+            "cpu_us_per_document": round(row["cpu_us"] / row["documents"], 1),
+        }
+        for key, row in totals.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Documents per defect and response model")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus", help="JSONL file of captured bad outputs to evaluate instead")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else build_corpus(args.repeat, args.seed)
+    print(json.dumps(evaluate(corpus), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Load test for AIServiceV2.generate_ai_content against a stub model.
+
+Fires N concurrent generations for several concurrency caps and shows that
+wall-clock time scales with ceil(N / cap) * latency rather than with N, and
+that the event loop stays responsive while generations are in flight.
+
+With --duplicate every request uses the same prompt, so identical in-flight
+generations are coalesced into a single model call.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.load_test --requests 32 --latency 0.2 --caps 1 4 8 32
+    python -m benchmarks.load_test --requests 32 --duplicate
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.single_flight import SingleFlight
+from app.services.generation_cache import CacheMode
+from benchmarks.stub_model import StubModel
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Measure the worst event-loop lag observed while the load runs"""
+    worst_lag = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst_lag = max(worst_lag, time.perf_counter() - started - interval)
+    return worst_lag
+
+
+async def run_load(num_requests: int, cap: int, latency: float, duplicate: bool = False) -> dict:
+    model = StubModel(latency=latency)
+    service = AIServiceV2(model=model, max_concurrent_generations=cap, single_flight=SingleFlight())
+    
+    stop = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(stop))
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        service.generate_ai_content("prompt" if duplicate else f"prompt {i}", cache_mode=CacheMode.BYPASS)
+        for i in range(num_requests)
+    ])
+    elapsed = time.perf_counter() - started
+    
+    stop.set()
+    worst_lag = await heartbeat
+    
+    return {
+        "requests": num_requests,
+        "cap": cap,
+        "elapsed_s": round(elapsed, 3),
+        "expected_s": round(math.ceil(num_requests / cap) * latency, 3),
+        "max_in_flight": model.max_in_flight,
+        "model_calls": model.calls,
+        "worst_loop_lag_ms": round(worst_lag * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--caps", type=int, nargs="+", default=[1, 4, 8, 32])
+    parser.add_argument("--duplicate", action="store_true", help="Send the same prompt for every request")
+    args = parser.parse_args()
+    
+    print(f"{'cap':>5} {'requests':>9} {'elapsed_s':>10} {'expected_s':>11} {'max_in_flight':>14} {'model_calls':>12} {'loop_lag_ms':>12}")
+    for cap in args.caps:
+        result = asyncio.run(run_load(args.requests, cap, args.latency, args.duplicate))
+        print(f"{result['cap']:>5} {result['requests']:>9} {result['elapsed_s']:>10} "
+              f"{result['expected_s']:>11} {result['max_in_flight']:>14} {result['model_calls']:>12} "
+              f"{result['worst_loop_lag_ms']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Exercise MCPSessionPool against the local stub MCP server.
+
+Shows that sessions are reused across calls (one server start for many tool
+calls), that the per-server concurrency limit is respected, and that a
+crashed server is restarted by the health check.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.mcp_pool_check --calls 20 --per-server 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from app.services.mcp_pool import MCPSessionPool
+
+STUB_CONFIG = {
+    "stub": {
+        "command": sys.executable,
+        "args": [os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_stub_server.py")],
+        "transport": "stdio",
+    }
+}
+
+
+def _tool(pool: MCPSessionPool, name: str):
+    return next(tool for tool in pool.get_tools() if tool.name == name)
+
+
+async def run(calls: int, per_server: int, delay: float) -> dict:
+    pool = MCPSessionPool(STUB_CONFIG, max_concurrency_per_server=per_server,
+                          health_check_interval=1.0, tool_timeout=2.0, ping_timeout=2.0)
+    
+    started = time.perf_counter()
+    await pool.start()
+    startup = time.perf_counter() - started
+    
+    # Warm calls reuse the already-running server
+    started = time.perf_counter()
+    for i in range(calls):
+        await _tool(pool, "echo").ainvoke({"text": str(i)})
+    sequential = time.perf_counter() - started
+    
+    # Concurrent slow calls are capped per server
+    started = time.perf_counter()
+    slow_echo = _tool(pool, "slow_echo")
+    await asyncio.gather(*[slow_echo.ainvoke({"text": str(i), "seconds": delay}) for i in range(calls)])
+    concurrent = time.perf_counter() - started
+    
+    # Crash the server and wait for the health check to bring it back
+    generation = pool.generation
+    try:
+        await _tool(pool, "crash").ainvoke({})
+    except Exception:
+        pass
+    deadline = time.perf_counter() + 15
+    while time.perf_counter() < deadline and not (pool.servers["stub"].healthy and pool.generation > generation):
+        await asyncio.sleep(0.1)
+    recovered = await _tool(pool, "echo").ainvoke({"text": "back"}) == "back"
+    
+    status = pool.status()
+    await pool.stop()
+    
+    return {
+        "startup_s": round(startup, 3),
+        "warm_call_ms": round(sequential / calls * 1000, 2),
+        "concurrent_s": round(concurrent, 3),
+        "expected_concurrent_s": round(-(-calls // per_server) * delay, 3),
+        "restarts": status["servers"]["stub"]["restarts"],
+        "recovered_after_crash": recovered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--per-server", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+    
+    print(json.dumps(asyncio.run(run(args.calls, args.per_server, args.delay)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
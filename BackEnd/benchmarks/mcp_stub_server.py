@@ -0,0 +1,37 @@
+"""
+Tiny stdio MCP server used to exercise the MCP session pool without npx.
+
+Tools:
+    echo(text)         -> returns the text unchanged
+    slow_echo(text, s) -> sleeps s seconds, then echoes
+    crash()            -> terminates the server process
+"""
+import asyncio
+import os
+
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("stub")
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo the given text"""
+    return text
+
+
+@server.tool()
+async def slow_echo(text: str, seconds: float = 0.2) -> str:
+    """Echo the given text after a delay"""
+    await asyncio.sleep(seconds)
+    return text
+
+
+@server.tool()
+def crash() -> str:
+    """Terminate the server process immediately"""
+    os._exit(1)
+
+
+if __name__ == "__main__":
+    server.run(transport="stdio")
@@ -0,0 +1,69 @@
+"""
+Per-request cost of the Prometheus metrics.
+
+Times a single histogram observation, a counter increment, and a request
+through MetricsMiddleware around a no-op ASGI app compared with calling the
+app directly. A generation request records one route observation, four stage
+observations and up to two token counter updates.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.metrics_overhead --iterations 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.metrics import Metrics, MetricsMiddleware
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def time_requests(app, iterations: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/api/v2/create-quiz"}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / iterations
+
+
+def time_calls(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    bare = asyncio.run(time_requests(noop_app, args.iterations))
+    wrapped = asyncio.run(time_requests(MetricsMiddleware(noop_app, metrics), args.iterations))
+    observe = time_calls(lambda: metrics.observe_stage("model_call", 1.3), args.iterations)
+    increment = time_calls(lambda: metrics.tokens.inc("output", amount=900), args.iterations)
+
+    print(json.dumps({
+        "middleware_us": round((wrapped - bare) * 1e6, 3),
+        "stage_observation_us": round(observe * 1e6, 3),
+        "counter_increment_us": round(increment * 1e6, 3),
+        "per_generation_request_us": round((wrapped - bare + 4 * observe + 2 * increment) * 1e6, 3),
+        "render_ms": round(time_calls(metrics.render, 100) * 1000, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
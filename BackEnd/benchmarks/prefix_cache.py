@@ -0,0 +1,81 @@
+"""
+Input tokens per course build with and without a cached shared prompt prefix.
+
+Builds whole courses in-process (as /generate-course) against a stub model,
+once with plain prompts and once with a stub that supports explicit context
+caching of prefixes from 1024 tokens (as Gemini 2.5 Flash). Reports the input
+tokens actually sent to the model per course (prefix uploads included), the
+savings of the cached build over the plain per-task prompts, and how many calls
+reused each cached prefix.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.prefix_cache --courses 5
+"""
+import argparse
+import asyncio
+import json
+
+from app.api.v2.endpoints.pipeline import build_course
+from app.models.v2.course import CourseRequest
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.context_cache import ContextCache
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import Priority
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+
+
+def course_request(i: int) -> CourseRequest:
+    return CourseRequest(
+        title=f"Applied Machine Learning {i}",
+        description="A practical course on supervised learning, model evaluation and feature engineering for analysts.",
+        target_audience="data analysts",
+        time_available="4 weeks",
+        learning_objectives=["Train a regression model", "Evaluate classifiers", "Engineer features"],
+    )
+
+
+async def measure(courses: int, context_caching: bool) -> dict:
+    model = StubModel(latency=0.0, payload=sample_payloads.payload_for_prompt, context_caching=context_caching)
+    ai_service = AIServiceV2(model=model, context_cache=ContextCache(min_prefix_tokens=1024))
+    artifact_store = MemoryArtifactStore()
+    usage = []
+    for i in range(courses):
+        result = await build_course(
+            course_request(i), include_quizzes=True, num_questions=5,
+            priority=Priority.BATCH, cache=CacheMode.BYPASS, ai_service=ai_service, artifact_store=artifact_store
+        )
+        usage.append(result.metadata["prompt_usage"])
+
+    return {
+        "model_calls_per_course": sum(u["model_calls"] for u in usage) / courses,
+        "prompt_tokens_per_course": sum(u["input_tokens"] for u in usage) // courses,
+        "reported_savings": round(sum(u["input_token_savings"] for u in usage) / courses, 4),
+        "sent_tokens_per_course": model.input_chars // 4 // courses,
+        # The stub plans the same course for every request, so its builds share one prefix
+        "cached_prefixes": len(model.prefix_caches),
+        "calls_per_cached_prefix": sorted(model.prefix_caches.values()),
+    }
+
+
+async def run(args) -> dict:
+    plain = await measure(args.courses, context_caching=False)
+    cached = await measure(args.courses, context_caching=True)
+    return {
+        "courses": args.courses,
+        "plain": plain,
+        "cached_prefix": cached,
+        "input_token_savings": round(1 - cached["sent_tokens_per_course"] / plain["sent_tokens_per_course"], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
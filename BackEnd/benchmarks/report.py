@@ -0,0 +1,13 @@
+"""Shared helpers for summarising benchmark results"""
+import statistics
+
+
+def percentiles(latencies) -> dict:
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    return {
+        "p50_ms": round(pick(50) * 1000, 1),
+        "p95_ms": round(pick(95) * 1000, 1),
+        "p99_ms": round(pick(99) * 1000, 1),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+    }
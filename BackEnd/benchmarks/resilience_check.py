@@ -0,0 +1,95 @@
+"""
+Exercise error classification, the retry budget and the circuit breaker
+against a failing stub model.
+
+Three scenarios run back to back:
+  permanent - every call fails with InvalidArgument: one attempt each, no retries
+  outage    - every call fails with ServiceUnavailable: retries are capped by
+              the budget and the breaker opens, failing later calls fast
+  probe     - the model is healthy again: after the reset timeout a single
+              probe call closes the breaker
+  recovery  - calls succeed normally again
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.resilience_check --requests 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import CircuitBreaker, CircuitOpenError, LLMCallError, LLMResilience, RetryBudget
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+
+async def scenario(service: AIServiceV2, model: StubModel, requests: int) -> dict:
+    model.calls = 0
+    outcomes = {"ok": 0, "failed": 0, "fast_failed": 0}
+    started = time.perf_counter()
+    
+    async def call(i: int):
+        try:
+            await service.generate_ai_content(f"prompt {i}", cache_mode=CacheMode.BYPASS)
+            outcomes["ok"] += 1
+        except CircuitOpenError:
+            outcomes["fast_failed"] += 1
+        except LLMCallError:
+            outcomes["failed"] += 1
+    
+    await asyncio.gather(*[call(i) for i in range(requests)])
+    return {
+        **outcomes,
+        "model_calls": model.calls,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "breaker_state": service.resilience.breaker.state.value,
+    }
+
+
+async def run(requests: int, latency: float, reset_timeout: float) -> dict:
+    model = StubModel(latency=latency)
+    resilience = LLMResilience(
+        breaker=CircuitBreaker(failure_threshold=5, reset_timeout=reset_timeout),
+        budget=RetryBudget(ratio=0.2, min_retries_per_second=0.5)
+    )
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=4),
+        single_flight=SingleFlight(),
+        resilience=resilience
+    )
+    results = {}
+    
+    model.error = google_exceptions.InvalidArgument("Request contains an invalid argument.")
+    results["permanent"] = await scenario(service, model, requests)
+    
+    model.error = google_exceptions.ServiceUnavailable("The model is overloaded.")
+    results["outage"] = await scenario(service, model, requests)
+    
+    model.error = None
+    await asyncio.sleep(reset_timeout)
+    results["probe"] = await scenario(service, model, 1)
+    results["recovery"] = await scenario(service, model, requests)
+    
+    results["resilience"] = resilience.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--reset-timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    
+    result = asyncio.run(run(args.requests, args.latency, args.reset_timeout))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Representative model outputs (without server-assigned IDs) for each v2 generation"""
+
+COURSE = {
+    "course_title": "Introduction to Artificial Intelligence",
+    "course_description": "A comprehensive overview of AI concepts, applications and ethical considerations.",
+    "course_introduction": "Artificial intelligence is reshaping every industry. This course builds the foundations.",
+    "learning_outcomes": ["Explain core AI terminology", "Compare AI approaches", "Evaluate ethical implications"],
+    "prerequisites": ["Basic Python knowledge"],
+    "target_audience_description": "University students with basic programming knowledge",
+    "estimated_total_duration": "4 weeks",
+    "modules": [
+        {
+            "module_title": f"Module {i + 1}",
+            "module_summary": "An overview of the key ideas covered in this module.",
+            "estimated_duration": "3 hours",
+            "key_concepts": ["Search", "Learning", "Reasoning"],
+        }
+        for i in range(4)
+    ],
+    "recommended_resources": [
+        {"title": "Artificial Intelligence: A Modern Approach", "description": "Standard textbook", "type": "book", "url": None}
+    ],
+}
+
+MODULE = {
+    "module_introduction": "This module introduces the building blocks of machine learning.",
+    "learning_path": "Start with supervised learning, then move on to evaluation and pitfalls.",
+    "lessons": [
+        {
+            "lesson_title": f"Lesson {i + 1}",
+            "lesson_objective": "Understand and apply the lesson's core technique.",
+            "estimated_duration": "45 minutes",
+            "key_points": ["Definition", "Worked example", "Common mistakes"],
+        }
+        for i in range(4)
+    ],
+    "activities": [
+        {
+            "activity_title": "Train a classifier",
+            "activity_type": "exercise",
+            "activity_description": "Train and evaluate a small classifier on a toy dataset.",
+            "estimated_duration": "30 minutes",
+        }
+    ],
+    "resources": [{"title": "Scikit-learn user guide", "description": "Reference documentation", "type": "documentation"}],
+}
+
+LESSON = {
+    "lesson_title": "Supervised Learning",
+    "introduction": "Supervised learning learns a mapping from labelled examples.",
+    "sections": [
+        {
+            "heading": f"Section {i + 1}",
+            "content": " ".join(f"Point {i + 1}.{j + 1}: supervised learning uses labelled data." for j in range(40)),
+            "importance": 2,
+        }
+        for i in range(5)
+    ],
+    "summary": "Supervised learning generalises from labelled examples to unseen data.",
+    "reflection_questions": ["Where could supervised learning help in your work?", "What makes a good label?"],
+    "next_steps": "Continue with model evaluation.",
+    "resources": [{"title": "Lecture notes", "description": "Background reading", "type": "article", "url": "https://example.com"}],
+}
+
+QUIZ = {
+    "quiz_introduction": "Check your understanding of supervised learning.",
+    "questions": [
+        {
+            "question": f"Question {i + 1}: what does a supervised model learn from?",
+            "options": ["A. Labelled examples", "B. Random noise", "C. Rewards only", "D. Nothing"],
+            "correct_answer": "A. Labelled examples",
+            "explanation": "Supervised learning fits a mapping from inputs to known labels.",
+            "difficulty": "medium",
+        }
+        for i in range(5)
+    ],
+    "passing_score": 80,
+    "difficulty_level": "intermediate",
+}
+
+
+def payload_for_prompt(prompt: str) -> dict:
+    """Pick the sample payload matching a v2 prompt builder"""
+    if "assessment author" in prompt:
+        return {"lesson": LESSON, "quiz": QUIZ}
+    if "curriculum designer" in prompt:
+        return COURSE
+    if "module development" in prompt:
+        return MODULE
+    if "assessment designer" in prompt:
+        return QUIZ
+    return LESSON
@@ -0,0 +1,73 @@
+"""
+Exercise the LLM scheduler against a stub model.
+
+Submits a burst of batch generations followed by a few interactive ones and
+shows that interactive calls overtake the batch backlog, that the
+requests-per-minute bucket paces admissions, and that calls beyond the queue
+limit are rejected immediately with a Retry-After hint.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.scheduler_check --batch 40 --interactive 4 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import LLMScheduler, Priority, SchedulerRejected
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+
+async def run(batch: int, interactive: int, concurrency: int, latency: float, rpm: int, batch_queue: int) -> dict:
+    scheduler = LLMScheduler(
+        max_concurrency=concurrency,
+        requests_per_minute=rpm,
+        max_queue={Priority.INTERACTIVE: 100, Priority.BATCH: batch_queue},
+        max_queue_wait=60
+    )
+    service = AIServiceV2(model=StubModel(latency=latency), scheduler=scheduler, single_flight=SingleFlight())
+    started = time.perf_counter()
+    finished = {Priority.INTERACTIVE: [], Priority.BATCH: []}
+    rejected = []
+    
+    async def call(i: int, priority: Priority):
+        try:
+            await service.generate_ai_content(f"{priority.value} {i}", cache_mode=CacheMode.BYPASS, priority=priority)
+            finished[priority].append(time.perf_counter() - started)
+        except SchedulerRejected as e:
+            rejected.append(e.headers["Retry-After"])
+    
+    tasks = [asyncio.create_task(call(i, Priority.BATCH)) for i in range(batch)]
+    await asyncio.sleep(latency / 2)
+    tasks += [asyncio.create_task(call(i, Priority.INTERACTIVE)) for i in range(interactive)]
+    await asyncio.gather(*tasks)
+    
+    return {
+        "interactive_last_done_s": round(max(finished[Priority.INTERACTIVE], default=0), 3),
+        "batch_last_done_s": round(max(finished[Priority.BATCH], default=0), 3),
+        "batch_completed": len(finished[Priority.BATCH]),
+        "rejected": len(rejected),
+        "retry_after_hints": sorted(set(rejected)),
+        "scheduler": scheduler.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=40)
+    parser.add_argument("--interactive", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute (0 = unlimited)")
+    parser.add_argument("--batch-queue", type=int, default=30)
+    args = parser.parse_args()
+    
+    result = asyncio.run(run(args.batch, args.interactive, args.concurrency, args.latency, args.rpm, args.batch_queue))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Lookup latency and accuracy of the near-duplicate course index.
+
+Fills an in-memory CourseSimilarityIndex with synthetic course requests, then
+looks up perturbed copies of indexed requests (different casing, whitespace,
+objective order and one replaced description word) and unrelated requests.
+Reports lookup latency percentiles, the share of perturbed copies matched to
+their original, and the share of unrelated requests wrongly matched.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.similarity_index --courses 100000 --lookups 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from app.models.v2.course import CourseRequest
+from app.services.course_index import CourseSimilarityIndex
+
+VOCABULARY = [f"{stem}{suffix}" for stem in (
+    "data", "model", "learn", "design", "system", "network", "market", "history", "cell", "energy",
+    "code", "graph", "finance", "health", "language", "music", "art", "law", "physics", "ethics",
+) for suffix in ("", "s", "ing", "al", "ion", "ive", "ment", "ity", "er", "ist")]
+
+
+def random_request(rng: random.Random) -> CourseRequest:
+    def words(n):
+        return " ".join(rng.choice(VOCABULARY) for _ in range(n))
+
+    return CourseRequest(
+        title=words(4).title(),
+        description=words(rng.randint(20, 35)) + ".",
+        target_audience=words(3),
+        time_available=f"{rng.randint(1, 12)} weeks",
+        learning_objectives=[words(6) for _ in range(rng.randint(2, 4))],
+        difficulty_level=rng.choice(["beginner", "intermediate", "advanced"]),
+    )
+
+
+def perturb(request: CourseRequest, rng: random.Random) -> CourseRequest:
+    """The same request as a user might resubmit it"""
+    words = request.description.split()
+    words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    objectives = list(request.learning_objectives)
+    rng.shuffle(objectives)
+    return request.model_copy(update={
+        "title": "  " + request.title.upper(),
+        "description": "  ".join(words),
+        "learning_objectives": objectives,
+    })
+
+
+def percentiles_us(latencies) -> dict:
+    ordered = sorted(latencies)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+    return {f"p{p}_us": round(pick(p) * 1e6, 1) for p in (50, 95, 99)}
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    index = CourseSimilarityIndex(threshold=args.threshold)
+    requests = []
+    started = time.perf_counter()
+    for i in range(args.courses):
+        request = random_request(rng)
+        requests.append(request)
+        await index.add(f"course_{i}", request)
+    build_seconds = time.perf_counter() - started
+
+    duplicate_latencies, unrelated_latencies = [], []
+    matched = false_matches = 0
+    for _ in range(args.lookups):
+        i = rng.randrange(args.courses)
+        query = perturb(requests[i], rng)
+        started = time.perf_counter()
+        match = index.find(query)
+        duplicate_latencies.append(time.perf_counter() - started)
+        matched += match is not None and match[0] == f"course_{i}"
+
+        query = random_request(rng)
+        started = time.perf_counter()
+        match = index.find(query)
+        unrelated_latencies.append(time.perf_counter() - started)
+        false_matches += match is not None
+
+    return {
+        "courses": len(index),
+        "build_seconds": round(build_seconds, 1),
+        "duplicate_lookup": percentiles_us(duplicate_latencies),
+        "unrelated_lookup": percentiles_us(unrelated_latencies),
+        "duplicate_recall": round(matched / args.lookups, 4),
+        "false_match_rate": round(false_matches / args.lookups, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Cold-start time from `import main` to the first /api/v2/health response.
+
+Each run starts a fresh Python process, imports the app, runs the lifespan
+startup and serves one health check in-process. It reports the import time,
+the time to the first response (excluding the test client's own import) and
+which heavy client libraries ended up loaded. With --eager, the Gemini,
+LangChain, LangGraph and MCP libraries are imported up front, as they were
+before imports were made lazy, for comparison.
+
+A placeholder GOOGLE_API_KEY is set if none is configured; no model is called.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.startup_time --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["google.generativeai", "langchain_google_genai", "langgraph", "langchain_mcp_adapters"]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+if {eager}:
+    for module in {heavy}:
+        __import__(module)
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client_imported = time.perf_counter()
+with TestClient(main.app) as client:
+    response = client.get("/api/v2/health")
+    responded = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - started,
+    "first_health_s": (responded - started) - (client_imported - imported),
+    "status_code": response.status_code,
+    "loaded": [module for module in {heavy} if module in sys.modules],
+}}))
+"""
+
+
+def run_once(eager: bool) -> dict:
+    env = {**os.environ, "ARTIFACT_STORE_BACKEND": "memory", "PYTHONWARNINGS": "ignore"}
+    env.setdefault("GOOGLE_API_KEY", "startup-benchmark")
+    child = CHILD.format(eager=eager, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", child], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(runs: list) -> dict:
+    return {
+        "import_s": {"median": round(statistics.median(r["import_s"] for r in runs), 3),
+                     "max": round(max(r["import_s"] for r in runs), 3)},
+        "first_health_s": {"median": round(statistics.median(r["first_health_s"] for r in runs), 3),
+                           "max": round(max(r["first_health_s"] for r in runs), 3)},
+        "status_codes": sorted({r["status_code"] for r in runs}),
+        "loaded": runs[-1]["loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="Also measure with the heavy libraries imported up front")
+    args = parser.parse_args()
+
+    result = {"lazy": summarize([run_once(eager=False) for _ in range(args.runs)])}
+    if args.eager:
+        result["eager"] = summarize([run_once(eager=True) for _ in range(args.runs)])
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
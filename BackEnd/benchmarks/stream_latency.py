@@ -0,0 +1,79 @@
+"""
+Time-to-first-content for streamed vs. buffered lesson generation.
+
+Drives the /create-lesson-content and /create-lesson-content/stream handlers
+in-process against a stub model that spreads its latency across the streamed
+chunks, and reports when the first section and the full lesson arrive.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.stream_latency --latency 5 --chunk-size 64
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.api.v2.endpoints import lessons
+from app.models.v2.lesson import LessonRequest
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.generation_cache import CacheMode
+from app.services.llm_scheduler import Priority
+from benchmarks.stub_model import StubModel
+
+LESSON_PAYLOAD = {
+    "lesson_title": "Streaming Lessons",
+    "introduction": "An introduction that arrives before any of the sections.",
+    "sections": [
+        {"heading": f"Section {i + 1}", "content": "Lorem ipsum dolor sit amet. " * 60, "importance": 2}
+        for i in range(5)
+    ],
+    "summary": "A short summary.",
+    "reflection_questions": ["What changed?", "Why does it matter?", "What next?"],
+    "next_steps": "Try the next lesson.",
+    "resources": [{"title": "Reference", "description": "Further reading", "type": "article", "url": None}],
+}
+
+
+async def measure(latency: float, chunk_size: int) -> dict:
+    services = {
+        "ai_service": AIServiceV2(model=StubModel(latency=latency, payload=LESSON_PAYLOAD, chunk_size=chunk_size)),
+        "artifact_store": MemoryArtifactStore(),
+    }
+    request = LessonRequest(module_id="mod_bench", lesson_title="Streaming Lessons", lesson_objective="Measure TTFC")
+    
+    started = time.perf_counter()
+    await lessons.create_lesson_content(request, priority=Priority.INTERACTIVE, cache=CacheMode.BYPASS, **services)
+    buffered = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    first_content = first_section = None
+    response = await lessons.stream_lesson_content(request, priority=Priority.INTERACTIVE, cache=CacheMode.BYPASS, **services)
+    async for line in response.body_iterator:
+        event = json.loads(line)["event"]
+        now = time.perf_counter() - started
+        if first_content is None and event == "introduction":
+            first_content = now
+        if first_section is None and event == "section":
+            first_section = now
+    streamed_total = time.perf_counter() - started
+    
+    return {
+        "buffered_total_s": round(buffered, 3),
+        "stream_first_content_s": round(first_content, 3),
+        "stream_first_section_s": round(first_section, 3),
+        "stream_total_s": round(streamed_total, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=5.0, help="Total stub generation time in seconds")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Characters per streamed chunk")
+    args = parser.parse_args()
+    
+    print(json.dumps(asyncio.run(measure(args.latency, args.chunk_size)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare parse failures with and without schema-constrained generation.
+
+Generates every v2 response type against a stub model whose free-form JSON
+output is malformed at a configurable rate (prose around a code fence,
+missing fields, truncation). Schema-constrained calls always conform, as
+with Gemini structured output. Reports parse failures, regenerations and
+model calls per request for both modes.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.structured_output_check --requests 200 --malformed-rate 0.1
+"""
+import argparse
+import asyncio
+import json
+
+from app.models.v2.course import CourseResponse
+from app.models.v2.lesson import LessonResponse, QuizResponse
+from app.models.v2.module import ModuleResponse
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.parse_stats import ParseStats
+from app.services.single_flight import SingleFlight
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+
+MODELS = {
+    CourseResponse: sample_payloads.COURSE,
+    ModuleResponse: sample_payloads.MODULE,
+    LessonResponse: sample_payloads.LESSON,
+    QuizResponse: sample_payloads.QUIZ,
+}
+
+
+async def run(requests: int, malformed_rate: float, structured_output: bool) -> dict:
+    result = {}
+    for response_model, payload in MODELS.items():
+        model = StubModel(latency=0, payload=payload, malformed_rate=malformed_rate, seed=7)
+        service = AIServiceV2(
+            model=model,
+            scheduler=LLMScheduler(max_concurrency=32),
+            single_flight=SingleFlight(),
+            resilience=LLMResilience()
+        )
+        service.structured_output = structured_output
+        service.parse_stats = ParseStats()
+        
+        failed_requests = 0
+        for i in range(requests):
+            try:
+                await service.generate_validated(f"prompt {i}", response_model, cache_mode=CacheMode.BYPASS)
+            except Exception:
+                failed_requests += 1
+        
+        mode = "schema" if structured_output else "free_form"
+        counters = service.parse_stats.stats()[response_model.__name__][mode]
+        result[response_model.__name__] = {
+            "parse_failure_rate": counters["failure_rate"],
+            "repaired": counters["repaired"],
+            "regenerations": counters["regenerations"],
+            "failed_requests": failed_requests,
+            "model_calls_per_request": round(model.calls / requests, 3),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    
+    result = {
+        "free_form": asyncio.run(run(args.requests, args.malformed_rate, structured_output=False)),
+        "schema": asyncio.run(run(args.requests, args.malformed_rate, structured_output=True)),
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
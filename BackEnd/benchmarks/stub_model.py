@@ -0,0 +1,199 @@
+import asyncio
+import json
+import random
+
+
+def heavy_tailed_latency(median: float = 0.2, tail_probability: float = 0.05, tail_multiplier: float = 10.0,
+                         seed: int = 0):
+    """
+    Latency sampler with a long tail: most calls take about `median` seconds
+    (log-normal jitter), but `tail_probability` of them are `tail_multiplier`
+    times slower, like a request stuck on an overloaded backend.
+    """
+    rng = random.Random(seed)
+    
+    def sample() -> float:
+        latency = median * rng.lognormvariate(0, 0.25)
+        if rng.random() < tail_probability:
+            latency *= tail_multiplier
+        return latency
+    
+    return sample
+
+
+def latency_distribution(kind: str = "fixed", median: float = 0.2, tail_probability: float = 0.05,
+                         tail_multiplier: float = 10.0, seed: int = 0):
+    """
+    Latency for StubModel by name: "fixed" (always `median`), "lognormal"
+    (jitter around `median`) or "heavy_tailed" (lognormal plus a slow tail).
+    """
+    if kind == "fixed":
+        return median
+    if kind == "lognormal":
+        return heavy_tailed_latency(median, tail_probability=0.0, seed=seed)
+    if kind == "heavy_tailed":
+        return heavy_tailed_latency(median, tail_probability, tail_multiplier, seed)
+    raise ValueError(f"Unknown latency distribution: {kind}")
+
+
+class StubFinishReason:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class StubCandidate:
+    def __init__(self, finish_reason: str):
+        self.finish_reason = StubFinishReason(finish_reason)
+
+
+class StubResponse:
+    """Minimal stand-in for a Gemini GenerateContentResponse"""
+    
+    def __init__(self, text: str, finish_reason: str = "STOP"):
+        self.text = text
+        self.candidates = [StubCandidate(finish_reason)]
+
+
+class StubStream:
+    """Async iterator over response chunks, mimicking a streamed Gemini response"""
+    
+    def __init__(self, text: str, chunk_size: int, latency: float):
+        self.chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.delay = latency / max(len(self.chunks), 1)
+    
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield StubResponse(chunk)
+
+
+class StubModel:
+    """
+    Stub Gemini model that sleeps for a fixed latency and returns canned JSON.
+    
+    `latency` is either a number of seconds or a zero-argument callable that
+    samples one (see heavy_tailed_latency).
+    
+    When `error` is set, each call raises it with probability `failure_rate`
+    (after the latency, like a real upstream failure).
+    
+    `payload` is a dict or a callable mapping the prompt to one. Without a
+    response_schema in the generation config, `malformed_rate` of the responses
+    are broken the way free-form JSON output breaks (code fences with prose,
+    missing fields, truncation); schema-constrained calls always conform.
+    
+    With `max_output_chars` set, non-streamed replies longer than that are cut
+    off deterministically and reported with finish reason MAX_TOKENS, like a
+    reply that hit max_output_tokens. A later prompt that quotes the partial
+    reply gets the next piece of the same document, repeating the last
+    `continuation_overlap` characters the way a model sometimes does.
+    
+    With `context_caching` set, the stub accepts explicit cached prefixes like
+    Gemini's CachedContent: `prefix_caches` maps each cached prefix to the
+    number of calls made against it, and `input_chars` counts the characters
+    actually sent. Prefixes shorter than `min_cached_prefix_chars` are refused.
+    """
+    
+    def __init__(self, latency: float = 0.2, payload=None, chunk_size: int = 64,
+                 error: Exception = None, failure_rate: float = 1.0, malformed_rate: float = 0.0, seed: int = 0,
+                 max_output_chars: int = 0, continuation_overlap: int = 0,
+                 context_caching: bool = False, min_cached_prefix_chars: int = 0):
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.payload = payload or {"test": "This is a test"}
+        self.error = error
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self.max_output_chars = max_output_chars
+        self.continuation_overlap = continuation_overlap
+        self._truncated = {}  # partial reply -> full document it was cut from
+        self.output_chars = 0
+        self.waited = 0.0  # Total simulated model latency, in seconds
+        self.calls = 0
+        self.input_chars = 0
+        self.supports_context_caching = context_caching
+        self.min_cached_prefix_chars = min_cached_prefix_chars
+        self.prefix_caches = {}  # cached prefix -> calls made against it
+        self.in_flight = 0
+        self.max_in_flight = 0
+    
+    def _sample_latency(self) -> float:
+        latency = self.latency() if callable(self.latency) else self.latency
+        self.waited += latency
+        return latency
+    
+    def _render(self, prompt, generation_config) -> str:
+        payload = self.payload(prompt) if callable(self.payload) else self.payload
+        text = json.dumps(payload)
+        constrained = bool(generation_config and generation_config.get("response_schema"))
+        if constrained or self._random.random() >= self.malformed_rate:
+            return text
+        
+        damage = self._random.choice(["prose", "missing_field", "truncated"])
+        if damage == "prose":
+            return f"Here is the content you asked for:\n```json\n{text}\n```\nLet me know if you need changes."
+        if damage == "missing_field":
+            return json.dumps({key: value for key, value in list(payload.items())[1:]})
+        return text[:len(text) * 2 // 3]
+    
+    def _reply(self, prompt, generation_config) -> StubResponse:
+        full, start = None, 0
+        quoted = [partial for partial in self._truncated if partial in prompt]
+        if quoted:
+            # A continuation request: resume the document where the longest quoted partial reply stopped
+            partial = max(quoted, key=len)
+            full, start = self._truncated[partial], max(0, len(partial) - self.continuation_overlap)
+        else:
+            full = self._render(prompt, generation_config)
+        
+        text = full[start:]
+        if not self.max_output_chars or len(text) <= self.max_output_chars:
+            self.output_chars += len(text)
+            return StubResponse(text)
+        
+        text = text[:self.max_output_chars]
+        self.output_chars += len(text)
+        partial = full[:start] + text
+        self._truncated[partial] = full
+        return StubResponse(text, finish_reason="MAX_TOKENS")
+    
+    async def create_cached_content(self, prefix: str, ttl_seconds: float) -> "StubCachedModel":
+        if not self.supports_context_caching:
+            raise ValueError("Context caching is not supported by this model")
+        if len(prefix) < self.min_cached_prefix_chars:
+            raise ValueError(f"Cached content must be at least {self.min_cached_prefix_chars} characters")
+        await asyncio.sleep(0)
+        self.prefix_caches.setdefault(prefix, 0)
+        self.input_chars += len(prefix)
+        return StubCachedModel(self, prefix)
+    
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        self.input_chars += len(prompt)
+        if stream:
+            # Streamed output spreads the same total latency across the chunks
+            self.calls += 1
+            return StubStream(self._render(prompt, generation_config), self.chunk_size, self._sample_latency())
+        
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self._sample_latency())
+            if self.error is not None and self._random.random() < self.failure_rate:
+                raise self.error
+            return self._reply(prompt, generation_config)
+        finally:
+            self.in_flight -= 1
+
+
+class StubCachedModel:
+    """A StubModel bound to a cached prefix; calls send only the rest of the prompt"""
+    
+    def __init__(self, model: StubModel, prefix: str):
+        self.model = model
+        self.prefix = prefix
+    
+    async def generate_content_async(self, contents, generation_config=None, stream=False, **kwargs):
+        self.model.prefix_caches[self.prefix] += 1
+        return await self.model.generate_content_async(contents, generation_config=generation_config, stream=stream)
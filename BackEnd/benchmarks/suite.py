@@ -0,0 +1,263 @@
+"""
+Benchmark suite for the v2 generation endpoints against a deterministic stub Gemini.
+
+Drives /plan-course, /plan-module, /create-lesson-content and /create-quiz at
+each requested concurrency, either in-process (ASGI transport, no sockets) or
+over HTTP against a uvicorn server started on a local port, or both. The app
+is built with create_app around a ServiceRegistry whose model is a StubModel
+returning canned course/module/lesson/quiz JSON, so no Gemini quota is used.
+
+Per endpoint it reports p50/p95/p99 latency, throughput and status codes, and
+splits where the time went: CPU spent parsing and validating model output,
+other CPU (framework, prompt building, JSON encoding, the client), and time
+spent waiting on the (simulated) model.
+
+Stub behaviour is configurable: latency distribution (fixed, lognormal,
+heavy_tailed), malformed-output rate (only for free-form output, i.e. with
+--no-structured-output, as Gemini always conforms to a response schema) and
+truncation at a fixed reply length (answered by continuation calls).
+
+Results are written as JSON; pass an earlier file with --compare to print the
+change in latency and throughput, e.g. between two commits.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.suite --transport both --concurrency 1 8 32 --requests 50
+    python -m benchmarks.suite --latency-dist heavy_tailed --output bench.json --compare baseline.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import socket
+import subprocess
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from main import create_app
+from app.config import get_settings
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.continuation import ContinuationStats
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.parse_stats import ParseStats
+from app.services.registry import ServiceRegistry
+from app.services.single_flight import SingleFlight
+from benchmarks import sample_payloads
+from benchmarks.report import percentiles
+from benchmarks.stub_model import StubModel, latency_distribution
+
+ENDPOINTS = ["/plan-course", "/plan-module", "/create-lesson-content", "/create-quiz"]
+
+
+def request_body(endpoint: str, i: int) -> dict:
+    """A distinct request per index, so identical prompts are never coalesced"""
+    if endpoint == "/plan-course":
+        return {
+            "title": f"Benchmark course {i}",
+            "description": "A course generated by the benchmark suite against a stub model.",
+            "target_audience": "Benchmark readers",
+            "time_available": "4 weeks",
+        }
+    if endpoint == "/plan-module":
+        return {"course_id": f"course_bench_{i}", "module_title": f"Module {i}", "module_summary": "Benchmark module"}
+    if endpoint == "/create-lesson-content":
+        return {"module_id": f"mod_bench_{i}", "lesson_title": f"Lesson {i}", "lesson_objective": "Benchmark lesson"}
+    return {"lesson_id": f"les_bench_{i}"}
+
+
+async def seed_contexts(store: MemoryArtifactStore, requests: int) -> None:
+    """Parent contexts for every request, so each prompt differs like it would in production"""
+    for i in range(requests):
+        await store.put("course", f"course_bench_{i}", {
+            "course_title": f"Benchmark course {i}",
+            "course_description": "Benchmark course",
+            "target_audience_description": "Benchmark readers",
+        })
+        await store.put("module", f"mod_bench_{i}", {"module_title": f"Module {i}", "module_summary": "Benchmark"})
+        await store.put("lesson", f"les_bench_{i}", {"lesson_title": f"Lesson {i}", "lesson_objective": "Benchmark"})
+
+
+def build_registry(args) -> ServiceRegistry:
+    model = StubModel(
+        latency=latency_distribution(args.latency_dist, args.median, args.tail_probability, seed=args.seed),
+        payload=sample_payloads.payload_for_prompt,
+        malformed_rate=args.malformed_rate,
+        max_output_chars=args.truncate_at,
+        seed=args.seed
+    )
+    ai_service = AIServiceV2(
+        model=model,
+        # Rate limits off: the suite measures the service, not Gemini quota
+        scheduler=LLMScheduler(max_concurrency=args.max_generations),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience()
+    )
+    ai_service.structured_output = not args.no_structured_output
+    ai_service.parse_stats = ParseStats()
+    ai_service.continuation_stats = ContinuationStats()
+    return ServiceRegistry(ai_service_v2=ai_service, artifact_store=MemoryArtifactStore(), v1_enabled=False)
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, requests: int, concurrency: int) -> dict:
+    """Send `requests` requests to one endpoint with at most `concurrency` in flight"""
+    latencies = []
+    status_codes = {}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with slots:
+            started = time.perf_counter()
+            response = await client.post(f"/api/v2{endpoint}?cache=bypass", json=request_body(endpoint, i))
+            latencies.append(time.perf_counter() - started)
+            status_codes[str(response.status_code)] = status_codes.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+    return {
+        **percentiles(latencies),
+        "throughput_rps": round(requests / elapsed, 2),
+        "status_codes": status_codes,
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+async def measure(client: httpx.AsyncClient, registry: ServiceRegistry, endpoint: str, requests: int,
+                  concurrency: int) -> dict:
+    ai_service = registry.ai_service_v2
+    model = ai_service.model
+    parse_cpu = ai_service.parse_stats.total_cpu_seconds()
+    waited, calls = model.waited, model.calls
+    cpu = time.process_time()
+
+    result = await drive(client, endpoint, requests, concurrency)
+
+    cpu = time.process_time() - cpu
+    parse_cpu = ai_service.parse_stats.total_cpu_seconds() - parse_cpu
+    result["model_calls_per_request"] = round((model.calls - calls) / requests, 3)
+    result["time_per_request_ms"] = {
+        "parse_validate_cpu": round(parse_cpu / requests * 1000, 3),
+        "other_cpu": round((cpu - parse_cpu) / requests * 1000, 3),
+        "model_wait": round((model.waited - waited) / requests * 1000, 1),
+    }
+    return result
+
+
+async def run_in_process(args, concurrency: int) -> dict:
+    registry = build_registry(args)
+    await seed_contexts(registry.artifact_store, args.requests)
+    app = create_app(registry)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        return {endpoint: await measure(client, registry, endpoint, args.requests, concurrency) for endpoint in ENDPOINTS}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_over_http(args, concurrency: int) -> dict:
+    registry = build_registry(args)
+    await seed_contexts(registry.artifact_store, args.requests)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(registry), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+            # The server runs in this process, so process CPU covers both client and server
+            return {endpoint: await measure(client, registry, endpoint, args.requests, concurrency) for endpoint in ENDPOINTS}
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Print latency and throughput changes for every run present in both result files"""
+    before = {(run["transport"], run["concurrency"]): run["endpoints"] for run in previous["runs"]}
+    print(f"Compared with {previous['meta']['commit']} ({previous['meta']['timestamp']}):")
+    print(f"{'transport':>10} {'conc':>5} {'endpoint':>24} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8}")
+    for run in current["runs"]:
+        old_endpoints = before.get((run["transport"], run["concurrency"]))
+        if old_endpoints is None:
+            continue
+        for endpoint, new in run["endpoints"].items():
+            old = old_endpoints.get(endpoint)
+            if old is None:
+                continue
+            change = lambda key: f"{(new[key] / old[key] - 1) * 100:+.1f}%" if old[key] else "n/a"
+            print(f"{run['transport']:>10} {run['concurrency']:>5} {endpoint:>24} {change('p50_ms'):>8} "
+                  f"{change('p95_ms'):>8} {change('p99_ms'):>8} {change('throughput_rps'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["inprocess", "http", "both"], default="inprocess")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Client requests in flight")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--max-generations", type=int, default=get_settings().max_concurrent_generations,
+                        help="Scheduler concurrency cap for model calls")
+    parser.add_argument("--latency-dist", choices=["fixed", "lognormal", "heavy_tailed"], default="lognormal")
+    parser.add_argument("--median", type=float, default=0.1, help="Median stub latency in seconds")
+    parser.add_argument("--tail-probability", type=float, default=0.05, help="Share of slow calls (heavy_tailed)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of malformed free-form replies")
+    parser.add_argument("--no-structured-output", action="store_true", help="Generate free-form JSON without a schema")
+    parser.add_argument("--truncate-at", type=int, default=0, help="Cut replies longer than this many characters")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the client's output and skew the CPU numbers
+    logging.getLogger().setLevel(logging.WARNING)
+
+    transports = ["inprocess", "http"] if args.transport == "both" else [args.transport]
+    runners = {"inprocess": run_in_process, "http": run_over_http}
+    runs = []
+    for transport in transports:
+        for concurrency in args.concurrency:
+            endpoints = asyncio.run(runners[transport](args, concurrency))
+            runs.append({"transport": transport, "concurrency": concurrency, "endpoints": endpoints})
+            for endpoint, result in endpoints.items():
+                print(f"{transport:>10} c={concurrency:<4} {endpoint:<24} p50={result['p50_ms']:>8}ms "
+                      f"p95={result['p95_ms']:>8}ms p99={result['p99_ms']:>8}ms {result['throughput_rps']:>8} req/s")
+
+    results = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Where the wall-clock time of a course build went, from an exported trace file.
+
+Reads the JSON-lines spans written with TRACING_ENABLED=true and groups them
+into builds: with --course-id, the trace that generated that course plus
+every trace linked to it through a parent artifact (modules planned from the
+course, lessons from those modules, quizzes from those lessons); otherwise
+every trace in the file. For each span name it reports how often it ran, its
+total time, and its self time (excluding child spans), alongside the summed
+request time and the build's elapsed wall-clock time.
+
+Usage (from the BackEnd directory):
+    python -m benchmarks.trace_summary data/traces.jsonl --course-id course_abc123
+"""
+import argparse
+import json
+from collections import defaultdict
+
+
+def load_spans(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_traces(spans: list, course_id: str) -> set:
+    """IDs of the traces belonging to one course build, following artifact links from the course down"""
+    links = defaultdict(set)  # trace -> traces its spans link to (their parent artifacts' traces)
+    for span in spans:
+        for link in span["links"]:
+            links[span["trace_id"]].add(link.split("-")[1])
+
+    selected = {span["trace_id"] for span in spans if f"course:{course_id}" in span["attributes"].get("artifacts", [])}
+    changed = True
+    while changed:
+        changed = False
+        for trace_id, parents in links.items():
+            if trace_id not in selected and parents & selected:
+                selected.add(trace_id)
+                changed = True
+    return selected
+
+
+def summarize(spans: list) -> dict:
+    span_ids = {span["span_id"] for span in spans}
+    child_time = defaultdict(float)
+    for span in spans:
+        if span["parent_id"] in span_ids:
+            child_time[span["parent_id"]] += span["duration_ms"]
+
+    by_name = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "self_ms": 0.0, "errors": 0})
+    for span in spans:
+        entry = by_name[span["name"]]
+        entry["count"] += 1
+        entry["total_ms"] += span["duration_ms"]
+        # Children of a span can run concurrently, so their summed time may exceed the parent's
+        entry["self_ms"] += max(0.0, span["duration_ms"] - child_time[span["span_id"]])
+        entry["errors"] += span["status"] == "error"
+
+    requests = [span for span in spans if span["parent_id"] not in span_ids]
+    started = min(span["start_time"] for span in requests)
+    ended = max(span["start_time"] + span["duration_ms"] / 1000 for span in requests)
+    return {
+        "traces": len({span["trace_id"] for span in spans}),
+        "requests": len(requests),
+        "request_time_ms": round(sum(span["duration_ms"] for span in requests), 1),
+        "wall_clock_ms": round((ended - started) * 1000, 1),
+        "spans": {
+            name: {key: round(value, 1) if isinstance(value, float) else value for key, value in entry.items()}
+            for name, entry in sorted(by_name.items(), key=lambda item: -item[1]["self_ms"])
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSON-lines trace file (TRACE_PATH)")
+    parser.add_argument("--course-id", help="Only the build of this course")
+    args = parser.parse_args()
+
+    spans = load_spans(args.path)
+    if args.course_id:
+        traces = build_traces(spans, args.course_id)
+        spans = [span for span in spans if span["trace_id"] in traces]
+    if not spans:
+        raise SystemExit("No matching spans")
+    print(json.dumps(summarize(spans), indent=2))
+
+
+if __name__ == "__main__":
+    main()
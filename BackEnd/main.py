@@ -1,19 +1,43 @@
+from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.config import get_settings
-from app.api.v1.router import router as v1_router
-from app.api.v2.router import router as v2_router
+from app.logging_config import configure_logging
+from app.services.metrics import MetricsMiddleware
+from app.services.registry import ServiceRegistry
+from app.services.tracing import TracingMiddleware, get_tracer
 
-def create_app() -> FastAPI:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up shared resources at startup and release them at shutdown"""
+    # Resume background jobs left unfinished by the previous run (their handlers live in the v2 API)
+    if get_settings().api_v2_enabled:
+        app.state.services.job_queue.start()
+    yield
+    await app.state.services.close()
+
+def create_app(services: Optional[ServiceRegistry] = None) -> FastAPI:
     """Create and configure the FastAPI application"""
     settings = get_settings()
+    configure_logging()
     
     app = FastAPI(
         title="TuteAI Course Generator API",
         description="AI-powered course generation system",
-        version="2.0.0"
+        version="2.0.0",
+        lifespan=lifespan
     )
+    # A registry passed in (e.g. one built around a stub model) is used as is.
+    # Services inside it are built on first use, so startup stays fast.
+    app.state.services = services if services is not None else ServiceRegistry.create()
+    
+    # Per-route latency and in-flight requests for /api/v2/metrics
+    app.add_middleware(MetricsMiddleware, metrics=app.state.services.metrics)
+    
+    # One server span per request, continuing the caller's W3C traceparent (no-op unless TRACING_ENABLED)
+    app.add_middleware(TracingMiddleware, tracer=get_tracer())
     
     # Set up CORS
     app.add_middleware(
@@ -24,22 +48,26 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Each API version can be switched off; routers are imported only when enabled
+    versions = {}
+    if settings.api_v1_enabled:
+        from app.api.v1.router import router as v1_router
+        app.include_router(v1_router)
+        versions["v1"] = "stable"
+    if settings.api_v2_enabled:
+        from app.api.v2.router import router as v2_router
+        app.include_router(v2_router)
+        versions["v2"] = "beta"
+    
     # Version check endpoint
     @app.get("/api/versions")
     async def api_versions():
         return {
-            "versions": ["v1", "v2"],
-            "current": "v2",
-            "status": {
-                "v1": "stable",
-                "v2": "beta"
-            }
+            "versions": list(versions),
+            "current": "v2" if "v2" in versions else "v1",
+            "status": versions
         }
     
-    # Register API routers
-    app.include_router(v1_router)
-    app.include_router(v2_router)
-    
     # Mount static files
     app.mount("/", StaticFiles(directory="static", html=True), name="static")
     
@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.services.artifact_store import CachedArtifactStore, MemoryArtifactStore, SQLiteArtifactStore
+
+
+def test_sqlite_store_round_trips_records(tmp_path):
+    store = SQLiteArtifactStore(str(tmp_path / "artifacts.sqlite3"))
+
+    async def run():
+        await store.put("course", "c1", {"course_title": "Course"}, {"modules": []})
+        await store.put("module", "m1", {"module_title": "One"}, parent_id="c1")
+        await store.put("module", "m2", {"module_title": "Two"}, parent_id="c1")
+        return await store.get("course", "c1"), await store.list_children("module", "c1"), await store.get("course", "x")
+
+    course, modules, missing = asyncio.run(run())
+
+    assert course["context"] == {"course_title": "Course"} and course["artifact"] == {"modules": []}
+    assert [module["id"] for module in modules] == ["m1", "m2"]
+    assert modules[0]["artifact"] is None and modules[0]["parent_id"] == "c1"
+    assert missing is None
+    asyncio.run(store.close())
+
+
+def test_records_are_shared_through_the_database_file(tmp_path):
+    # Two stores on one file stand in for two worker processes
+    path = str(tmp_path / "artifacts.sqlite3")
+    writer, reader = SQLiteArtifactStore(path), SQLiteArtifactStore(path)
+
+    async def run():
+        await writer.put("lesson", "l1", {"lesson_title": "First"})
+        first = await reader.get("lesson", "l1")
+        await writer.put("lesson", "l1", {"lesson_title": "Regenerated"})
+        return first, await reader.get("lesson", "l1")
+
+    first, replaced = asyncio.run(run())
+
+    assert first["context"]["lesson_title"] == "First"
+    assert replaced["context"]["lesson_title"] == "Regenerated"
+    asyncio.run(writer.close())
+    asyncio.run(reader.close())
+
+
+def test_close_closes_every_thread_connection(tmp_path):
+    store = SQLiteArtifactStore(str(tmp_path / "artifacts.sqlite3"))
+
+    async def run():
+        # Concurrent queries run on several worker threads, each with its own connection
+        await asyncio.gather(*[store.put("quiz", f"q{i}", {}) for i in range(8)])
+        await asyncio.gather(*[store.get("quiz", f"q{i}") for i in range(8)])
+        connections = list(store._connections)
+        await store.close()
+        return connections
+
+    connections = asyncio.run(run())
+
+    assert len(connections) > 1
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    assert store._connections == []
+
+
+def test_cached_store_serves_reads_and_drops_replaced_records():
+    backend = MemoryArtifactStore()
+    store = CachedArtifactStore(backend, max_entries=2)
+
+    async def run():
+        await store.put("course", "c1", {"v": 1})
+        await store.get("course", "c1")
+        cached = await store.get("course", "c1")
+        await store.put("course", "c1", {"v": 2})
+        return cached, await store.get("course", "c1")
+
+    cached, replaced = asyncio.run(run())
+
+    assert cached["context"] == {"v": 1}
+    assert replaced["context"] == {"v": 2}
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 2
+
+
+def test_cached_store_is_bounded():
+    store = CachedArtifactStore(MemoryArtifactStore(), max_entries=2)
+
+    async def run():
+        for i in range(3):
+            await store.put("lesson", f"l{i}", {})
+            await store.get("lesson", f"l{i}")
+
+    asyncio.run(run())
+
+    assert store.stats()["entries"] == 2
@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import httpx
+from google.api_core import exceptions as google_exceptions
+
+from app.api.v2.endpoints.lessons import _batch_events
+from app.models.v2.lesson import QuizResponse
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.registry import ServiceRegistry
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+from main import create_app
+
+
+class ScriptedModel(StubModel):
+    """Slows down or rejects the prompts that mention a given lesson title"""
+
+    def __init__(self, slow: str = None, rejected: str = None):
+        super().__init__(latency=0, payload=sample_payloads.payload_for_prompt)
+        self.slow = slow
+        self.rejected = rejected
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        if self.slow and self.slow in prompt:
+            await asyncio.sleep(0.1)
+        if self.rejected and self.rejected in prompt:
+            self.calls += 1
+            raise google_exceptions.InvalidArgument("Prompt rejected")
+        return await super().generate_content_async(prompt, generation_config, stream, **kwargs)
+
+
+def lesson(title: str) -> dict:
+    return {"module_id": "mod_1", "lesson_title": title, "lesson_objective": "Learn it"}
+
+
+def post_batch(model: StubModel, path: str, body: dict) -> httpx.Response:
+    registry = ServiceRegistry.create(model=model, artifact_store=MemoryArtifactStore())
+    app = create_app(registry)
+
+    async def post() -> httpx.Response:
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.post(f"{path}?cache=bypass", json=body)
+        finally:
+            await registry.close()
+
+    return asyncio.run(post())
+
+
+def test_lesson_batch_isolates_failed_items():
+    model = ScriptedModel(rejected="Broken lesson")
+    body = {"requests": [lesson("First lesson"), lesson("Broken lesson"), lesson("Third lesson")]}
+
+    response = post_batch(model, "/api/v2/create-lesson-content/batch", body)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    *results, done = [json.loads(line) for line in response.text.splitlines()]
+    by_index = {result["index"]: result for result in results}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[1]["status"] == "failed" and by_index[1]["error"]["status_code"] == 500
+    assert "data" not in by_index[1]
+    assert all(by_index[i]["status"] == "succeeded" and by_index[i]["data"]["lesson_id"] for i in (0, 2))
+    assert done == {"event": "done", "data": {"succeeded": 2, "failed": 1}}
+
+
+def test_batch_results_arrive_in_completion_order():
+    model = ScriptedModel(slow="Slow lesson")
+    body = {"requests": [lesson("Slow lesson"), lesson("Quick lesson")]}
+
+    response = post_batch(model, "/api/v2/create-lesson-content/batch", body)
+
+    indexes = [json.loads(line).get("index") for line in response.text.splitlines()]
+    assert indexes == [1, 0, None]
+
+
+def test_quiz_batch_returns_a_quiz_per_item():
+    body = {"requests": [{"lesson_id": f"les_{i}", "num_questions": 5} for i in range(3)]}
+
+    response = post_batch(ScriptedModel(), "/api/v2/create-quiz/batch", body)
+
+    *results, done = [json.loads(line) for line in response.text.splitlines()]
+    assert done["data"] == {"succeeded": 3, "failed": 0}
+    for result in results:
+        QuizResponse.model_validate(result["data"])
+
+
+def test_oversized_batch_is_rejected():
+    body = {"requests": [lesson(f"Lesson {i}") for i in range(51)]}
+
+    response = post_batch(ScriptedModel(), "/api/v2/create-lesson-content/batch", body)
+
+    assert response.status_code == 422
+
+
+def test_closing_the_stream_cancels_unfinished_items():
+    cancelled = []
+
+    def job(delay: float):
+        async def run():
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return QuizResponse.model_construct()
+        return run
+
+    async def read_first_line():
+        events = _batch_events("quiz", [job(0), job(1), job(2)])
+        first = await events.__anext__()
+        # The client disconnects after the first result
+        await events.aclose()
+        await asyncio.sleep(0)
+        return json.loads(first)
+
+    first = asyncio.run(read_first_line())
+
+    assert first["index"] == 0 and first["status"] == "succeeded"
+    assert sorted(cancelled) == [1, 2]
@@ -0,0 +1,167 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+from app.api.v2.endpoints.pipeline import build_course
+from app.services import context_cache
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.context_cache import ContextCache, Prompt, track_prompt_usage
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler, Priority
+from app.services.single_flight import SingleFlight
+from benchmarks import sample_payloads
+from benchmarks.prefix_cache import course_request
+from benchmarks.stub_model import StubCachedModel, StubModel
+
+SHARED_PREFIX = "Instructions for every task. " * 40
+PROMPT = Prompt("Instructions for this task. ", "Write lesson 1.", shared_prefix=SHARED_PREFIX)
+
+
+def caching_model(**kwargs) -> StubModel:
+    return StubModel(latency=0, context_caching=True, **kwargs)
+
+
+def test_concurrent_calls_share_one_upload():
+    model = caching_model()
+    cache = ContextCache(min_prefix_tokens=100)
+
+    async def resolve_all():
+        return await asyncio.gather(*[cache.resolve(model, "stub", PROMPT) for _ in range(10)])
+
+    resolved = asyncio.run(resolve_all())
+
+    assert list(model.prefix_caches) == [SHARED_PREFIX]
+    assert model.input_chars == len(SHARED_PREFIX)
+    assert cache.stats()["created"] == 1
+    assert len({id(bound) for bound, _ in resolved}) == 1
+
+
+def test_calls_after_the_upload_send_only_the_suffix():
+    model = caching_model()
+    cache = ContextCache(min_prefix_tokens=100)
+
+    async def call():
+        bound, contents = await cache.resolve(model, "stub", PROMPT)
+        await bound.generate_content_async(contents)
+        return bound, contents
+
+    with track_prompt_usage() as usage:
+        asyncio.run(call())
+        bound, contents = asyncio.run(call())
+
+    assert isinstance(bound, StubCachedModel)
+    assert contents == PROMPT.suffix
+    assert model.input_chars == len(SHARED_PREFIX) + 2 * len(PROMPT.suffix)
+    assert model.prefix_caches[SHARED_PREFIX] == 2
+    stats = usage.stats()
+    assert stats["cached_prefix_calls"] == 2
+    assert stats["prefix_upload_tokens"] == len(SHARED_PREFIX) // 4
+
+
+def test_short_prefix_is_sent_plain():
+    model = caching_model()
+    cache = ContextCache(min_prefix_tokens=len(SHARED_PREFIX))
+
+    bound, contents = asyncio.run(cache.resolve(model, "stub", PROMPT))
+
+    assert bound is model and contents is PROMPT
+    assert model.prefix_caches == {} and model.input_chars == 0
+
+
+def test_refused_prefix_backs_off_for_one_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(context_cache.time, "monotonic", lambda: now[0])
+    model = caching_model(min_cached_prefix_chars=len(SHARED_PREFIX) + 1)
+    cache = ContextCache(ttl_seconds=600, min_prefix_tokens=100)
+
+    bound, contents = asyncio.run(cache.resolve(model, "stub", PROMPT))
+    assert bound is model and contents is PROMPT
+    assert cache.stats()["refused"] == 1
+    assert not cache.supports(model)
+
+    # Within the TTL the provider is not asked again
+    model.min_cached_prefix_chars = 0
+    now[0] += 599
+    bound, _ = asyncio.run(cache.resolve(model, "stub", PROMPT))
+    assert bound is model and model.prefix_caches == {}
+
+    # Afterwards it is
+    now[0] += 2
+    assert cache.supports(model)
+    bound, contents = asyncio.run(cache.resolve(model, "stub", PROMPT))
+    assert isinstance(bound, StubCachedModel) and contents == PROMPT.suffix
+
+
+def test_rejected_admission_is_not_a_refusal():
+    model = caching_model()
+    cache = ContextCache(min_prefix_tokens=100)
+
+    @asynccontextmanager
+    async def queue_full(tokens):
+        raise HTTPException(status_code=429, detail="Generation queue is full")
+        yield
+
+    bound, contents = asyncio.run(cache.resolve(model, "stub", PROMPT, admission=queue_full))
+
+    assert bound is model and contents is PROMPT
+    assert cache.stats()["refused"] == 0
+    assert cache.supports(model)
+    bound, contents = asyncio.run(cache.resolve(model, "stub", PROMPT))
+    assert isinstance(bound, StubCachedModel) and contents == PROMPT.suffix
+
+
+def build(context_caching: bool):
+    model = StubModel(latency=0, payload=sample_payloads.payload_for_prompt, context_caching=context_caching)
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=4),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience(),
+        context_cache=ContextCache(min_prefix_tokens=1024)
+    )
+    result = asyncio.run(build_course(
+        course_request(0), include_quizzes=True, num_questions=5, priority=Priority.BATCH,
+        cache=CacheMode.BYPASS, ai_service=service, artifact_store=MemoryArtifactStore()
+    ))
+    return model, result.metadata["prompt_usage"]
+
+
+def test_course_build_sends_fewer_input_tokens_with_a_cached_prefix():
+    plain_model, plain = build(context_caching=False)
+    cached_model, cached = build(context_caching=True)
+
+    assert cached["model_calls"] == plain["model_calls"]
+    assert plain["cached_prefix_calls"] == 0 and plain["input_token_savings"] == 0
+    # One upload of the course-wide prefix, reused by every later task
+    assert len(cached_model.prefix_caches) == 1
+    assert cached["cached_prefix_calls"] == sum(cached_model.prefix_caches.values())
+    # The reported savings match what the model actually received
+    measured = 1 - cached_model.input_chars / plain_model.input_chars
+    assert measured > 0.5
+    assert abs(cached["input_token_savings"] - measured) < 0.01
+
+
+def test_cached_prefixes_are_bounded_and_renewed_before_they_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(context_cache.time, "monotonic", lambda: now[0])
+    model = caching_model()
+    cache = ContextCache(ttl_seconds=600, min_prefix_tokens=100, max_entries=2)
+    prompts = [Prompt("", "Task.", shared_prefix=f"Course {i}. " + SHARED_PREFIX) for i in range(3)]
+
+    async def resolve(prompt):
+        return await cache.resolve(model, "stub", prompt)
+
+    for prompt in prompts:
+        asyncio.run(resolve(prompt))
+    assert cache.stats()["entries"] == 2
+    # The oldest prefix was dropped locally, so the next call uploads it again
+    asyncio.run(resolve(prompts[0]))
+    assert cache.stats()["created"] == 4
+
+    # Entries are replaced shortly before the provider's copy expires
+    now[0] += 600 - 60
+    asyncio.run(resolve(prompts[0]))
+    assert cache.stats()["created"] == 5
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+from app.models.v2.lesson import LessonResponse
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.continuation import MIN_OVERLAP, ContinuationStats, stitch
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.parse_stats import ParseStats
+from app.services.single_flight import SingleFlight
+from app.utils.response_schema import generation_model
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+
+DOCUMENT = json.dumps(sample_payloads.LESSON)
+
+
+def make_service(model: StubModel, max_continuations: int = 3) -> AIServiceV2:
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=4),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience()
+    )
+    service.max_continuations = max_continuations
+    service.continuation_stats = ContinuationStats()
+    service.parse_stats = ParseStats()
+    return service
+
+
+def test_stitch_without_overlap():
+    assert stitch(DOCUMENT[:500], DOCUMENT[500:]) == DOCUMENT
+
+
+def test_stitch_drops_repeated_overlap():
+    assert stitch(DOCUMENT[:500], DOCUMENT[400:]) == DOCUMENT
+
+
+def test_stitch_keeps_overlap_shorter_than_minimum():
+    # A few repeated characters may be real content, so they are kept
+    partial, continuation = "abcdefgh", "efgh" + "x" * 40
+    assert len("efgh") < MIN_OVERLAP
+    assert stitch(partial, continuation) == partial + continuation
+
+
+def test_stitch_strips_fence_opened_by_continuation():
+    assert stitch(DOCUMENT[:500], "```json\n" + DOCUMENT[500:]) == DOCUMENT
+
+
+def test_stitch_keeps_fence_when_partial_is_fenced():
+    partial = "```json\n" + DOCUMENT[:500]
+    continuation = DOCUMENT[500:] + "\n```"
+    assert stitch(partial, continuation) == "```json\n" + DOCUMENT + "\n```"
+
+
+def test_truncated_reply_is_continued_into_the_original_document():
+    model = StubModel(latency=0, payload=sample_payloads.LESSON, max_output_chars=len(DOCUMENT) // 3,
+                      continuation_overlap=64)
+    service = make_service(model)
+
+    text = asyncio.run(service.generate_ai_content("lesson prompt", cache_mode=CacheMode.BYPASS))
+
+    assert text == DOCUMENT
+    stats = service.continuation_stats.stats()
+    assert stats["truncated"] == 1
+    assert stats["completed"] == 1
+    assert stats["gave_up"] == 0
+    assert model.calls == 1 + stats["continuations"]
+
+
+def test_validated_lesson_survives_truncation():
+    model = StubModel(latency=0, payload=sample_payloads.LESSON, max_output_chars=len(DOCUMENT) // 4,
+                      continuation_overlap=32)
+    service = make_service(model, max_continuations=5)
+
+    lesson = asyncio.run(service.generate_validated("lesson prompt", LessonResponse, cache_mode=CacheMode.BYPASS))
+
+    assert lesson == generation_model(LessonResponse).model_validate(sample_payloads.LESSON)
+    assert service.continuation_stats.gave_up == 0
+    assert service.parse_stats.stats()["LessonResponse"]["schema"]["repaired"] == 0
+
+
+def test_gave_up_is_counted_when_continuations_run_out():
+    model = StubModel(latency=0, payload=sample_payloads.LESSON, max_output_chars=len(DOCUMENT) // 10)
+    service = make_service(model, max_continuations=2)
+
+    text = asyncio.run(service.generate_ai_content("lesson prompt", cache_mode=CacheMode.BYPASS))
+
+    assert DOCUMENT.startswith(text) and len(text) < len(DOCUMENT)
+    stats = service.continuation_stats.stats()
+    assert stats["continuations"] == 2
+    assert stats["gave_up"] == 1
+    assert stats["completed"] == 0
@@ -0,0 +1,133 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.course_export import (CourseExporter, ExportFormat, _pdf_text, course_documents, load_course,
+                                        unsupported_pdf_characters)
+from app.services.registry import ServiceRegistry
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+from main import create_app
+
+
+async def seed(store: MemoryArtifactStore, lesson_title: str = "Lesson one") -> None:
+    await store.put("course", "c1", {}, {**sample_payloads.COURSE, "course_title": "Course one"})
+    await store.put("module", "m1", {"module_title": "Module one"}, sample_payloads.MODULE, parent_id="c1")
+    await store.put("lesson", "l1", {}, {**sample_payloads.LESSON, "lesson_title": lesson_title}, parent_id="m1")
+    await store.put("quiz", "q1", {}, sample_payloads.QUIZ, parent_id="l1")
+
+
+def export_text(exporter: CourseExporter, snapshot, export_format: ExportFormat = ExportFormat.MARKDOWN) -> str:
+    async def collect():
+        digest = exporter.content_hash(snapshot, export_format)
+        return b"".join([chunk async for chunk in exporter.export(snapshot, export_format, digest)])
+    return asyncio.run(collect()).decode("utf-8")
+
+
+def test_snapshot_lists_the_tree_in_export_order():
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store))
+
+    snapshot = asyncio.run(load_course(store, "c1"))
+
+    assert [kind for kind, _ in snapshot] == ["course", "module", "lesson", "quiz"]
+    assert asyncio.run(load_course(store, "missing")) is None
+    # The course and module outlines are replaced by the generated modules and lessons
+    documents = list(course_documents(snapshot))
+    assert len(documents) == 3
+    assert ("h1", "Course outline") not in documents[0]
+
+
+def test_export_matches_the_snapshot_it_was_hashed_from(tmp_path):
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store))
+    exporter = CourseExporter(store, pool=None, cache_dir=str(tmp_path))
+    snapshot = asyncio.run(exporter.load("c1"))
+    digest = exporter.content_hash(snapshot, ExportFormat.MARKDOWN)
+
+    # The lesson is regenerated after the snapshot was taken
+    asyncio.run(seed(store, lesson_title="Lesson one, regenerated"))
+    text = export_text(exporter, snapshot)
+
+    assert "Lesson one" in text and "regenerated" not in text
+    assert (tmp_path / f"{digest}.md").read_text() == text
+    fresh = asyncio.run(exporter.load("c1"))
+    assert exporter.content_hash(fresh, ExportFormat.MARKDOWN) != digest
+    assert "regenerated" in export_text(exporter, fresh)
+
+
+def test_content_hash_depends_on_the_format():
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store))
+    snapshot = asyncio.run(load_course(store, "c1"))
+
+    assert CourseExporter.content_hash(snapshot, ExportFormat.MARKDOWN) == \
+        CourseExporter.content_hash(snapshot, ExportFormat.MARKDOWN)
+    assert CourseExporter.content_hash(snapshot, ExportFormat.MARKDOWN) != \
+        CourseExporter.content_hash(snapshot, ExportFormat.HTML)
+
+
+def test_pdf_text_maps_typographic_punctuation_and_rejects_the_rest():
+    assert _pdf_text("“Café” – naïve…") == '"Café" - naïve...'
+    with pytest.raises(UnicodeEncodeError):
+        _pdf_text("机器学习")
+
+
+def test_pdf_export_of_non_latin_text_is_rejected():
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store, lesson_title="机器学习入门"))
+    snapshot = asyncio.run(load_course(store, "c1"))
+    assert unsupported_pdf_characters(snapshot) == list("机器学习入门")
+
+    registry = ServiceRegistry.create(model=StubModel(latency=0), artifact_store=store)
+    app = create_app(registry)
+
+    async def export() -> httpx.Response:
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await client.get("/api/v2/export-course/c1?format=pdf")
+        finally:
+            await registry.close()
+
+    response = asyncio.run(export())
+
+    assert response.status_code == 422
+    assert "机器学习入门" in response.json()["detail"]
+
+
+def test_export_cache_keeps_only_the_newest_files(tmp_path):
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store))
+    exporter = CourseExporter(store, pool=None, cache_dir=str(tmp_path), max_cached_files=2)
+    snapshot = asyncio.run(exporter.load("c1"))
+
+    markdown = exporter.content_hash(snapshot, ExportFormat.MARKDOWN)
+    html = exporter.content_hash(snapshot, ExportFormat.HTML)
+    export_text(exporter, snapshot, ExportFormat.MARKDOWN)
+    export_text(exporter, snapshot, ExportFormat.HTML)
+    asyncio.run(seed(store, lesson_title="Lesson two"))
+    fresh = asyncio.run(exporter.load("c1"))
+    export_text(exporter, fresh)
+
+    # The third rendering evicts the oldest file
+    assert len(list(tmp_path.iterdir())) == 2
+    assert not exporter.is_cached(markdown, ExportFormat.MARKDOWN)
+    assert exporter.is_cached(html, ExportFormat.HTML)
+    assert exporter.is_cached(exporter.content_hash(fresh, ExportFormat.MARKDOWN), ExportFormat.MARKDOWN)
+
+
+def test_cached_export_is_served_without_rendering(tmp_path, monkeypatch):
+    store = MemoryArtifactStore()
+    asyncio.run(seed(store))
+    exporter = CourseExporter(store, pool=None, cache_dir=str(tmp_path))
+    snapshot = asyncio.run(exporter.load("c1"))
+    first = export_text(exporter, snapshot)
+
+    def render(*args):
+        raise AssertionError("the cached export should have been served")
+
+    monkeypatch.setattr(exporter, "render", render)
+
+    assert export_text(exporter, snapshot) == first
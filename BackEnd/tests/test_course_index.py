@@ -0,0 +1,74 @@
+import asyncio
+
+from app.models.v2.course import AssessmentType, CourseRequest
+from app.services.course_index import CourseSimilarityIndex
+
+
+def course_request(**overrides) -> CourseRequest:
+    fields = {
+        "title": "Applied Machine Learning",
+        "description": "A practical course on supervised learning, model evaluation and feature engineering.",
+        "target_audience": "data analysts",
+        "time_available": "4 weeks",
+        "learning_objectives": ["Train a regression model", "Evaluate classifiers", "Engineer features"],
+        "industry_focus": "Finance",
+        "assessment_preference": AssessmentType.QUIZ,
+        "skills_to_develop": ["Python programming", "Model debugging", "Data cleaning"],
+    }
+    fields.update(overrides)
+    return CourseRequest(**fields)
+
+
+def indexed(request: CourseRequest) -> CourseSimilarityIndex:
+    index = CourseSimilarityIndex(threshold=0.8)
+    asyncio.run(index.add("course_1", request))
+    return index
+
+
+def test_reworded_request_is_matched():
+    index = indexed(course_request())
+
+    match = index.find(course_request(title="applied machine-learning", industry_focus="  finance "))
+
+    assert match is not None and match[0] == "course_1"
+
+
+def test_different_industry_is_not_matched():
+    index = indexed(course_request())
+
+    assert index.find(course_request(industry_focus="Healthcare")) is None
+    assert index.find(course_request(industry_focus=None)) is None
+
+
+def test_different_assessment_preference_is_not_matched():
+    index = indexed(course_request())
+
+    assert index.find(course_request(assessment_preference=AssessmentType.PROJECT)) is None
+
+
+def test_different_skills_are_not_matched():
+    index = indexed(course_request())
+
+    match = index.find(course_request(skills_to_develop=["Ethical reasoning", "Stakeholder communication",
+                                                         "Regulatory compliance"]))
+
+    assert match is None
+
+
+def test_signatures_persist_across_restarts_and_close(tmp_path):
+    path = str(tmp_path / "course_index.sqlite3")
+    index = CourseSimilarityIndex(path, threshold=0.8)
+
+    async def fill():
+        await index.add("course_1", course_request())
+        await index.add("course_2", course_request(title="Marine Biology Basics", industry_focus="Education"))
+        await index.remove("course_2")
+        await index.close()
+
+    asyncio.run(fill())
+
+    assert index._connections == []
+    reloaded = CourseSimilarityIndex(path, threshold=0.8)
+    assert len(reloaded) == 1
+    assert reloaded.find(course_request())[0] == "course_1"
+    asyncio.run(reloaded.close())
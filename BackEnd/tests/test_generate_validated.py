@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.v2.lesson import QuizResponse
+from app.services import ai_service_v2
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode, GenerationCache
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.parse_stats import ParseStats
+from app.services.single_flight import SingleFlight
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+
+QUIZ = json.dumps(sample_payloads.QUIZ)
+FENCED = f"Here is your quiz:\n```json\n{QUIZ[:-1]},}}\n```"
+MISSING_FIELD = json.dumps({key: value for key, value in sample_payloads.QUIZ.items() if key != "questions"})
+
+
+class ScriptedModel(StubModel):
+    """Replies with the given texts in order and records the generation configs it was sent"""
+
+    def __init__(self, *replies: str):
+        super().__init__(latency=0)
+        self.replies = list(replies)
+        self.configs = []
+
+    def _render(self, prompt, generation_config) -> str:
+        self.configs.append(generation_config)
+        return self.replies.pop(0)
+
+
+def make_service(model: StubModel, structured_output: bool = True) -> AIServiceV2:
+    service = AIServiceV2(model=model, cache=GenerationCache(), scheduler=LLMScheduler(max_concurrency=4),
+                          single_flight=SingleFlight(), resilience=LLMResilience(), parse_stats=ParseStats())
+    service.max_attempts = 1
+    service.structured_output = structured_output
+    return service
+
+
+def generate(service: AIServiceV2, cache_mode: CacheMode = CacheMode.BYPASS):
+    return asyncio.run(service.generate_validated("Write a quiz.", QuizResponse, cache_mode=cache_mode))
+
+
+def test_schema_is_sent_and_valid_output_parses_once(monkeypatch):
+    parses = []
+    parse_generated = ai_service_v2._parse_generated
+    monkeypatch.setattr(ai_service_v2, "_parse_generated",
+                        lambda model, text: parses.append(text) or parse_generated(model, text))
+    model = ScriptedModel(QUIZ)
+    service = make_service(model)
+
+    quiz = generate(service, CacheMode.USE)
+
+    assert len(quiz.questions) == len(sample_payloads.QUIZ["questions"])
+    assert model.configs[0]["response_schema"] == service.schema_for(QuizResponse)
+    # The cache's validity check and the caller share one parse
+    assert parses == [QUIZ]
+    assert service.cache.stats()["stores"] == 1
+    assert service.parse_stats.stats()["QuizResponse"]["schema"]["parsed"] == 1
+
+
+def test_free_form_output_is_repaired_without_regenerating():
+    model = ScriptedModel(FENCED)
+    service = make_service(model, structured_output=False)
+
+    quiz = generate(service)
+
+    assert quiz.passing_score == sample_payloads.QUIZ["passing_score"]
+    assert "response_schema" not in model.configs[0]
+    assert model.calls == 1
+    counters = service.parse_stats.stats()["QuizResponse"]["free_form"]
+    assert counters["repaired"] == 1 and counters["regenerations"] == 0
+
+
+def test_invalid_output_is_regenerated_once():
+    model = ScriptedModel(MISSING_FIELD, QUIZ)
+    service = make_service(model, structured_output=False)
+
+    generate(service, CacheMode.USE)
+
+    assert model.calls == 2
+    counters = service.parse_stats.stats()["QuizResponse"]["free_form"]
+    assert counters == {**counters, "parsed": 1, "failures": 1, "regenerations": 1}
+    # The invalid reply is never cached, so resubmitting would not replay it
+    assert service.cache.stats()["stores"] == 0
+
+
+def test_second_invalid_output_fails_the_request():
+    model = ScriptedModel(MISSING_FIELD, "I cannot write that quiz.")
+    service = make_service(model, structured_output=False)
+
+    with pytest.raises(HTTPException) as failed:
+        generate(service)
+
+    assert failed.value.status_code == 500
+    assert model.calls == 2
+    assert service.parse_stats.stats()["QuizResponse"]["free_form"]["failures"] == 2
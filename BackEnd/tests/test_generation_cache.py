@@ -0,0 +1,195 @@
+import asyncio
+import os
+import time
+import types
+
+import pytest
+
+from app.services import generation_cache
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode, GenerationCache
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+
+class TruncatingModel(StubModel):
+    """Always replies with JSON cut short"""
+
+    def _render(self, prompt, generation_config) -> str:
+        return super()._render(prompt, generation_config)[:-1]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the cache's wall clock with one the test moves by hand"""
+    now = {"value": time.time()}
+    fake = types.SimpleNamespace(time=lambda: now["value"], monotonic=time.monotonic)
+    monkeypatch.setattr(generation_cache, "time", fake)
+    return now
+
+
+def touch(path: str, age: float) -> None:
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def make_service(model: StubModel, cache: GenerationCache) -> AIServiceV2:
+    service = AIServiceV2(model=model, cache=cache, scheduler=LLMScheduler(max_concurrency=4),
+                          single_flight=SingleFlight(), resilience=LLMResilience())
+    service.max_attempts = 1
+    return service
+
+
+def disk_files(cache: GenerationCache):
+    return sorted(name for _, _, names in os.walk(cache.disk_dir) for name in names if name.endswith(".json"))
+
+
+def test_key_ignores_whitespace_but_not_config():
+    key = GenerationCache.make_key("Explain  caching\n please", "model", {"temperature": 0.2})
+
+    assert key == GenerationCache.make_key("Explain caching please", "model", {"temperature": 0.2})
+    assert key != GenerationCache.make_key("Explain caching please", "model", {"temperature": 0.7})
+    assert key != GenerationCache.make_key("Explain caching please", "other", {"temperature": 0.2})
+
+
+def test_disk_tier_serves_after_a_memory_miss(tmp_path):
+    cache = GenerationCache(disk_dir=str(tmp_path))
+
+    async def run():
+        await cache.set("ab01", "cached text")
+        cache.clear()
+        first = await cache.get("ab01")
+        second = await cache.get("ab01")
+        return first, second
+
+    assert asyncio.run(run()) == ("cached text", "cached text")
+    stats = cache.stats()
+    # The disk hit promotes the entry, so the second lookup is served from memory
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1 and stats["misses"] == 0
+
+
+def test_disk_tier_survives_a_new_cache_instance(tmp_path):
+    asyncio.run(GenerationCache(disk_dir=str(tmp_path)).set("cd02", "persisted"))
+
+    assert asyncio.run(GenerationCache(disk_dir=str(tmp_path)).get("cd02")) == "persisted"
+
+
+def test_expired_entries_miss_in_both_tiers(tmp_path, clock):
+    cache = GenerationCache(ttl_seconds=60, disk_dir=str(tmp_path))
+    asyncio.run(cache.set("ef03", "stale soon"))
+
+    clock["value"] += 61
+    value = asyncio.run(cache.get("ef03"))
+
+    assert value is None
+    stats = cache.stats()
+    assert stats["expirations"] == 2 and stats["misses"] == 1
+    assert disk_files(cache) == []
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = GenerationCache(max_entries=2)
+
+    async def run():
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")
+        await cache.set("c", "3")
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == ["1", None, "3"]
+    assert cache.stats()["evictions"] == 1 and cache.stats()["memory_entries"] == 2
+
+
+def test_disk_sweep_keeps_the_newest_files_within_bounds(tmp_path):
+    cache = GenerationCache(disk_dir=str(tmp_path), disk_max_files=2, disk_sweep_interval=3600)
+
+    async def run():
+        for i, key in enumerate(("aa01", "bb02", "cc03", "dd04")):
+            await cache.set(key, "x")
+            # Spread the write times so the sweep has an unambiguous order
+            touch(cache._disk_path(key), 100 - i)
+
+    asyncio.run(run())
+    cache._sweep_disk()
+
+    assert disk_files(cache) == ["cc03.json", "dd04.json"]
+    assert cache.stats()["disk_evictions"] == 2
+
+
+def test_disk_sweep_enforces_the_byte_budget(tmp_path):
+    cache = GenerationCache(disk_dir=str(tmp_path), disk_sweep_interval=3600)
+
+    async def run():
+        for i, key in enumerate(("aa01", "bb02", "cc03")):
+            await cache.set(key, "x" * 100)
+            touch(cache._disk_path(key), 100 - i)
+
+    asyncio.run(run())
+    cache.disk_max_bytes = os.path.getsize(cache._disk_path("cc03")) + 1
+    cache._sweep_disk()
+
+    assert disk_files(cache) == ["cc03.json"]
+
+
+def test_disk_sweep_removes_expired_files_and_stale_temp_files(tmp_path):
+    cache = GenerationCache(ttl_seconds=60, disk_dir=str(tmp_path), disk_sweep_interval=3600)
+    asyncio.run(cache.set("aa01", "old"))
+    asyncio.run(cache.set("bb02", "new"))
+    touch(cache._disk_path("aa01"), 7200)
+    stale_tmp = cache._disk_path("bb02") + ".1.dead.tmp"
+    open(stale_tmp, "w").close()
+    touch(stale_tmp, 7200)
+
+    cache._sweep_disk()
+
+    assert disk_files(cache) == ["bb02.json"]
+    assert not os.path.exists(stale_tmp)
+    assert cache.stats()["expirations"] == 1
+
+
+def test_set_sweeps_once_the_interval_has_passed(tmp_path):
+    cache = GenerationCache(disk_dir=str(tmp_path), disk_max_files=1, disk_sweep_interval=0)
+
+    async def run():
+        for i, key in enumerate(("aa01", "bb02")):
+            await cache.set(key, "x")
+            touch(cache._disk_path(key), 100 - i)
+        await cache.set("cc03", "x")
+
+    asyncio.run(run())
+
+    assert disk_files(cache) == ["cc03.json"]
+
+
+def test_service_serves_repeats_from_the_cache_until_refreshed():
+    model = StubModel(latency=0, payload={"answer": 42})
+    cache = GenerationCache()
+    service = make_service(model, cache)
+
+    async def run():
+        for mode in (CacheMode.USE, CacheMode.USE, CacheMode.BYPASS, CacheMode.REFRESH, CacheMode.USE):
+            await service.generate_ai_content("What is the answer?", cache_mode=mode)
+
+    asyncio.run(run())
+
+    assert model.calls == 3
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["bypasses"] == 1 and stats["refreshes"] == 1
+
+
+def test_service_does_not_cache_malformed_output():
+    model = TruncatingModel(latency=0)
+    cache = GenerationCache()
+    service = make_service(model, cache)
+
+    async def run():
+        for _ in range(2):
+            await service.generate_ai_content("Broken reply please")
+
+    asyncio.run(run())
+
+    assert model.calls == 2
+    assert cache.stats()["stores"] == 0
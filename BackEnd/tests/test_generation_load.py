@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import CircuitBreaker, CircuitOpenError, CircuitState, LLMCallError, LLMResilience
+from app.services.llm_scheduler import LLMScheduler, Priority, SchedulerRejected
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+LATENCY = 0.1
+
+
+def make_service(model: StubModel, scheduler: LLMScheduler = None, resilience: LLMResilience = None) -> AIServiceV2:
+    service = AIServiceV2(
+        model=model,
+        scheduler=scheduler or LLMScheduler(max_concurrency=4),
+        single_flight=SingleFlight(),
+        resilience=resilience or LLMResilience()
+    )
+    service.max_attempts = 1
+    return service
+
+
+async def generate_all(service: AIServiceV2, prompts) -> list:
+    return await asyncio.gather(*[
+        service.generate_ai_content(prompt, cache_mode=CacheMode.BYPASS) for prompt in prompts
+    ], return_exceptions=True)
+
+
+def test_concurrent_generations_overlap_up_to_the_cap():
+    model = StubModel(latency=LATENCY)
+    service = make_service(model, scheduler=LLMScheduler(max_concurrency=4))
+
+    async def run():
+        started = time.perf_counter()
+        results = await generate_all(service, [f"prompt {i}" for i in range(8)])
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+
+    assert not any(isinstance(result, Exception) for result in results)
+    assert model.calls == 8
+    assert model.max_in_flight == 4
+    # Two waves of four, not eight sequential calls
+    assert elapsed < 4 * LATENCY
+
+
+def test_event_loop_stays_responsive_during_generations():
+    model = StubModel(latency=LATENCY)
+    service = make_service(model)
+
+    async def run():
+        generations = asyncio.ensure_future(generate_all(service, [f"prompt {i}" for i in range(8)]))
+        worst_lag = 0.0
+        while not generations.done():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst_lag = max(worst_lag, time.perf_counter() - started - 0.01)
+        await generations
+        return worst_lag
+
+    assert asyncio.run(run()) < LATENCY / 2
+
+
+def test_identical_generations_share_one_model_call():
+    model = StubModel(latency=LATENCY)
+    service = make_service(model)
+
+    results = asyncio.run(generate_all(service, ["same prompt"] * 10))
+
+    assert model.calls == 1
+    assert len(set(results)) == 1
+    assert service.single_flight.stats()["coalesced"] == 9
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    model = StubModel(latency=LATENCY)
+    scheduler = LLMScheduler(max_concurrency=1, max_queue={Priority.INTERACTIVE: 2, Priority.BATCH: 2})
+    service = make_service(model, scheduler=scheduler)
+
+    results = asyncio.run(generate_all(service, [f"prompt {i}" for i in range(5)]))
+
+    rejected = [result for result in results if isinstance(result, SchedulerRejected)]
+    # One call runs, two wait in the lane, the rest are shed immediately
+    assert len(rejected) == 2
+    assert all(error.status_code == 429 for error in rejected)
+    assert all(int(error.headers["Retry-After"]) >= 1 for error in rejected)
+    assert model.calls == 3
+
+
+def test_breaker_opens_after_threshold_and_fails_fast():
+    model = StubModel(latency=0, error=google_exceptions.ServiceUnavailable("The model is overloaded."))
+    resilience = LLMResilience(breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    service = make_service(model, resilience=resilience)
+
+    async def run():
+        for i in range(3):
+            with pytest.raises(LLMCallError):
+                await service.generate_ai_content(f"prompt {i}", cache_mode=CacheMode.BYPASS)
+        with pytest.raises(CircuitOpenError) as rejected:
+            await service.generate_ai_content("prompt 3", cache_mode=CacheMode.BYPASS)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+
+    assert resilience.breaker.state == CircuitState.OPEN
+    assert model.calls == 3
+    assert rejected.status_code == 503
+    assert "Retry-After" in rejected.headers
+
+
+def test_permanent_errors_do_not_open_the_breaker():
+    model = StubModel(latency=0, error=google_exceptions.InvalidArgument("Request contains an invalid argument."))
+    resilience = LLMResilience(breaker=CircuitBreaker(failure_threshold=3))
+    service = make_service(model, resilience=resilience)
+    service.max_attempts = 3
+
+    results = asyncio.run(generate_all(service, [f"prompt {i}" for i in range(5)]))
+
+    assert all(isinstance(result, LLMCallError) and not result.transient for result in results)
+    # Never retried, and never counted against upstream health
+    assert model.calls == 5
+    assert resilience.breaker.state == CircuitState.CLOSED
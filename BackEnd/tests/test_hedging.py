@@ -0,0 +1,128 @@
+import asyncio
+import gc
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.hedging import HedgingPolicy
+from app.services.llm_resilience import CircuitBreaker, LLMCallError, LLMResilience
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+
+def warm_policy(delay: float = 0.02) -> HedgingPolicy:
+    """A policy that hedges every call after `delay` seconds"""
+    policy = HedgingPolicy(min_samples=1, budget_ratio=1.0)
+    policy.record_latency("complete", delay)
+    return policy
+
+
+class Calls:
+    """Scripted calls: each entry is (seconds, outcome), where an exception outcome is raised"""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.started = 0
+        self.unwound = 0
+
+    async def __call__(self):
+        seconds, outcome = self.script[self.started]
+        self.started += 1
+        try:
+            await asyncio.sleep(seconds)
+            if isinstance(outcome, BaseException):
+                raise outcome
+            return outcome
+        finally:
+            self.unwound += 1
+
+
+def test_no_hedge_until_enough_latencies_are_known():
+    policy = HedgingPolicy(min_samples=5, budget_ratio=1.0)
+    calls = Calls((0.05, "primary"), (0, "hedge"))
+
+    assert asyncio.run(policy.run(calls)) == "primary"
+    assert calls.started == 1
+    assert policy.stats()["hedges_fired"] == 0
+
+
+def test_slow_call_is_hedged_and_the_loser_is_cancelled():
+    policy = warm_policy()
+    calls = Calls((1.0, "primary"), (0, "hedge"))
+
+    result = asyncio.run(policy.run(calls))
+
+    assert result == "hedge"
+    assert calls.started == 2
+    # The slow primary was cancelled and had unwound before run() returned
+    assert calls.unwound == 2
+    assert policy.stats()["hedges_won"] == 1
+
+
+def test_hedge_clock_starts_at_admission():
+    policy = warm_policy(delay=0.05)
+    admitted = asyncio.Event()
+    started = []
+
+    async def call():
+        started.append(call)
+        if len(started) > 1:
+            return "hedge"
+        await asyncio.sleep(0.1)  # Waiting for a scheduler slot
+        admitted.set()
+        await asyncio.sleep(0.01)
+        return "primary"
+
+    assert asyncio.run(policy.run(call, admitted=admitted)) == "primary"
+    assert len(started) == 1
+
+
+def test_failed_loser_exception_is_always_retrieved():
+    unretrieved = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        for _ in range(20):
+            policy = warm_policy(delay=0.01)
+            # Both calls finish on the same loop iteration; the failed one loses
+            calls = Calls((0.03, RuntimeError("primary failed")), (0.02, "hedge"))
+            assert await policy.run(calls) == "hedge"
+        gc.collect()
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert unretrieved == []
+
+
+def test_both_failing_raises_the_primary_error():
+    policy = warm_policy()
+    calls = Calls((0.05, RuntimeError("primary failed")), (0.05, RuntimeError("hedge failed")))
+
+    with pytest.raises(RuntimeError, match="primary failed"):
+        asyncio.run(policy.run(calls))
+
+
+def test_hedged_failure_counts_once_against_the_breaker():
+    model = StubModel(latency=0.05, error=google_exceptions.ServiceUnavailable("The model is overloaded."))
+    resilience = LLMResilience(breaker=CircuitBreaker(failure_threshold=2))
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=4),
+        single_flight=SingleFlight(),
+        resilience=resilience,
+        hedging=warm_policy(delay=0.01)
+    )
+    service.max_attempts = 1
+
+    with pytest.raises(LLMCallError):
+        asyncio.run(service.generate_ai_content("prompt", cache_mode=CacheMode.BYPASS))
+
+    # Primary and hedge both failed, but that is one failed logical call
+    assert model.calls == 2
+    assert resilience.breaker.consecutive_failures == 1
+    assert resilience.errors["transient"] == 1
+    assert resilience.breaker.state.value == "closed"
@@ -0,0 +1,211 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.services.job_queue import JobQueue, JobStatus, JobStore, job_handler
+
+LEASE = 30.0
+
+
+@job_handler("test-echo")
+async def echo(job) -> dict:
+    await job.add_total(1)
+    await job.add_result("echo", job.payload)
+    return {"echo": job.payload}
+
+
+@job_handler("test-wait")
+async def wait_forever(job) -> dict:
+    await asyncio.Event().wait()
+
+
+async def claim_all(store: JobStore, owner: str) -> list:
+    claimed = []
+    while (job := await store.claim(owner, LEASE)) is not None:
+        claimed.append(job["id"])
+    return claimed
+
+
+async def wait_for_status(store: JobStore, job_id: str, status: JobStatus, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while (job := await store.get(job_id))["status"] != status:
+        assert time.monotonic() < deadline, job
+        await asyncio.sleep(0.01)
+    return job
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    # Separate stores on one file stand in for worker processes
+    stores = [JobStore(path) for _ in range(3)]
+
+    async def run():
+        await asyncio.gather(*[stores[0].create(f"job-{i}", "test", {"i": i}) for i in range(40)])
+        claims = await asyncio.gather(*[
+            claim_all(stores[i % 3], f"owner-{i}") for i in range(8)
+        ])
+        for store in stores:
+            await store.close()
+        return claims
+
+    claims = asyncio.run(run())
+
+    claimed = [job_id for owner_claims in claims for job_id in owner_claims]
+    assert sorted(claimed) == sorted(f"job-{i}" for i in range(40))
+    assert len(set(claimed)) == len(claimed)
+
+
+def test_expired_lease_is_claimed_again_from_scratch(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        await store.create("job-1", "test", {})
+        first = await store.claim("crashed", lease_seconds=0.05)
+        await store.add_total("job-1", 2)
+        await store.add_result("job-1", "lesson", {"n": 1})
+        # The lease is still held
+        assert await store.claim("survivor", LEASE) is None
+        await asyncio.sleep(0.1)
+        second = await store.claim("survivor", LEASE)
+        return first, second, await store.results("job-1"), await store.finish(
+            "job-1", "crashed", JobStatus.SUCCEEDED, {"late": True}
+        )
+
+    first, second, results, stale_finish = asyncio.run(run())
+
+    assert first["attempts"] == 1 and second["attempts"] == 2
+    assert second["total"] == second["completed"] == 0 and results == []
+    # The owner that lost the lease can no longer record an outcome
+    assert stale_finish is False
+    assert asyncio.run(store.renew("crashed", ["job-1"], LEASE)) == ["job-1"]
+    assert asyncio.run(store.finish("job-1", "survivor", JobStatus.SUCCEEDED, {"ok": True}))
+    assert asyncio.run(store.get("job-1"))["result"] == {"ok": True}
+    asyncio.run(store.close())
+
+
+def test_release_requeues_only_the_owners_running_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        for i in range(3):
+            await store.create(f"job-{i}", "test", {})
+        await store.claim("stopping", LEASE)
+        await store.claim("other", LEASE)
+        released = await store.release("stopping")
+        statuses = {job["id"]: job["status"] for job in await store.list()}
+        return released, statuses, await store.claim("next", LEASE)
+
+    released, statuses, reclaimed = asyncio.run(run())
+
+    assert released == 1
+    assert statuses == {"job-0": JobStatus.QUEUED, "job-1": JobStatus.RUNNING, "job-2": JobStatus.QUEUED}
+    # The released job is first in line again
+    assert reclaimed["id"] == "job-0"
+    asyncio.run(store.close())
+
+
+def test_cancel_stops_queued_and_running_jobs_only(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        await store.create("queued", "test", {})
+        await store.create("running", "test", {})
+        await store.create("done", "test", {})
+        assert (await store.claim("worker", LEASE))["id"] == "queued"
+        await store.cancel("queued")
+        for _ in range(2):
+            await store.claim("worker", LEASE)
+        await store.finish("done", "worker", JobStatus.SUCCEEDED, {})
+        return (await store.cancel("running"), await store.cancel("done"),
+                await store.renew("worker", ["running"], LEASE),
+                await store.finish("running", "worker", JobStatus.SUCCEEDED, {}))
+
+    cancelled_running, cancelled_done, stopped, finished = asyncio.run(run())
+
+    assert cancelled_running and not cancelled_done
+    # The worker learns of the cancellation at its next lease renewal and cannot overwrite it
+    assert stopped == ["running"] and not finished
+    assert asyncio.run(store.get("running"))["status"] == JobStatus.CANCELLED
+    assert asyncio.run(store.get("queued"))["status"] == JobStatus.CANCELLED
+    asyncio.run(store.close())
+
+
+def test_concurrent_results_get_distinct_sequence_numbers(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        await store.create("job-1", "test", {})
+        await store.claim("worker", LEASE)
+        seqs = await asyncio.gather(*[store.add_result("job-1", "lesson", {"n": i}) for i in range(20)])
+        return seqs, await store.results("job-1", after=10), await store.get("job-1")
+
+    seqs, later, job = asyncio.run(run())
+
+    assert sorted(seqs) == list(range(1, 21))
+    assert [result["seq"] for result in later] == list(range(11, 21))
+    assert job["completed"] == 20
+    asyncio.run(store.close())
+
+
+def test_queue_runs_a_job_and_records_its_results(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, services=None, workers=2, lease_seconds=LEASE)
+
+    async def run():
+        job = await queue.submit("test-echo", {"topic": "queues"})
+        finished = await wait_for_status(store, job["id"], JobStatus.SUCCEEDED)
+        results = await store.results(job["id"])
+        await queue.stop()
+        return finished, results
+
+    finished, results = asyncio.run(run())
+
+    assert finished["result"] == {"echo": {"topic": "queues"}}
+    assert finished["total"] == finished["completed"] == 1
+    assert results == [{"seq": 1, "kind": "echo", "data": {"topic": "queues"}}]
+    asyncio.run(store.close())
+
+
+def test_stopped_queue_hands_running_jobs_to_the_next_one(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        first = JobQueue(store, services=None, workers=1, lease_seconds=LEASE)
+        job = await first.submit("test-wait", {})
+        await wait_for_status(store, job["id"], JobStatus.RUNNING)
+        await first.stop()
+        requeued = await store.get(job["id"])
+
+        second = JobQueue(store, services=None, workers=1, lease_seconds=LEASE)
+        second.start()
+        resumed = await wait_for_status(store, job["id"], JobStatus.RUNNING)
+        assert await second.cancel(job["id"])
+        await second.stop()
+        return requeued, resumed, await store.get(job["id"])
+
+    requeued, resumed, cancelled = asyncio.run(run())
+
+    assert requeued["status"] == JobStatus.QUEUED
+    assert resumed["attempts"] == 2
+    assert cancelled["status"] == JobStatus.CANCELLED
+    asyncio.run(store.close())
+
+
+def test_close_closes_every_thread_connection(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    async def run():
+        await asyncio.gather(*[store.create(f"job-{i}", "test", {}) for i in range(8)])
+        await asyncio.gather(*[store.get(f"job-{i}") for i in range(8)])
+        connections = list(store._connections)
+        await store.close()
+        return connections
+
+    connections = asyncio.run(run())
+
+    assert len(connections) > 1
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
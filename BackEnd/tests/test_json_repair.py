@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from app.utils.json_repair import parse_json_lenient, repair_json
+from app.utils.response_schema import generation_model
+from benchmarks.json_repair_check import MODELS, build_corpus
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('Sure! Here it is:\n```json\n{"a": 1}\n```\nAnything else?', {"a": 1}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": 1\n "b": 2}', {"a": 1, "b": 2}),
+    ('{"a": "x" "b": 2}', {"a": "x", "b": 2}),
+    ('["x" "y"]', ["x", "y"]),
+    ('{"a": 1, // note\n "b": /* inline */ 2}', {"a": 1, "b": 2}),
+    ('{"quote": "he said "hi" to me"}', {"quote": 'he said "hi" to me'}),
+    ('{"text": "line one\nline two"}', {"text": "line one\nline two"}),
+    ('{"path": "C:\\query"}', {"path": "C:\\query"}),
+    ('{"a": True, "b": None, "c": NaN}', {"a": True, "b": None, "c": None}),
+])
+def test_repairs_common_defects(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_truncated_document_keeps_complete_elements():
+    text = '{"title": "Intro", "items": [{"id": 1}, {"id": 2}, {"id": 3, "name": "thi'
+
+    assert json.loads(repair_json(text)) == {"title": "Intro", "items": [{"id": 1}, {"id": 2}]}
+
+
+def test_truncated_number_is_dropped():
+    assert json.loads(repair_json('{"a": 1, "b": 12')) == {"a": 1}
+
+
+def test_adjacent_strings_that_are_not_a_key_fail_the_repair():
+    assert repair_json('{"a": "x" "y"}') is None
+
+
+def test_nothing_to_salvage():
+    assert repair_json("I can't help with that.") is None
+
+
+def test_parse_json_lenient_raises_when_unrecoverable():
+    assert parse_json_lenient('{"a": 1,}') == {"a": 1}
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_lenient("no json here")
+
+
+def test_defect_corpus_is_salvaged():
+    for document in build_corpus(repeat=5, seed=0):
+        repaired = repair_json(document["text"])
+        assert repaired is not None, document
+        if "truncated" not in document["defect"]:
+            # Only truncation loses content; every other defect repairs to a valid response
+            generation_model(MODELS[document["model"]][0]).model_validate_json(repaired)
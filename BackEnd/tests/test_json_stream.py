@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.registry import ServiceRegistry
+from app.utils.json_stream import IncrementalJSONParser
+from benchmarks import sample_payloads
+from benchmarks.stub_model import StubModel
+from main import create_app
+
+DOCUMENT = {
+    "title": "Braces {inside} [strings] and \"quotes\"",
+    "count": 3,
+    "ratio": -1.5e2,
+    "flags": [True, False, None],
+    "items": [{"id": 1, "tags": ["a", "b"]}, "text, with comma", 7, [1, [2]]],
+    "nested": {"deep": {"x": "\\"}},
+    "empty": [],
+}
+
+
+def feed_in_chunks(parser: IncrementalJSONParser, text: str, size: int) -> list:
+    events = []
+    for start in range(0, len(text), size):
+        events += parser.feed(text[start:start + size])
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_events_do_not_depend_on_chunk_boundaries(size):
+    text = "```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```"
+    parser = IncrementalJSONParser(stream_arrays={"items"})
+
+    events = feed_in_chunks(parser, text, size)
+
+    assert parser.done
+    fields = {key: value for key, index, value in events if index is None}
+    items = [(index, value) for key, index, value in events if key == "items"]
+    assert fields == {key: value for key, value in DOCUMENT.items() if key != "items"}
+    assert items == list(enumerate(DOCUMENT["items"]))
+
+
+def test_streamed_array_elements_arrive_before_the_array_closes():
+    parser = IncrementalJSONParser(stream_arrays={"sections"})
+
+    assert parser.feed('{"title": "T", "sections": [{"heading": "A"}, {"head') == [
+        ("title", None, "T"), ("sections", 0, {"heading": "A"}),
+    ]
+    assert parser.feed('ing": "B"}') == [("sections", 1, {"heading": "B"})]
+    assert parser.feed('], "summary": "S"}') == [("summary", None, "S")]
+    assert parser.done
+
+
+def test_scalar_fields_wait_for_their_terminator():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"count": 12') == []
+    assert parser.feed('3, "flag": tr') == [("count", None, 123)]
+    assert parser.feed('ue}') == [("flag", None, True)]
+
+
+def test_text_after_the_document_is_ignored():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"a": 1} trailing {"b": 2}') == [("a", None, 1)]
+    assert parser.feed('{"c": 3}') == []
+
+
+def test_buffer_keeps_only_the_pending_token():
+    parser = IncrementalJSONParser(stream_arrays={"items"})
+    parser.feed('{"items": [')
+    for i in range(200):
+        parser.feed(json.dumps({"id": i, "text": "x" * 50}) + ", ")
+        # Finished elements are dropped, so memory does not grow with the array
+        assert len(parser._buf) < 100
+
+
+def test_lesson_stream_sends_each_section_as_an_event():
+    model = StubModel(latency=0, payload=sample_payloads.LESSON, chunk_size=32)
+    registry = ServiceRegistry.create(model=model, artifact_store=MemoryArtifactStore())
+    app = create_app(registry)
+    request = {"module_id": "mod_1", "lesson_title": "Supervised Learning", "lesson_objective": "Learn it"}
+
+    async def stream() -> list:
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/api/v2/create-lesson-content/stream?cache=bypass", json=request)
+                return [json.loads(line) for line in response.text.splitlines()]
+        finally:
+            await registry.close()
+
+    events = asyncio.run(stream())
+
+    sections = [event for event in events if event["event"] == "section"]
+    assert [event["index"] for event in sections] == list(range(len(sample_payloads.LESSON["sections"])))
+    assert sections[0]["data"]["heading"] == "Section 1"
+    assert events[-1]["event"] == "done" and events[-1]["data"]["lesson_id"]
+    assert {event["event"] for event in events} >= {"lesson_title", "introduction", "summary", "next_steps"}
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.services import llm_resilience
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import (CircuitBreaker, CircuitOpenError, CircuitState, LLMCallError, LLMResilience,
+                                         RetryBudget, is_transient_error)
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight
+from benchmarks.stub_model import StubModel
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the monotonic clock of the breaker and the retry budget"""
+    now = [1000.0]
+    monkeypatch.setattr(llm_resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("error, transient", [
+    (google_exceptions.ServiceUnavailable("overloaded"), True),
+    (google_exceptions.TooManyRequests("slow down"), True),
+    (asyncio.TimeoutError(), True),
+    (google_exceptions.InvalidArgument("bad prompt"), False),
+    (google_exceptions.PermissionDenied("no key"), False),
+    (ValueError("blocked candidate"), False),
+    (RuntimeError("unknown"), True),
+])
+def test_errors_are_classified(error, transient):
+    assert is_transient_error(error) is transient
+
+
+def test_retry_budget_allows_the_ratio_plus_the_floor(clock):
+    budget = RetryBudget(ratio=0.2, min_retries_per_second=0.1, window=10)
+
+    for _ in range(20):
+        budget.record_request()
+    # 20 requests earn 4 retries, plus 1 from the floor over the window
+    granted = sum(budget.try_acquire() for _ in range(10))
+
+    assert granted == 5
+    assert budget.retries_allowed == 5 and budget.retries_denied == 5
+
+
+def test_retry_budget_recovers_once_the_window_passes(clock):
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0, window=10)
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_acquire() and not budget.try_acquire()
+
+    clock[0] += 11
+    assert not budget.try_acquire()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_acquire()
+    assert budget.stats()["requests_in_window"] == 2 and budget.stats()["retries_in_window"] == 1
+
+
+def test_breaker_opens_after_consecutive_transient_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    for _ in range(2):
+        breaker.record_failure(transient=True)
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure(transient=True)
+    # A success in between resets the count
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_failure(transient=True)
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.before_call()
+    assert rejected.value.status_code == 503 and rejected.value.headers["Retry-After"] == "30"
+
+
+def test_permanent_failures_do_not_open_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+
+    for _ in range(5):
+        breaker.record_failure(transient=False)
+
+    assert breaker.state == CircuitState.CLOSED and breaker.consecutive_failures == 0
+
+
+def test_successful_probe_closes_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, half_open_max_calls=1)
+    breaker.record_failure(transient=True)
+
+    clock[0] += 30
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    breaker.before_call()
+    assert breaker.stats()["transitions"] == {"closed": 1, "open": 1, "half_open": 1}
+
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure(transient=True)
+
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_failure(transient=True)
+
+    assert breaker.state == CircuitState.OPEN
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_released_probe_lets_the_next_call_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure(transient=True)
+    clock[0] += 30
+    breaker.before_call()
+
+    # The probe was cancelled before it produced an outcome
+    breaker.release()
+    breaker.before_call()
+
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_only_transient_call_errors_are_retried():
+    resilience = LLMResilience(budget=RetryBudget(ratio=0, min_retries_per_second=1))
+
+    transient = resilience.classify(google_exceptions.ServiceUnavailable("overloaded"))
+    permanent = resilience.classify(google_exceptions.InvalidArgument("bad prompt"))
+
+    assert isinstance(transient, LLMCallError) and transient.transient
+    assert resilience.should_retry(transient)
+    assert not resilience.should_retry(permanent)
+    assert not resilience.should_retry(ValueError("not a call error"))
+    assert resilience.errors == {"transient": 1, "permanent": 1}
+
+
+def test_exhausted_budget_stops_retries_during_an_outage():
+    model = StubModel(latency=0, error=google_exceptions.ServiceUnavailable("overloaded"))
+    resilience = LLMResilience(
+        breaker=CircuitBreaker(failure_threshold=100),
+        budget=RetryBudget(ratio=0, min_retries_per_second=0)
+    )
+    service = AIServiceV2(model=model, scheduler=LLMScheduler(max_concurrency=4), single_flight=SingleFlight(),
+                          resilience=resilience)
+    service.max_attempts = 3
+
+    async def run():
+        return await asyncio.gather(*[
+            service.generate_ai_content(f"prompt {i}", cache_mode=CacheMode.BYPASS) for i in range(5)
+        ], return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    # Every call fails once and is not retried, so the outage adds no extra load
+    assert all(isinstance(result, LLMCallError) for result in results)
+    assert model.calls == 5
+    assert resilience.budget.retries_denied == 5
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import llm_scheduler
+from app.services.llm_scheduler import LLMScheduler, Priority, SchedulerRejected, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Replaces the monotonic clock the token buckets refill from"""
+    now = [1000.0]
+    monkeypatch.setattr(llm_scheduler.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_refills_continuously(clock):
+    bucket = TokenBucket(60)
+
+    bucket.take(60)
+    assert bucket.time_until(1) == pytest.approx(1.0)
+    clock[0] += 0.5
+    assert bucket.time_until(1) == pytest.approx(0.5)
+    clock[0] += 0.5
+    assert bucket.time_until(1) == 0.0
+    # Refill stops at the capacity
+    clock[0] += 3600
+    bucket.time_until(1)
+    assert bucket.level == 60
+
+
+def test_token_bucket_debt_is_repaid_before_new_calls(clock):
+    bucket = TokenBucket(60)
+
+    # Actual usage larger than the bucket leaves it in debt
+    bucket.take(90)
+    assert bucket.level == -30
+    assert bucket.time_until(1) == pytest.approx(31.0)
+
+
+def test_token_bucket_clamps_requests_larger_than_the_capacity(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.time_until(1000) == 0.0
+    assert TokenBucket(0).unlimited and TokenBucket(0).time_until(1e9) == 0.0
+
+
+def test_interactive_calls_are_admitted_before_queued_batch_calls():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+
+    async def call(name: str, priority: Priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        blocker = asyncio.ensure_future(call("first", Priority.BATCH))
+        await asyncio.sleep(0)
+        batch = [asyncio.ensure_future(call(f"batch-{i}", Priority.BATCH)) for i in range(2)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(call("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(blocker, *batch, interactive)
+
+    asyncio.run(run())
+
+    assert order == ["first", "interactive", "batch-0", "batch-1"]
+
+
+def test_full_lane_is_rejected_with_retry_after():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue={Priority.INTERACTIVE: 1, Priority.BATCH: 1})
+
+    async def hold():
+        async with scheduler.slot(Priority.BATCH):
+            await asyncio.sleep(0.05)
+
+    async def run():
+        tasks = [asyncio.ensure_future(hold()) for _ in range(3)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    rejected = [result for result in results if isinstance(result, SchedulerRejected)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 429 and int(rejected[0].headers["Retry-After"]) >= 1
+    # A full batch lane does not shed interactive calls
+    assert scheduler.stats()["lanes"]["batch"]["rejected"] == 1
+    assert scheduler.stats()["lanes"]["interactive"]["rejected"] == 0
+
+
+def test_call_waiting_longer_than_max_queue_wait_times_out():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_wait=0.02)
+
+    async def run():
+        async with scheduler.slot():
+            with pytest.raises(SchedulerRejected) as rejected:
+                async with scheduler.slot():
+                    pass
+        return rejected.value
+
+    rejected = asyncio.run(run())
+
+    assert rejected.status_code == 503
+    lane = scheduler.stats()["lanes"]["interactive"]
+    assert lane["timed_out"] == 1 and lane["queue_depth"] == 0
+    assert scheduler.in_flight == 0
+
+
+def test_requests_per_minute_spaces_out_admissions():
+    # 600 requests per minute refill one request every 0.1 seconds once the burst is spent
+    scheduler = LLMScheduler(max_concurrency=10, requests_per_minute=600)
+    scheduler.requests.level = 1
+
+    async def run():
+        started = time.perf_counter()
+        admitted = []
+
+        async def call():
+            async with scheduler.slot():
+                admitted.append(time.perf_counter() - started)
+
+        await asyncio.gather(*[call() for _ in range(3)])
+        return admitted
+
+    admitted = asyncio.run(run())
+
+    assert admitted[0] < 0.05
+    assert admitted[2] >= 0.18
+
+
+def test_reported_usage_charges_the_token_bucket():
+    scheduler = LLMScheduler(tokens_per_minute=10_000)
+
+    async def run():
+        async with scheduler.slot(estimated_tokens=1_000) as permit:
+            permit.record_usage(3_000)
+
+    asyncio.run(run())
+
+    assert scheduler.stats()["tokens_available"] == pytest.approx(7_000, abs=5)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LLMScheduler(max_concurrency=1)
+
+    async def run():
+        async with scheduler.slot():
+            waiter = asyncio.ensure_future(scheduler.slot().__aenter__())
+            await asyncio.sleep(0)
+            assert scheduler.stats()["lanes"]["interactive"]["queue_depth"] == 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["in_flight"] == 0
+    assert stats["lanes"]["interactive"]["queue_depth"] == 0
@@ -0,0 +1,83 @@
+import asyncio
+
+from app.services.mcp_pool import MCPSessionPool
+from benchmarks.mcp_pool_check import STUB_CONFIG
+
+
+def make_pool(per_server: int = 4) -> MCPSessionPool:
+    return MCPSessionPool(STUB_CONFIG, max_concurrency_per_server=per_server,
+                          health_check_interval=1.0, tool_timeout=5.0, ping_timeout=2.0)
+
+
+def tool(pool: MCPSessionPool, name: str):
+    return next(tool for tool in pool.get_tools() if tool.name == name)
+
+
+def test_calls_reuse_one_server_session():
+    pool = make_pool()
+
+    async def run():
+        await pool.start()
+        try:
+            replies = [await tool(pool, "echo").ainvoke({"text": str(i)}) for i in range(10)]
+            return replies, pool.status()
+        finally:
+            await pool.stop()
+
+    replies, status = asyncio.run(run())
+
+    assert replies == [str(i) for i in range(10)]
+    # Started once, never restarted
+    assert status["generation"] == 1
+    assert status["servers"]["stub"]["restarts"] == 0
+
+
+def test_tool_calls_respect_the_per_server_limit():
+    pool = make_pool(per_server=2)
+
+    async def run():
+        await pool.start()
+        try:
+            handle = pool.servers["stub"]
+            slow_echo = tool(pool, "slow_echo")
+            calls = asyncio.ensure_future(asyncio.gather(*[
+                slow_echo.ainvoke({"text": str(i), "seconds": 0.1}) for i in range(6)
+            ]))
+            most_in_flight = 0
+            while not calls.done():
+                most_in_flight = max(most_in_flight, handle.in_flight)
+                await asyncio.sleep(0.01)
+            return await calls, most_in_flight
+        finally:
+            await pool.stop()
+
+    replies, most_in_flight = asyncio.run(run())
+
+    assert sorted(replies) == [str(i) for i in range(6)]
+    assert most_in_flight == 2
+
+
+def test_crashed_server_is_restarted():
+    pool = make_pool()
+
+    async def run():
+        await pool.start()
+        try:
+            generation = pool.generation
+            try:
+                await tool(pool, "crash").ainvoke({})
+            except Exception:
+                pass
+            handle = pool.servers["stub"]
+            for _ in range(150):
+                if handle.healthy and pool.generation > generation:
+                    break
+                await asyncio.sleep(0.1)
+            return await tool(pool, "echo").ainvoke({"text": "back"}), handle.restarts
+        finally:
+            await pool.stop()
+
+    reply, restarts = asyncio.run(run())
+
+    assert reply == "back"
+    assert restarts >= 1
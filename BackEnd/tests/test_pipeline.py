@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+from app.api.v2.endpoints.pipeline import build_course
+from app.services.ai_service_v2 import AIServiceV2
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.generation_cache import CacheMode
+from app.services.llm_resilience import LLMResilience
+from app.services.llm_scheduler import LLMScheduler, Priority
+from app.services.single_flight import SingleFlight
+from benchmarks import sample_payloads
+from benchmarks.prefix_cache import course_request
+from benchmarks.stub_model import StubModel
+
+LATENCY = 0.05
+MODULES = len(sample_payloads.COURSE["modules"])
+LESSONS = MODULES * len(sample_payloads.MODULE["lessons"])
+
+
+class FailingModuleModel(StubModel):
+    """Rejects the plan of one module; every other generation succeeds"""
+
+    def __init__(self, module_title: str, **kwargs):
+        super().__init__(payload=sample_payloads.payload_for_prompt, **kwargs)
+        self.module_title = module_title
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False, **kwargs):
+        if "module development" in prompt and self.module_title in prompt:
+            self.calls += 1
+            raise google_exceptions.InvalidArgument("Prompt rejected")
+        return await super().generate_content_async(prompt, generation_config, stream, **kwargs)
+
+
+class Progress:
+    """Records what build_course reports, like the JobContext of a background job"""
+
+    def __init__(self):
+        self.total = 0
+        self.results = []
+
+    async def add_total(self, amount: int) -> None:
+        self.total += amount
+
+    async def add_result(self, kind: str, data) -> None:
+        self.results.append(kind)
+
+
+def build(model: StubModel, store: MemoryArtifactStore = None, include_quizzes: bool = True, progress=None):
+    service = AIServiceV2(
+        model=model,
+        scheduler=LLMScheduler(max_concurrency=16),
+        single_flight=SingleFlight(),
+        resilience=LLMResilience()
+    )
+    service.max_attempts = 1
+    return asyncio.run(build_course(
+        course_request(0), include_quizzes=include_quizzes, num_questions=5, priority=Priority.BATCH,
+        cache=CacheMode.BYPASS, ai_service=service, artifact_store=store or MemoryArtifactStore(),
+        progress=progress
+    ))
+
+
+def test_course_build_generates_and_stores_the_whole_tree():
+    model = StubModel(latency=0, payload=sample_payloads.payload_for_prompt)
+    store = MemoryArtifactStore()
+
+    result = build(model, store)
+
+    # One course plan, one plan per module and one fused lesson-and-quiz per lesson
+    assert result.metadata["generations"] == model.calls == 1 + MODULES + LESSONS
+    assert result.metadata["failures"] == 0
+    assert len(result.modules) == MODULES
+    lessons = [lesson for module in result.modules for lesson in module.lessons]
+    assert len(lessons) == LESSONS and all(lesson.quiz is not None for lesson in lessons)
+
+    async def stored():
+        modules = await store.list_children("module", result.course.course_id)
+        lessons = [lesson for module in modules for lesson in await store.list_children("lesson", module["id"])]
+        return modules, lessons
+
+    stored_modules, stored_lessons = asyncio.run(stored())
+    assert len(stored_modules) == MODULES and len(stored_lessons) == LESSONS
+
+
+def test_course_build_without_quizzes_skips_them():
+    model = StubModel(latency=0, payload=sample_payloads.payload_for_prompt)
+
+    result = build(model, include_quizzes=False)
+
+    assert model.calls == 1 + MODULES + LESSONS
+    assert all(lesson.lesson is not None and lesson.quiz is None
+               for module in result.modules for lesson in module.lessons)
+
+
+def test_course_build_latency_follows_the_depth_of_the_tree():
+    model = StubModel(latency=LATENCY, payload=sample_payloads.payload_for_prompt)
+
+    started = time.perf_counter()
+    build(model)
+    elapsed = time.perf_counter() - started
+
+    # Course plan, then every module plan at once, then every lesson at once
+    assert model.max_in_flight >= MODULES
+    assert elapsed < 6 * LATENCY
+
+
+def test_failed_module_does_not_fail_the_course():
+    model = FailingModuleModel("Module 2", latency=0)
+
+    result = build(model)
+
+    failed = [module for module in result.modules if module.error]
+    assert [module.module_info.module_title for module in failed] == ["Module 2"]
+    assert failed[0].lessons == []
+    assert result.metadata["failures"] == 1
+    succeeded = [module for module in result.modules if not module.error]
+    assert all(len(module.lessons) == len(sample_payloads.MODULE["lessons"]) for module in succeeded)
+
+
+def test_progress_totals_match_the_reported_results():
+    progress = Progress()
+
+    build(StubModel(latency=0, payload=sample_payloads.payload_for_prompt), progress=progress)
+
+    assert progress.results.count("course") == 1
+    assert progress.results.count("module") == MODULES
+    assert progress.results.count("lesson") == progress.results.count("quiz") == LESSONS
+    assert progress.total == len(progress.results)
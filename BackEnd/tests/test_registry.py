@@ -0,0 +1,29 @@
+from app.services.artifact_store import MemoryArtifactStore
+from app.services.registry import ServiceRegistry
+from benchmarks.stub_model import StubModel
+
+
+def stub_registry() -> ServiceRegistry:
+    return ServiceRegistry.create(model=StubModel(latency=0), artifact_store=MemoryArtifactStore())
+
+
+def test_registry_injects_its_services():
+    registry = stub_registry()
+    service = registry.ai_service_v2
+
+    assert service.scheduler is registry.scheduler
+    assert service.resilience is registry.resilience
+    assert service.hedging is registry.hedging
+    assert service.metrics is registry.metrics
+    assert service.parse_stats is registry.parse_stats
+    assert service.continuation_stats is registry.continuation_stats
+    assert service.cache is registry.generation_cache
+    assert service.single_flight is registry.single_flight
+
+
+def test_registries_share_no_state():
+    first, second = stub_registry().ai_service_v2, stub_registry().ai_service_v2
+
+    for name in ("scheduler", "resilience", "metrics", "parse_stats", "continuation_stats", "cache", "single_flight"):
+        assert getattr(first, name) is not getattr(second, name), name
+    assert first.resilience.breaker is not second.resilience.breaker
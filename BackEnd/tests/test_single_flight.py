@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", work) for _ in range(5)])
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "coalesced_rate": 0.8, "in_flight": 0}
+
+
+def test_concurrent_callers_share_one_error():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", work) for _ in range(3)], return_exceptions=True)
+
+    errors = asyncio.run(run())
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.leaders == 1
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0, "b")))
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert flight.leaders == 2 and flight.coalesced == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight()
+    release = None
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.do("key", work))
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_key_is_forgotten_once_the_call_completes():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        first = await flight.do("key", work)
+        return first, await flight.do("key", work)
+
+    # Completed results are not cached; a later call starts fresh work
+    assert asyncio.run(run()) == (1, 2)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_failure_with_every_waiter_cancelled_is_not_reported_unretrieved():
+    flight = SingleFlight()
+    unhandled = []
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("nobody is listening")
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        waiter = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+
+    assert unhandled == []
@@ -0,0 +1,78 @@
+import json
+import threading
+
+from app.services.tracing import JsonLinesSink, MemorySink, Tracer, parse_traceparent
+
+REMOTE = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+
+class BlockingFile:
+    """Stands in for the trace file; writes wait until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.lines = []
+        self.closed = False
+
+    def write(self, text: str) -> None:
+        self.release.wait()
+        self.lines += text.splitlines()
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_spans_nest_and_continue_remote_traces():
+    sink = MemorySink()
+    tracer = Tracer(sink)
+
+    with tracer.span("request", REMOTE) as request:
+        with tracer.span("model_call", model="stub"):
+            pass
+        tracer.record("scheduler_wait", 0.01)
+
+    child, wait, root = sink.spans
+    assert root["trace_id"] == "a" * 32 and root["parent_id"] == "b" * 16
+    assert child["trace_id"] == wait["trace_id"] == request.trace_id
+    assert child["parent_id"] == wait["parent_id"] == request.span_id
+    assert child["attributes"] == {"model": "stub"}
+
+
+def test_malformed_traceparent_is_ignored():
+    assert parse_traceparent("00-" + "0" * 32 + "-" + "b" * 16 + "-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(REMOTE) == ("a" * 32, "b" * 16)
+
+
+def test_jsonl_sink_writes_spans_on_its_own_thread(tmp_path):
+    sink = JsonLinesSink(str(tmp_path / "traces.jsonl"))
+    sink._file.close()
+    sink._file = blocked = BlockingFile()
+    tracer = Tracer(sink)
+
+    # Export returns at once even though the file is stuck
+    for i in range(5):
+        with tracer.span("span", number=i):
+            pass
+    assert blocked.lines == []
+
+    blocked.release.set()
+    tracer.close()
+
+    assert [json.loads(line)["attributes"]["number"] for line in blocked.lines] == list(range(5))
+    assert blocked.closed
+
+
+def test_jsonl_sink_appends_to_the_file(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    for name in ("first", "second"):
+        tracer = Tracer(JsonLinesSink(str(path)))
+        with tracer.span(name):
+            pass
+        tracer.close()
+        tracer.close()
+
+    assert [json.loads(line)["name"] for line in path.read_text().splitlines()] == ["first", "second"]